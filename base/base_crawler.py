@@ -8,11 +8,23 @@
 # 详细许可条款请参阅项目根目录下的LICENSE文件。
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
+import asyncio
+import pathlib
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+from urllib.parse import urlparse
 
+import httpx
 from playwright.async_api import BrowserContext, BrowserType, Playwright
 
+import config
+from tools import utils
+from tools.http_client_pool import HttpClientPool
+from tools.media_blob_store import get_media_blob_store, hash_file
+from tools.media_manifest import get_media_manifest
+from tools.rate_limiter import get_rate_limiter, get_retry_after
+
 
 class AbstractCrawler(ABC):
 
@@ -84,6 +96,20 @@ class AbstractStore(ABC):
     async def store_comment(self, comment_item: Dict):
         pass
 
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        store a page of contents, db stores override this with a single upsert
+        """
+        for content_item in content_items:
+            await self.store_content(content_item)
+
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        store a page of comments, db stores override this with a single upsert
+        """
+        for comment_item in comment_items:
+            await self.store_comment(comment_item)
+
     # TODO support all platform
     # only xhs is supported, so @abstractmethod is commented
     @abstractmethod
@@ -91,6 +117,36 @@ class AbstractStore(ABC):
         pass
 
 
+# 流式下载函数：download(url, save_path) -> 是否下载成功，由各平台 client 提供
+MediaDownloadFunc = Callable[[str, str], Awaitable[bool]]
+
+
+async def _download_media(media_type: str, content_id: str, url: str, save_file_name: str, download: MediaDownloadFunc) -> bool:
+    manifest = get_media_manifest()
+    if manifest is not None:
+        if config.MEDIA_SKIP_DOWNLOADED and manifest.is_downloaded(save_file_name):
+            utils.logger.info(f"[_download_media] {save_file_name} already downloaded, skip")
+            return True
+        manifest.start(config.PLATFORM, media_type, content_id, url, save_file_name)
+
+    pathlib.Path(save_file_name).parent.mkdir(parents=True, exist_ok=True)
+    blob_store = get_media_blob_store()
+    if blob_store is not None:
+        success = await blob_store.fetch(url, save_file_name, download)
+    else:
+        success = await download(url, save_file_name)
+
+    if manifest is not None:
+        if not success:
+            manifest.finish(save_file_name)
+        else:
+            # 去重模式下 blob 已经按内容计算过 sha256
+            blob_hash = blob_store.get_blob_hash(url) if blob_store is not None else None
+            sha256, size = blob_hash or await asyncio.to_thread(hash_file, save_file_name)
+            manifest.finish(save_file_name, size, sha256)
+    return success
+
+
 class AbstractStoreImage(ABC):
     # TODO: support all platform
     # only weibo is supported
@@ -98,6 +154,20 @@ class AbstractStoreImage(ABC):
     async def store_image(self, image_content_item: Dict):
         pass
 
+    @abstractmethod
+    def make_save_file_name(self, content_id: str, extension_file_name: str) -> str:
+        pass
+
+    async def download_image(self, content_id: str, url: str, extension_file_name: str, download: MediaDownloadFunc) -> bool:
+        """
+        下载图片并直接写入保存路径，不在内存中保留整个文件
+        """
+        save_file_name = self.make_save_file_name(str(content_id), extension_file_name)
+        if not await _download_media("image", str(content_id), url, save_file_name, download):
+            return False
+        utils.logger.info(f"[{type(self).__name__}.download_image] save image {save_file_name} success ...")
+        return True
+
 
 class AbstractStoreVideo(ABC):
     # TODO: support all platform
@@ -106,11 +176,149 @@ class AbstractStoreVideo(ABC):
     async def store_video(self, video_content_item: Dict):
         pass
 
+    @abstractmethod
+    def make_save_file_name(self, content_id: str, extension_file_name: str) -> str:
+        pass
+
+    async def download_video(self, content_id: str, url: str, extension_file_name: str, download: MediaDownloadFunc) -> bool:
+        """
+        下载视频并直接写入保存路径，不在内存中保留整个文件
+        """
+        save_file_name = self.make_save_file_name(str(content_id), extension_file_name)
+        if not await _download_media("video", str(content_id), url, save_file_name, download):
+            return False
+        utils.logger.info(f"[{type(self).__name__}.download_video] save video {save_file_name} success ...")
+        return True
+
+
+# 请求耗时回调：hook(客户端类名, 请求方法, 接口路径, 耗时秒数, 异常)，异常为 None 表示请求成功，每次重试单独回调
+RequestTimingHook = Callable[[str, str, str, float, Optional[BaseException]], None]
+_request_timing_hooks: List[RequestTimingHook] = []
+
+
+def add_request_timing_hook(hook: RequestTimingHook):
+    _request_timing_hooks.append(hook)
+
+
+def remove_request_timing_hook(hook: RequestTimingHook):
+    _request_timing_hooks.remove(hook)
+
 
 class AbstractApiClient(ABC):
+    proxy: Optional[str] = None
+    timeout: float = 60
+    # 是否跟随重定向
+    follow_redirects: bool = False
+    # 需要重试的异常，默认只重试连接错误和超时，平台可以把接口错误也加入重试
+    retry_exceptions: Tuple[Type[BaseException], ...] = (httpx.TransportError,)
+    # 接口路径包含的关键字 -> 限速的接口类别，都不包含时为 default
+    endpoint_classes: Dict[str, str] = {"search": "search", "comment": "comment", "reply": "comment"}
+    _http_client_pool: Optional[HttpClientPool] = None
+
+    def get_http_client(self, proxy: Optional[str] = None) -> httpx.AsyncClient:
+        """
+        指定代理对应的长连接客户端，请求之间复用连接
+        """
+        if self._http_client_pool is None:
+            self._http_client_pool = HttpClientPool()
+        return self._http_client_pool.get(proxy)
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """
+        当前代理对应的长连接客户端
+        """
+        return self.get_http_client(self.proxy)
+
+    async def close(self):
+        """
+        关闭长连接
+        """
+        if self._http_client_pool is not None:
+            await self._http_client_pool.aclose()
+
+    async def request(self, method: str, url: str, **kwargs) -> Any:
+        """
+        发送请求并交给 parse_response 处理响应，连接复用、超时、限速、重试和耗时回调在这里统一处理，
+        各平台只负责请求签名（get / post）和 parse_response
+        Args:
+            method: 请求方法
+            url: 请求的URL
+            **kwargs: httpx 请求参数，另外 proxy 指定本次请求的代理，return_response 传给 parse_response
+
+        Returns:
+            parse_response 的返回值
+        """
+        proxy = kwargs.pop("proxy", None) or self.proxy
+        return_response = kwargs.pop("return_response", False)
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("follow_redirects", self.follow_redirects)
+        endpoint = urlparse(url).path
+        rate_limiter = get_rate_limiter(type(self).__name__, self.get_endpoint_class(endpoint))
+        retry_times = config.API_RETRY_TIMES
+        for attempt in range(retry_times + 1):
+            if rate_limiter is not None:
+                await rate_limiter.acquire()
+            start = time.perf_counter()
+            error: Optional[BaseException] = None
+            try:
+                response = await self.get_http_client(proxy).request(method, url, **kwargs)
+                retry_after = get_retry_after(response)
+                if retry_after is not None and rate_limiter is not None:
+                    utils.logger.warning(f"[{type(self).__name__}.request] {endpoint} asks to retry after {retry_after}s, pause this endpoint class")
+                    rate_limiter.backoff(retry_after)
+                return self.parse_response(response, return_response)
+            except self.retry_exceptions as e:
+                error = e
+                if attempt == retry_times:
+                    raise
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._on_request_timing(method, endpoint, time.perf_counter() - start, error)
+            utils.logger.warning(
+                f"[{type(self).__name__}.request] {method} {endpoint} failed: {error.__class__.__name__} {error}, "
+                f"retry {attempt + 1}/{retry_times} after {config.API_RETRY_WAIT_SEC}s"
+            )
+            await asyncio.sleep(config.API_RETRY_WAIT_SEC)
+
+    async def wait_rate_limit(self, url: str):
+        """
+        不经过 request 发出的请求（如浏览器页面跳转）也按接口类别等待令牌
+        """
+        rate_limiter = get_rate_limiter(type(self).__name__, self.get_endpoint_class(urlparse(url).path))
+        if rate_limiter is not None:
+            await rate_limiter.acquire()
+
+    def get_endpoint_class(self, endpoint: str) -> str:
+        """
+        接口所属的限速类别，同一类接口共用一个令牌桶
+        """
+        endpoint = endpoint.lower()
+        for keyword, endpoint_class in self.endpoint_classes.items():
+            if keyword in endpoint:
+                return endpoint_class
+        return "default"
+
+    def _on_request_timing(self, method: str, endpoint: str, elapsed: float, error: Optional[BaseException]):
+        for hook in _request_timing_hooks:
+            try:
+                hook(type(self).__name__, method, endpoint, elapsed, error)
+            except Exception as e:
+                utils.logger.error(f"[AbstractApiClient._on_request_timing] request timing hook failed: {e}")
 
     @abstractmethod
-    async def request(self, method, url, **kwargs):
+    def parse_response(self, response: httpx.Response, return_response: bool = False) -> Any:
+        """
+        解析响应，按平台规则把错误响应转换成异常（如 DataFetchError、IPBlockError）
+        Args:
+            response: httpx 响应
+            return_response: 是否直接返回原始内容，不解析 JSON
+
+        Returns:
+            接口数据
+        """
         pass
 
     @abstractmethod
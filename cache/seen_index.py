@@ -0,0 +1,111 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 跨运行的已爬取内容索引，按 (平台, 内容id) 记录上次爬取时间，搜索时跳过近期已爬取的内容
+
+import time
+from typing import Any, Callable, List, Optional, TypeVar
+
+import config
+from cache.abs_cache import AbstractCache
+from cache.cache_factory import CacheFactory
+from store.write_behind import get_store_queue
+from tools import utils
+
+T = TypeVar("T")
+
+# SEEN_INDEX_RECRAWL_AGE 为 0（永不重新爬取）时使用的过期时间
+_NEVER_EXPIRE_SEC = 10 * 365 * 24 * 3600
+
+
+class SeenIndex:
+    def __init__(self, cache: AbstractCache, recrawl_age: int):
+        """
+        :param cache: 存放索引的缓存，需跨运行持久化（sqlite / redis）
+        :param recrawl_age: 距上次爬取超过多少秒后重新爬取，0 表示不再重新爬取
+        """
+        self._cache = cache
+        self._recrawl_age = recrawl_age
+
+    @staticmethod
+    def _key(platform: str, content_id: Any) -> str:
+        return f"seen:{platform}:{content_id}"
+
+    def is_seen(self, platform: str, content_id: Any) -> bool:
+        """
+        内容是否在重新爬取间隔内已爬取过
+        """
+        crawled_at = self._cache.get(self._key(platform, content_id))
+        if crawled_at is None:
+            return False
+        return not self._recrawl_age or time.time() - crawled_at < self._recrawl_age
+
+    def mark_seen(self, platform: str, content_id: Any):
+        """
+        记录内容的爬取时间
+        """
+        self._cache.set(self._key(platform, content_id), int(time.time()), self._recrawl_age or _NEVER_EXPIRE_SEC)
+
+    def filter_unseen(self, platform: str, items: List[T], get_id: Callable[[T], Any]) -> List[T]:
+        """
+        过滤掉已爬取过的内容，取不到 id 的内容保留
+        """
+        unseen = [item for item in items if not get_id(item) or not self.is_seen(platform, get_id(item))]
+        if len(unseen) < len(items):
+            utils.logger.info(f"[SeenIndex.filter_unseen] {platform}: skip {len(items) - len(unseen)} already crawled contents")
+        return unseen
+
+
+_seen_index: Optional[SeenIndex] = None
+
+
+def get_seen_index() -> Optional[SeenIndex]:
+    """
+    获取已爬取内容索引，未开启 ENABLE_SEEN_INDEX 时返回 None
+    """
+    global _seen_index
+    if not config.ENABLE_SEEN_INDEX:
+        return None
+    if _seen_index is None:
+        _seen_index = SeenIndex(CacheFactory.create_cache(config.SEEN_INDEX_CACHE_TYPE), config.SEEN_INDEX_RECRAWL_AGE)
+    return _seen_index
+
+
+def filter_unseen(platform: str, items: List[T], get_id: Callable[[T], Any]) -> List[T]:
+    """
+    搜索结果在获取详情前调用，未开启索引时原样返回
+    """
+    seen_index = get_seen_index()
+    if seen_index is None:
+        return items
+    return seen_index.filter_unseen(platform, items, get_id)
+
+
+def mark_seen(platform: str, content_ids: List[Any]):
+    """
+    内容及其评论都交给存储后调用：开启存储写入队列时等此前入队的数据写完再记录，有数据写入失败时不记录，
+    避免数据没有落盘就被下次运行跳过；未开启索引时不做任何事
+    """
+    seen_index = get_seen_index()
+    content_ids = [content_id for content_id in content_ids if content_id]
+    if seen_index is None or not content_ids:
+        return
+
+    def _mark():
+        for content_id in content_ids:
+            seen_index.mark_seen(platform, content_id)
+
+    store_queue = get_store_queue()
+    if store_queue is None:
+        _mark()
+    else:
+        store_queue.call_when_stored(_mark)
@@ -0,0 +1,76 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 本地 SQLite 文件缓存，跨运行持久化，不需要额外部署 redis
+
+import os
+import pickle
+import sqlite3
+import time
+from typing import Any, List, Optional
+
+from cache.abs_cache import AbstractCache
+from config import db_config
+
+
+class SqliteCache(AbstractCache):
+
+    def __init__(self, db_path: str = db_config.SQLITE_CACHE_PATH):
+        """
+        打开（不存在则创建）缓存文件，并清理已过期的键
+        :param db_path: 缓存文件路径
+        """
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expire_at REAL NOT NULL)")
+        self._conn.execute("DELETE FROM cache WHERE expire_at < ?", (time.time(),))
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if getattr(self, "_conn", None) is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        从缓存中获取键的值, 并且反序列化，已过期的键返回None
+        :param key:
+        :return:
+        """
+        row = self._conn.execute("SELECT value FROM cache WHERE key = ? AND expire_at >= ?", (key, time.time())).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0])
+
+    def set(self, key: str, value: Any, expire_time: int) -> None:
+        """
+        将键的值设置到缓存中, 并且序列化
+        :param key:
+        :param value:
+        :param expire_time: 过期时间（秒）
+        :return:
+        """
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expire_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value), time.time() + expire_time),
+        )
+
+    def keys(self, pattern: str) -> List[str]:
+        """
+        获取所有符合pattern的key，pattern 与 redis 一致使用 * 通配符
+        """
+        rows = self._conn.execute("SELECT key FROM cache WHERE key GLOB ? AND expire_at >= ?", (pattern, time.time()))
+        return [row[0] for row in rows]
@@ -61,7 +61,9 @@ class SaveDataOptionEnum(str, Enum):
     CSV = "csv"
     DB = "db"
     JSON = "json"
+    JSONL = "jsonl"
     SQLITE = "sqlite"
+    PARQUET = "parquet"
 
 
 class InitDbOptionEnum(str, Enum):
@@ -71,6 +73,13 @@ class InitDbOptionEnum(str, Enum):
     MYSQL = "mysql"
 
 
+class CassetteModeEnum(str, Enum):
+    """请求录制 / 回放模式"""
+
+    RECORD = "record"
+    REPLAY = "replay"
+
+
 def _to_bool(value: bool | str) -> bool:
     if isinstance(value, bool):
         return value
@@ -160,6 +169,14 @@ async def parse_cmd(argv: Optional[Sequence[str]] = None):
                 rich_help_panel="基础配置",
             ),
         ] = config.START_PAGE,
+        resume: Annotated[
+            bool,
+            typer.Option(
+                "--resume",
+                help="从上次中断的关键词搜索断点继续爬取（关键词需与上次一致）",
+                rich_help_panel="基础配置",
+            ),
+        ] = config.RESUME_SEARCH,
         keywords: Annotated[
             str,
             typer.Option(
@@ -190,7 +207,7 @@ async def parse_cmd(argv: Optional[Sequence[str]] = None):
             SaveDataOptionEnum,
             typer.Option(
                 "--save_data_option",
-                help="数据保存方式 (csv=CSV文件 | db=MySQL数据库 | json=JSON文件 | sqlite=SQLite数据库)",
+                help="数据保存方式 (csv=CSV文件 | db=MySQL数据库 | json=JSON文件 | jsonl=JSON Lines文件 | sqlite=SQLite数据库 | parquet=Parquet列式文件)",
                 rich_help_panel="存储配置",
             ),
         ] = _coerce_enum(
@@ -204,6 +221,38 @@ async def parse_cmd(argv: Optional[Sequence[str]] = None):
                 rich_help_panel="存储配置",
             ),
         ] = None,
+        migrate_db: Annotated[
+            Optional[InitDbOptionEnum],
+            typer.Option(
+                "--migrate_db",
+                help="迁移已有数据库：去重并补齐自然键唯一约束 (sqlite | mysql)",
+                rich_help_panel="存储配置",
+            ),
+        ] = None,
+        backfill_counters: Annotated[
+            Optional[InitDbOptionEnum],
+            typer.Option(
+                "--backfill_counters",
+                help="为已有数据补齐互动数整数列 xxx_num 及其索引 (sqlite | mysql)",
+                rich_help_panel="存储配置",
+            ),
+        ] = None,
+        media_report: Annotated[
+            bool,
+            typer.Option(
+                "--media_report",
+                help="输出媒体下载清单统计：各平台文件数、占用空间和未下载成功的文件",
+                rich_help_panel="存储配置",
+            ),
+        ] = False,
+        cassette: Annotated[
+            Optional[CassetteModeEnum],
+            typer.Option(
+                "--cassette",
+                help="请求录制 / 回放 (record=录制请求和响应到 CASSETTE_PATH | replay=从 CASSETTE_PATH 回放，不访问网络)",
+                rich_help_panel="基础配置",
+            ),
+        ] = None,
         cookies: Annotated[
             str,
             typer.Option(
@@ -218,28 +267,38 @@ async def parse_cmd(argv: Optional[Sequence[str]] = None):
         enable_comment = _to_bool(get_comment)
         enable_sub_comment = _to_bool(get_sub_comment)
         init_db_value = init_db.value if init_db else None
+        migrate_db_value = migrate_db.value if migrate_db else None
+        backfill_counters_value = backfill_counters.value if backfill_counters else None
 
         # override global config
         config.PLATFORM = platform.value
         config.LOGIN_TYPE = lt.value
         config.CRAWLER_TYPE = crawler_type.value
         config.START_PAGE = start
+        config.RESUME_SEARCH = resume
         config.KEYWORDS = keywords
         config.ENABLE_GET_COMMENTS = enable_comment
         config.ENABLE_GET_SUB_COMMENTS = enable_sub_comment
         config.SAVE_DATA_OPTION = save_data_option.value
         config.COOKIES = cookies
+        if cassette:
+            config.CASSETTE_MODE = cassette.value
 
         return SimpleNamespace(
             platform=config.PLATFORM,
             lt=config.LOGIN_TYPE,
             type=config.CRAWLER_TYPE,
             start=config.START_PAGE,
+            resume=config.RESUME_SEARCH,
             keywords=config.KEYWORDS,
             get_comment=config.ENABLE_GET_COMMENTS,
             get_sub_comment=config.ENABLE_GET_SUB_COMMENTS,
             save_data_option=config.SAVE_DATA_OPTION,
             init_db=init_db_value,
+            migrate_db=migrate_db_value,
+            backfill_counters=backfill_counters_value,
+            media_report=media_report,
+            cassette=config.CASSETTE_MODE,
             cookies=config.COOKIES,
         )
 
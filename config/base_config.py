@@ -61,8 +61,47 @@ BROWSER_LAUNCH_TIMEOUT = 30
 # 设置为False可以保持浏览器运行，便于调试
 AUTO_CLOSE_BROWSER = True
 
-# 数据保存类型选项配置,支持四种类型：csv、db、json、sqlite, 最好保存到DB，有排重的功能。
-SAVE_DATA_OPTION = "json"  # csv or db or json or sqlite
+# 数据保存类型选项配置,支持六种类型：csv、db、json、jsonl、sqlite、parquet, 最好保存到DB，有排重的功能。
+# jsonl 每条数据追加一行，不会重读整个文件，数据量大时建议使用 jsonl 代替 json
+# parquet 按列存储，计数和时间戳字段为整数列，适合直接用于数据分析
+SAVE_DATA_OPTION = "json"  # csv or db or json or jsonl or sqlite or parquet
+
+# jsonl 模式下，运行结束后是否把当天的 jsonl 文件合并成旧版的 json 数组文件（data/<platform>/json/ 目录）
+ENABLE_JSONL_COMPACT = False
+
+# csv 模式下缓冲的行数和时间（秒），达到其一就写入文件，程序退出时会写入剩余数据
+CSV_FLUSH_ROW_COUNT = 100
+CSV_FLUSH_INTERVAL_SEC = 5
+
+# csv / jsonl 文件压缩方式："" 不压缩 | gzip | zstd（需安装 zstandard），压缩后文件名追加 .gz / .zst
+FILE_COMPRESSION = ""
+# csv / jsonl 文件按大小（MB，按已写入磁盘的字节计算）或条数切分，0 表示不切分。切分后文件名为
+# <crawler_type>_<item_type>_<日期>.0001.<csv|jsonl>[.gz|.zst]，写入中的分片带 .part 后缀，写完后去掉，下游可直接处理已写完的分片
+# json 模式每条数据都要重写整个文件，不支持压缩和切分，数据量大时请使用 jsonl
+FILE_ROTATE_MAX_MB = 0
+FILE_ROTATE_MAX_ITEMS = 0
+
+# parquet 模式下每攒够多少条数据写一个 row group（内存占用上限），文件在程序退出时才写入 footer，之前不可读
+PARQUET_ROW_GROUP_SIZE = 5000
+# parquet 压缩方式：snappy | zstd | gzip | none
+PARQUET_COMPRESSION = "snappy"
+
+# 存储写入队列：爬虫只把待存储的数据放进有界队列，由后台任务批量写入，存储变慢时不会直接拖住网络请求；
+# 开启后存储出错只记录日志，不会中断爬取，默认关闭
+ENABLE_STORE_QUEUE = False
+# 队列长度上限，队列满时爬虫会等待（背压），避免内存无限增长
+STORE_QUEUE_MAX_SIZE = 1000
+# 后台写入任务数
+STORE_QUEUE_WORKERS = 2
+# 每个写入任务一次最多取出的数据批数，db/sqlite 模式下同一批在一个事务中提交
+STORE_QUEUE_BATCH_SIZE = 50
+
+# 跨运行的已爬取内容索引：关键词搜索时跳过之前已爬取过的内容（不再获取详情、评论和媒体），指定id/创作者模式不受影响
+ENABLE_SEEN_INDEX = False
+# 索引存放位置：sqlite（本地文件 database/cache.db）| redis（多台机器共享）
+SEEN_INDEX_CACHE_TYPE = "sqlite"
+# 距上次爬取超过多少秒后重新爬取（更新点赞、评论等数据），0 表示不再重新爬取
+SEEN_INDEX_RECRAWL_AGE = 7 * 24 * 3600
 
 # 用户浏览器缓存的浏览器文件配置
 USER_DATA_DIR = "%s_user_data_dir"  # %s will be replaced by platform name
@@ -70,6 +109,11 @@ USER_DATA_DIR = "%s_user_data_dir"  # %s will be replaced by platform name
 # 爬取开始页数 默认从第一页开始
 START_PAGE = 1
 
+# 关键词搜索时每爬完一页把进度（关键词、页码、游标、日期）记录到 data/<platform>/checkpoint/search.json，默认关闭
+ENABLE_SEARCH_CHECKPOINT = False
+# 是否从上次中断的断点继续搜索（命令行 --resume），关键词列表需与上次一致；续爬时同样记录断点
+RESUME_SEARCH = False
+
 # 爬取视频/帖子的数量控制
 CRAWLER_MAX_NOTES_COUNT = 15
 
@@ -79,6 +123,38 @@ MAX_CONCURRENCY_NUM = 1
 # 是否开启爬媒体模式（包含图片或视频资源），默认不开启爬媒体
 ENABLE_GET_MEIDAS = False
 
+# 媒体文件流式下载的块大小（字节），每个下载同时只在内存中保留一个块，下载中的文件带 .part 后缀，完成后重命名
+MEDIA_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# 下载中断（连接断开、超时、收到的字节数与 Content-Length 不一致）时按 Range 从断点续传的次数，
+# 重试后仍失败的 .part 文件会保留，下次运行时继续下载
+MEDIA_DOWNLOAD_RETRY_TIMES = 3
+# 大文件分段并发下载的段数，1 表示不分段；只对服务端支持 Range 且不小于 MEDIA_DOWNLOAD_SEGMENT_MIN_SIZE（字节）的文件分段
+# 开启下载池时每段占用一个同域名的并发名额（MEDIA_DOWNLOAD_PER_HOST）
+MEDIA_DOWNLOAD_SEGMENTS = 1
+MEDIA_DOWNLOAD_SEGMENT_MIN_SIZE = 32 * 1024 * 1024
+
+# 媒体去重：文件按内容 sha256 只保存一份（MEDIA_BLOB_DIR/blobs），并记录 url -> 文件的索引，已下载过的 url 不再请求，
+# data/<platform>/images、videos 下的文件是指向同一份文件的硬链接（文件系统不支持硬链接时复制）
+ENABLE_MEDIA_DEDUPE = False
+MEDIA_BLOB_DIR = "data/media"
+
+# 媒体下载清单：在 MEDIA_BLOB_DIR/media_index.db 的 media_manifest 表中记录每个媒体文件的 url、内容 id、保存路径、
+# 大小、sha256、下载状态和时间，python main.py --media_report 输出占用空间和未下载成功的文件，默认关闭
+ENABLE_MEDIA_MANIFEST = False
+# 清单中已下载成功且文件仍在的媒体不再下载，重新运行时只下载之前失败或中断的文件
+MEDIA_SKIP_DOWNLOADED = True
+
+# 媒体下载池：爬虫只把图片/视频下载任务放进有界队列，由后台任务并发下载，不再逐个下载并等待，默认关闭
+ENABLE_MEDIA_DOWNLOAD_POOL = False
+# 同时下载的媒体数量上限
+MEDIA_DOWNLOAD_CONCURRENCY = 8
+# 每个 CDN 域名同时下载的数量上限
+MEDIA_DOWNLOAD_PER_HOST = 4
+# 队列长度上限，队列满时爬虫会等待（背压）
+MEDIA_DOWNLOAD_QUEUE_SIZE = 200
+# 每隔多少秒输出一次下载速度和队列长度，0 表示只在结束时输出
+MEDIA_DOWNLOAD_STATS_INTERVAL = 30
+
 # 是否开启爬评论模式, 默认开启爬评论
 ENABLE_GET_COMMENTS = True
 
@@ -89,6 +165,11 @@ CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES = 10
 # 老版本项目使用了 db, 则需参考 schema/tables.sql line 287 增加表字段
 ENABLE_GET_SUB_COMMENTS = False
 
+# 增量爬取评论：按时间倒序翻页，翻到已存储的评论（不晚于库中该内容最新评论的发布时间）即停止，适合定期监控重复爬取
+# 只支持 db / sqlite 存储，以及评论接口可按时间排序的平台（bili、zhihu），其他平台仍按原方式爬取
+# 已存储的旧评论下新增的二级评论不会被爬取
+ENABLE_INCREMENTAL_COMMENTS = False
+
 # 词云相关
 # 是否开启生成评论词云图
 ENABLE_GET_WORDCLOUD = False
@@ -108,6 +189,46 @@ FONT_PATH = "./docs/STZHONGS.TTF"
 # 爬取间隔时间
 CRAWLER_MAX_SLEEP_SEC = 2
 
+# 各平台 API 客户端的长连接池（每个代理一个），请求复用 TCP / TLS 连接
+# 最大连接数、保持空闲的最大连接数、空闲连接保持时间（秒）
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_KEEPALIVE_EXPIRY = 30
+# API 请求失败（连接错误、超时，以及各平台认为可以重试的接口错误）时的重试次数和间隔（秒）
+API_RETRY_TIMES = 2
+API_RETRY_WAIT_SEC = 1
+
+# 令牌桶限速：按平台和接口类别（search 搜索 / comment 评论 / default 其他）限制每秒请求数，
+# 开启后并发任务不再在持有并发名额时 sleep CRAWLER_MAX_SLEEP_SEC，请求速率达到配置值而不是被空等拉低
+# 默认速率为 MAX_CONCURRENCY_NUM / CRAWLER_MAX_SLEEP_SEC，与原来的请求频率相当；默认关闭，按 CRAWLER_MAX_SLEEP_SEC 等待
+ENABLE_RATE_LIMIT = False
+# 单独设置某类接口（search / comment / default）的速率（次/秒），如 {"comment": 2, "search": 0.5}，0 表示不限速；
+# 没有单独设置的接口类别共用一个令牌桶，总速率为默认速率
+RATE_LIMIT_PER_SEC = {}
+# 令牌桶容量，即允许的突发请求数
+RATE_LIMIT_BURST = 1
+# 服务端返回 429 但没有 Retry-After 时暂停该类接口的秒数，有 Retry-After 时按服务端要求暂停
+RATE_LIMIT_BACKOFF_SEC = 30
+
+# 请求录制 / 回放，用于离线、可重复地测试和分析爬虫性能：
+# record 把平台客户端的请求和响应、签名用到的 page.evaluate 结果写入 CASSETTE_PATH，replay 从中返回响应，不访问网络
+# 空字符串表示不开启，也可以用命令行 --cassette record / replay 设置
+CASSETTE_MODE = ""
+CASSETTE_PATH = "data/cassettes/{platform}.jsonl"
+# 回放时每个请求的耗时（毫秒），None 表示按录制时的实际耗时
+CASSETTE_REPLAY_LATENCY_MS = None
+# 图片、视频等媒体响应和超过该大小（字节）的响应，录制时边下载边写入 CASSETTE_PATH 旁的 {platform}_bodies 目录，
+# cassette 中只记录文件名，回放时从文件流式返回，不把整个响应体读入内存
+CASSETTE_INLINE_MAX_SIZE = 1024 * 1024
+# 不写入 cassette 的敏感字段（小写）：请求参数、请求体字段、响应头和 localStorage 中的 Cookie、登录态和签名
+CASSETTE_SECRET_NAMES = [
+    "cookie", "set-cookie", "authorization", "x-s", "x-t", "x-s-common", "x-zse-96", "x-zst-81",
+    "a1", "web_session", "webid", "mstoken", "xmst", "a_bogus", "x-bogus", "verifyfp", "fp",
+    "w_rid", "sessdata", "bili_jct", "z_c0",
+]
+# 匹配录制的请求时忽略的参数（小写），如时间戳等每次请求都不同的值
+CASSETTE_IGNORE_PARAMS = ["wts", "ts", "t", "_", "timestamp", "search_id", "request_id"]
+
 from .bilibili_config import *
 from .xhs_config import *
 from .dy_config import *
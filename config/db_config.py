@@ -26,6 +26,19 @@ mysql_db_config = {
     "db_name": MYSQL_DB_NAME,
 }
 
+# db connection pool config
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))  # 连接池常驻连接数
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))  # 连接池满时允许额外创建的连接数
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 3600))  # 连接最大存活秒数，需小于 MySQL 的 wait_timeout
+DB_POOL_PRE_PING = True  # 取出连接前先 ping 一次，自动替换已断开的连接
+
+db_pool_config = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
 
 # redis config
 REDIS_DB_HOST = "127.0.0.1"  # your redis host
@@ -36,6 +49,7 @@ REDIS_DB_NUM = os.getenv("REDIS_DB_NUM", 0)  # your redis db num
 # cache type
 CACHE_TYPE_REDIS = "redis"
 CACHE_TYPE_MEMORY = "memory"
+CACHE_TYPE_SQLITE = "sqlite"
 
 # sqlite config
 SQLITE_DB_PATH = os.path.join(
@@ -43,3 +57,20 @@ SQLITE_DB_PATH = os.path.join(
 )
 
 sqlite_db_config = {"db_path": SQLITE_DB_PATH}
+
+# sqlite 文件缓存路径（CACHE_TYPE_SQLITE）
+SQLITE_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "database", "cache.db"
+)
+
+# sqlite high-throughput config
+SQLITE_JOURNAL_MODE = "WAL"  # WAL 模式下读写互不阻塞
+SQLITE_SYNCHRONOUS = "NORMAL"  # WAL 模式下 NORMAL 不会损坏数据库，且每次提交少一次 fsync
+SQLITE_BUSY_TIMEOUT_MS = 5000  # 数据库被锁时最多等待的毫秒数，超时才报 database is locked
+SQLITE_SINGLE_WRITER = False  # 是否由单个写入任务合并提交所有写入，默认关闭
+SQLITE_WRITER_BATCH_SIZE = 200  # 单次提交最多合并的写入次数
+SQLITE_WRITER_FLUSH_INTERVAL_SEC = 0.05  # 写入任务攒批的最长等待秒数
+SQLITE_COMMIT_STATS_INTERVAL = 100  # 每提交多少次输出一次提交耗时统计，0 表示只在关闭时输出
+
+# 流式读取内容 / 评论表时每批读取的行数
+DB_STREAM_BATCH_SIZE = 1000
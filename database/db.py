@@ -12,7 +12,9 @@ if str(project_root) not in sys.path:
     sys.path.append(str(project_root))
 
 from tools import utils
-from database.db_session import create_tables
+from database.db_session import create_tables, get_async_engine
+from database.db_counters import backfill_counter_columns
+from database.db_migrate import add_missing_columns, migrate_unique_keys
 
 async def init_table_schema(db_type: str):
     """
@@ -28,6 +30,34 @@ async def init_table_schema(db_type: str):
 async def init_db(db_type: str = None):
     await init_table_schema(db_type)
 
+async def migrate_db(db_type: str = None):
+    """
+    Migrate an existing database to the current ORM models in place:
+    create missing tables, columns and indexes, de-duplicate rows and add the natural-key unique constraints.
+    Args:
+        db_type: The type of database, 'sqlite' or 'mysql'.
+    """
+    await init_table_schema(db_type)
+    utils.logger.info(f"[migrate_db] begin migrate {db_type} columns and unique keys ...")
+    async with get_async_engine(db_type).begin() as conn:
+        await conn.run_sync(add_missing_columns)
+        migrated = await conn.run_sync(migrate_unique_keys)
+    utils.logger.info(f"[migrate_db] {db_type} migrate successful, migrated tables: {list(migrated)}")
+
+async def backfill_counters(db_type: str = None):
+    """
+    Add the integer engagement counter columns (xxx_num) to an existing database
+    and fill them from the text counters of the rows stored before.
+    Args:
+        db_type: The type of database, 'sqlite' or 'mysql'.
+    """
+    await init_table_schema(db_type)
+    async with get_async_engine(db_type).begin() as conn:
+        await conn.run_sync(add_missing_columns)
+    async with get_async_engine(db_type).connect() as conn:
+        updated = await conn.run_sync(backfill_counter_columns)
+    utils.logger.info(f"[backfill_counters] {db_type} backfill successful, updated rows: {updated}")
+
 async def close():
     """
     Placeholder for closing database connections if needed in the future.
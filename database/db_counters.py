@@ -0,0 +1,99 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 互动数整数列：文本计数列 xxx（如 "1.2万"）对应的整数列 xxx_num，写入时解析一次，便于排序和按互动数筛选
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Table, and_, bindparam, inspect, or_, select, update
+from sqlalchemy.engine import Connection
+
+from tools import utils
+from tools.crawler_util import match_interact_info_count
+
+from .models import Base
+
+# 整数列名后缀
+COUNTER_SUFFIX = "_num"
+
+
+@lru_cache(maxsize=None)
+def get_counter_columns(table: Table) -> Dict[str, str]:
+    """
+    获取表中的互动数整数列
+    Returns:
+        {整数列名: 文本计数列名}
+    """
+    return {
+        column.name: column.name[:-len(COUNTER_SUFFIX)]
+        for column in table.columns
+        if column.name.endswith(COUNTER_SUFFIX) and column.name[:-len(COUNTER_SUFFIX)] in table.c
+    }
+
+
+def counter_value(value: Any) -> Optional[int]:
+    """
+    文本计数列对应的整数值，文本缺失（None、空串或早期写入的 "None"）时为 None，与 0 区分
+    """
+    if value is None or str(value).strip() in ("", "None"):
+        return None
+    return match_interact_info_count(value)
+
+
+def fill_counter_columns(table: Table, row: Dict):
+    """
+    根据行中的文本计数列补齐对应的整数列，文本计数列为空时整数列也为空
+    """
+    for counter_column, source_column in get_counter_columns(table).items():
+        if source_column in row:
+            row[counter_column] = counter_value(row[source_column])
+
+
+def backfill_counter_columns(connection: Connection, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    为已有数据补齐互动数整数列，按主键分批处理，每批提交一次，中断后重新执行会跳过已补齐的行
+    Args:
+        connection: 同步连接，异步引擎下通过 conn.run_sync 调用
+        batch_size: 每批处理的行数
+
+    Returns:
+        {表名: 更新的行数}
+    """
+    updated = {}
+    db_tables = set(inspect(connection).get_table_names())
+    for table_name, table in Base.metadata.tables.items():
+        counter_columns = get_counter_columns(table)
+        if not counter_columns or table_name not in db_tables:
+            continue
+        missing = or_(*[and_(table.c[counter].is_(None), table.c[source].isnot(None), table.c[source].notin_(("", "None")))
+                         for counter, source in counter_columns.items()])
+        stmt = update(table).where(table.c.id == bindparam("row_id")).values({counter: bindparam(counter) for counter in counter_columns})
+        last_id, count = 0, 0
+        while True:
+            rows = connection.execute(
+                select(table.c.id, *[table.c[source] for source in counter_columns.values()])
+                .where(table.c.id > last_id, missing).order_by(table.c.id).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+            params = []
+            for row in rows:
+                param = {"row_id": row["id"]}
+                for counter, source in counter_columns.items():
+                    param[counter] = counter_value(row[source])
+                params.append(param)
+            connection.execute(stmt, params)
+            connection.commit()
+            last_id, count = rows[-1]["id"], count + len(rows)
+        utils.logger.info(f"[backfill_counter_columns] {table_name}: {count} rows updated")
+        updated[table_name] = count
+    return updated
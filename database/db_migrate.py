@@ -0,0 +1,182 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 为已有数据库补齐 ORM 模型中声明的自然键唯一约束（先去重，再原地建唯一索引），SQLite 与 MySQL 通用
+from typing import Dict, List, Sequence, Set, Tuple
+
+from sqlalchemy import Table, and_, delete, func, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn, UniqueConstraint
+
+from tools import utils
+
+from .models import Base
+
+UniqueKey = Tuple[str, ...]
+
+
+def get_orm_unique_keys() -> Dict[str, List[UniqueKey]]:
+    """
+    获取 ORM 模型中声明的唯一键（列上的 unique、UniqueConstraint、唯一索引）
+    Returns:
+        {表名: [唯一键列名元组, ...]}
+    """
+    schema = {}
+    for table_name, table in Base.metadata.tables.items():
+        keys: List[UniqueKey] = []
+        for column in table.columns:
+            if column.unique and not column.primary_key:
+                keys.append((column.name,))
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint):
+                keys.append(tuple(c.name for c in constraint.columns))
+        for index in table.indexes:
+            if index.unique:
+                keys.append(tuple(c.name for c in index.columns))
+        schema[table_name] = list(dict.fromkeys(keys))
+    return schema
+
+
+def get_db_unique_keys(bind) -> Dict[str, Set[UniqueKey]]:
+    """
+    获取数据库中实际存在的唯一键
+    Args:
+        bind: 同步的 Engine 或 Connection
+
+    Returns:
+        {表名: {唯一键列名元组, ...}}，列名按字母序排列，便于比较
+    """
+    inspector = inspect(bind)
+    schema = {}
+    for table_name in inspector.get_table_names():
+        keys = {tuple(sorted(uc["column_names"])) for uc in inspector.get_unique_constraints(table_name)}
+        keys.update(tuple(sorted(index["column_names"])) for index in inspector.get_indexes(table_name) if index["unique"])
+        schema[table_name] = keys
+    return schema
+
+
+def compare_unique_keys(db_keys: Dict[str, Set[UniqueKey]], orm_keys: Dict[str, List[UniqueKey]]) -> Dict[str, List[UniqueKey]]:
+    """
+    比较数据库与 ORM 模型的唯一键，返回数据库中缺失的唯一键（数据库中不存在的表交给建表处理，不在此返回）
+    """
+    missing = {}
+    for table_name, keys in orm_keys.items():
+        if table_name not in db_keys:
+            continue
+        table_missing = [key for key in keys if tuple(sorted(key)) not in db_keys[table_name]]
+        if table_missing:
+            missing[table_name] = table_missing
+    return missing
+
+
+def dedupe_rows(connection: Connection, table: Table, key_columns: Sequence[str]) -> int:
+    """
+    删除自然键重复的记录，每个自然键只保留 id 最大（最后写入）的一条，自然键为空的记录不处理
+    Returns:
+        删除的记录数
+    """
+    keys = [table.c[name] for name in key_columns]
+    key_not_null = and_(*[key.isnot(None) for key in keys])
+    # 包一层派生表，避免 MySQL 不允许在 DELETE 的子查询中直接引用目标表
+    keep_ids = select(func.max(table.c.id).label("id")).where(key_not_null).group_by(*keys).subquery("keep_ids")
+    stmt = delete(table).where(key_not_null, table.c.id.not_in(select(keep_ids.c.id)))
+    return connection.execute(stmt).rowcount
+
+
+def _unique_index_name(table: Table, key_columns: Sequence[str]) -> str:
+    """
+    唯一索引名优先沿用 ORM 中的索引名 / 约束名，保证与新建库一致
+    """
+    for index in table.indexes:
+        if index.unique and [c.name for c in index.columns] == list(key_columns):
+            return index.name
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint) and constraint.name and [c.name for c in constraint.columns] == list(key_columns):
+            return constraint.name
+    return f"uq_{table.name}_{'_'.join(key_columns)}"
+
+
+def add_unique_key(connection: Connection, table: Table, key_columns: Sequence[str]) -> str:
+    """
+    将同列上的普通索引替换为唯一索引
+    Returns:
+        唯一索引名
+    """
+    preparer = connection.dialect.identifier_preparer
+    quoted_table = preparer.quote(table.name)
+    index_name = _unique_index_name(table, key_columns)
+    for index in inspect(connection).get_indexes(table.name):
+        if index["unique"] or (index["column_names"] != list(key_columns) and index["name"] != index_name):
+            continue
+        if connection.dialect.name == "mysql":
+            connection.execute(text(f"DROP INDEX {preparer.quote(index['name'])} ON {quoted_table}"))
+        else:
+            connection.execute(text(f"DROP INDEX {preparer.quote(index['name'])}"))
+
+    quoted_columns = ", ".join(preparer.quote(name) for name in key_columns)
+    connection.execute(text(f"CREATE UNIQUE INDEX {preparer.quote(index_name)} ON {quoted_table} ({quoted_columns})"))
+    return index_name
+
+
+def add_missing_columns(connection: Connection) -> Dict[str, List[str]]:
+    """
+    为已有的表补齐 ORM 模型中新增的列（只支持可为空的列），以及新增的普通索引
+    Args:
+        connection: 同步连接，异步引擎下通过 conn.run_sync 调用
+
+    Returns:
+        {表名: [新增的列名, ...]}
+    """
+    inspector = inspect(connection)
+    db_tables = set(inspector.get_table_names())
+    added = {}
+    for table_name, table in Base.metadata.tables.items():
+        if table_name not in db_tables:
+            continue
+        db_columns = {c["name"] for c in inspector.get_columns(table_name)}
+        missing_columns = [column for column in table.columns if column.name not in db_columns]
+        for column in missing_columns:
+            column_spec = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {connection.dialect.identifier_preparer.quote(table_name)} ADD COLUMN {column_spec}"))
+        if missing_columns:
+            added[table_name] = [column.name for column in missing_columns]
+            utils.logger.info(f"[add_missing_columns] {table_name}: added columns {added[table_name]}")
+
+        db_indexes = {index["name"] for index in inspector.get_indexes(table_name)}
+        for index in table.indexes:
+            if not index.unique and index.name not in db_indexes:
+                index.create(connection)
+                utils.logger.info(f"[add_missing_columns] {table_name}: created index {index.name}")
+    return added
+
+
+def migrate_unique_keys(connection: Connection) -> Dict[str, List[UniqueKey]]:
+    """
+    为已有数据库补齐自然键唯一约束：逐个缺失的唯一键先去重，再原地建唯一索引
+    Args:
+        connection: 同步连接，异步引擎下通过 conn.run_sync 调用
+
+    Returns:
+        本次补齐的唯一键
+    """
+    missing = compare_unique_keys(get_db_unique_keys(connection), get_orm_unique_keys())
+    db_columns = {name: {c["name"] for c in inspect(connection).get_columns(name)} for name in missing}
+    for table_name, keys in missing.items():
+        table = Base.metadata.tables[table_name]
+        for key_columns in keys:
+            if not set(key_columns) <= db_columns[table_name]:
+                utils.logger.warning(f"[migrate_unique_keys] table {table_name} missing columns {key_columns}, please sync table schema first")
+                continue
+            removed = dedupe_rows(connection, table, key_columns)
+            index_name = add_unique_key(connection, table, key_columns)
+            utils.logger.info(f"[migrate_unique_keys] {table_name}{key_columns}: removed {removed} duplicate rows, created unique index {index_name}")
+    return missing
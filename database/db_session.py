@@ -1,13 +1,23 @@
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+import asyncio
+from contextvars import Context, ContextVar
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from contextlib import asynccontextmanager
 from .models import Base
+from .sqlite_writer import SqliteWriter
 import config
-from config.db_config import mysql_db_config, sqlite_db_config
+from config.db_config import db_pool_config, mysql_db_config, sqlite_db_config
 
 # Keep a cache of engines
 _engines = {}
+# Keep a cache of session factories, one per engine
+_session_factories = {}
+# Session shared by the current unit of work, see unit_of_work()
+_current_session: ContextVar[Optional[AsyncSession]] = ContextVar("current_db_session", default=None)
+# Single writer task for sqlite, see get_sqlite_writer()
+_sqlite_writer: Optional[SqliteWriter] = None
 
 
 async def create_database_if_not_exists(db_type: str):
@@ -27,7 +37,7 @@ def get_async_engine(db_type: str = None):
     if db_type in _engines:
         return _engines[db_type]
 
-    if db_type in ["json", "csv"]:
+    if db_type in ["json", "jsonl", "csv", "parquet"]:
         return None
 
     if db_type == "sqlite":
@@ -37,11 +47,42 @@ def get_async_engine(db_type: str = None):
     else:
         raise ValueError(f"Unsupported database type: {db_type}")
 
-    engine = create_async_engine(db_url, echo=False)
+    engine = create_async_engine(db_url, echo=False, **db_pool_config)
+    if db_type == "sqlite":
+        _setup_sqlite_engine(engine)
     _engines[db_type] = engine
     return engine
 
 
+def _setup_sqlite_engine(engine):
+    """
+    Apply the sqlite pragmas on every new connection and let SQLAlchemy emit BEGIN itself,
+    so SAVEPOINT (used by the single writer) works with the sqlite driver.
+    """
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.close()
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def on_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def get_session_factory(db_type: str = None) -> Optional[async_sessionmaker]:
+    engine = get_async_engine(db_type)
+    if not engine:
+        return None
+    if engine not in _session_factories:
+        _session_factories[engine] = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    return _session_factories[engine]
+
+
 async def create_tables(db_type: str = None):
     if db_type is None:
         db_type = config.SAVE_DATA_OPTION
@@ -54,12 +95,28 @@ async def create_tables(db_type: str = None):
 
 @asynccontextmanager
 async def get_session() -> AsyncSession:
-    engine = get_async_engine(config.SAVE_DATA_OPTION)
-    if not engine:
+    """
+    Yield a session that commits on exit, or the session of the enclosing unit_of_work()
+    which is committed once when the unit of work ends.
+    """
+    current_session = _current_session.get()
+    if current_session is not None:
+        yield current_session
+        return
+    sqlite_writer = get_sqlite_writer()
+    if sqlite_writer:
+        async with sqlite_writer.session() as session:
+            token = _current_session.set(session)
+            try:
+                yield session
+            finally:
+                _current_session.reset(token)
+        return
+    session_factory = get_session_factory(config.SAVE_DATA_OPTION)
+    if not session_factory:
         yield None
         return
-    AsyncSessionFactory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-    session = AsyncSessionFactory()
+    session = session_factory()
     try:
         yield session
         await session.commit()
@@ -67,4 +124,60 @@ async def get_session() -> AsyncSession:
         await session.rollback()
         raise e
     finally:
-        await session.close()
\ No newline at end of file
+        await session.close()
+
+
+def get_sqlite_writer() -> Optional[SqliteWriter]:
+    """
+    Return the single writer of the running event loop when sqlite single writer mode is on
+    """
+    global _sqlite_writer
+    if config.SAVE_DATA_OPTION != "sqlite" or not config.SQLITE_SINGLE_WRITER:
+        return None
+    if _sqlite_writer is None or _sqlite_writer.loop is not asyncio.get_running_loop():
+        _sqlite_writer = SqliteWriter(
+            get_session_factory("sqlite"),
+            batch_size=config.SQLITE_WRITER_BATCH_SIZE,
+            flush_interval=config.SQLITE_WRITER_FLUSH_INTERVAL_SEC,
+            stats_interval=config.SQLITE_COMMIT_STATS_INTERVAL,
+        )
+        _sqlite_writer.start()
+    return _sqlite_writer
+
+
+async def close_sqlite_writer():
+    """
+    Commit what the sqlite writer still holds and stop it, reporting the commit latency
+    """
+    global _sqlite_writer
+    if _sqlite_writer is not None and _sqlite_writer.loop is asyncio.get_running_loop():
+        await _sqlite_writer.close()
+    _sqlite_writer = None
+
+
+def bind_session(context: Context, session: Optional[AsyncSession]):
+    """
+    Make get_session() calls running in a copied context join the given session,
+    used to put work captured in other tasks into the current unit of work.
+    """
+    context.run(_current_session.set, session)
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncSession:
+    """
+    Let every get_session() call inside the block share one session and one commit,
+    e.g. to store a whole page of items in a single transaction.
+    The shared session must not be used by concurrent tasks, so only wrap sequential store calls.
+    """
+    if _current_session.get() is not None:
+        # nested unit of work joins the outer one
+        async with get_session() as session:
+            yield session
+        return
+    async with get_session() as session:
+        token = _current_session.set(session)
+        try:
+            yield session
+        finally:
+            _current_session.reset(token)
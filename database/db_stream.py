@@ -0,0 +1,105 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 按批流式读取内容 / 评论表（服务端游标 + yield_per），内存占用只与批大小有关；增量爬取用到的只读查询
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from sqlalchemy import BigInteger, cast, func, select
+
+import config
+
+from .db_session import get_session_factory
+
+
+async def stream_rows(model, filters: Sequence = (), batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+    """
+    按主键顺序流式读取一张表，每次产出一批行字典
+    Args:
+        model: ORM 模型
+        filters: where 条件
+        batch_size: 每批行数，默认 DB_STREAM_BATCH_SIZE
+
+    Returns:
+        行字典列表的异步迭代器
+    """
+    batch_size = batch_size or config.DB_STREAM_BATCH_SIZE
+    table = model.__table__
+    stmt = select(table).where(*filters).order_by(table.c.id).execution_options(yield_per=batch_size)
+    # 只读，不走 get_session：不占用 sqlite 单写入者，也不混进外层的 unit_of_work
+    async with get_session_factory()() as session:
+        result = await session.stream(stmt)
+        async for partition in result.mappings().partitions(batch_size):
+            yield [dict(row) for row in partition]
+
+
+def _build_filters(model, start_ts: Optional[int], end_ts: Optional[int], **equals: Any) -> List:
+    filters = []
+    if start_ts is not None:
+        filters.append(model.add_ts >= start_ts)
+    if end_ts is not None:
+        filters.append(model.add_ts < end_ts)
+    for column_name, value in equals.items():
+        if value is not None:
+            filters.append(getattr(model, column_name) == value)
+    return filters
+
+
+def stream_contents(model, key_column: str, key: Optional[Any] = None, keyword: Optional[str] = None,
+                    start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                    batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+    """
+    流式读取内容表
+    Args:
+        model: 内容模型，如 XhsNote
+        key_column: 内容 id 列名，如 note_id
+        key: 只读取该内容
+        keyword: 只读取该搜索关键词（source_keyword）下的内容
+        start_ts: 入库时间（add_ts，毫秒）下限，包含
+        end_ts: 入库时间（add_ts，毫秒）上限，不包含
+        batch_size: 每批行数
+    """
+    filters = _build_filters(model, start_ts, end_ts, **{key_column: key, "source_keyword": keyword})
+    return stream_rows(model, filters, batch_size)
+
+
+def stream_comments(model, content_model, key_column: str, key: Optional[Any] = None, keyword: Optional[str] = None,
+                    start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                    batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+    """
+    流式读取评论表，参数同 stream_contents，keyword 按评论所属内容的 source_keyword 过滤
+    Args:
+        model: 评论模型，如 XhsNoteComment
+        content_model: 评论所属的内容模型，如 XhsNote
+        key_column: 评论表和内容表共有的内容 id 列名，如 note_id
+    """
+    filters = _build_filters(model, start_ts, end_ts, **{key_column: key})
+    if keyword is not None:
+        content_keys = select(getattr(content_model, key_column)).where(content_model.source_keyword == keyword)
+        filters.append(getattr(model, key_column).in_(content_keys))
+    return stream_rows(model, filters, batch_size)
+
+
+async def get_latest_comment_time(model, key_column: str, key: Any, time_column: str = "create_time") -> Optional[int]:
+    """
+    获取某个内容下已存储评论的最新发布时间，作为增量爬取评论的高水位
+    Args:
+        model: 评论模型，如 BilibiliVideoComment
+        key_column: 内容 id 列名，如 video_id
+        key: 内容 id
+        time_column: 评论发布时间列名（秒级时间戳，部分表为文本列，按整数比较）
+
+    Returns:
+        最新发布时间，该内容还没有评论时返回 None
+    """
+    stmt = select(func.max(cast(getattr(model, time_column), BigInteger))).where(getattr(model, key_column) == key)
+    async with get_session_factory()() as session:
+        return await session.scalar(stmt)
@@ -0,0 +1,201 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 批量 upsert 工具，一页数据只发一条 INSERT ... ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import UniqueConstraint, select, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tools import utils
+
+from .db_counters import fill_counter_columns, get_counter_columns
+
+# 单条 INSERT 语句最多携带的行数，避免超出 SQLite 的绑定参数上限
+UPSERT_CHUNK_SIZE = 500
+
+# 这些列只在插入时写入，冲突更新时不覆盖
+_INSERT_ONLY_COLUMNS = {"id", "add_ts"}
+
+
+def has_unique_key(model, key_columns: Sequence[str]) -> bool:
+    """
+    判断 ORM 模型是否在 key_columns 上声明了唯一约束 / 唯一索引
+    Args:
+        model: ORM 模型类
+        key_columns: 自然键列名
+
+    Returns:
+
+    """
+    table = model.__table__
+    keys = set(key_columns)
+    if len(keys) == 1:
+        column = table.c[next(iter(keys))]
+        if column.primary_key or column.unique:
+            return True
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint) and {c.name for c in constraint.columns} == keys:
+            return True
+    return any(index.unique and {c.name for c in index.columns} == keys for index in table.indexes)
+
+
+def _prepare_rows(model, rows: List[Dict], key_columns: Sequence[str]) -> List[Dict]:
+    """
+    过滤掉模型中不存在的字段，补齐 add_ts 和互动数整数列，并按自然键去重（同一批次中后出现的数据为准）
+    """
+    columns = set(model.__table__.columns.keys())
+    has_add_ts = "add_ts" in columns
+    now_ts = utils.get_current_timestamp()
+    deduped: Dict[tuple, Dict] = {}
+    for row in rows:
+        clean_row = {k: v for k, v in row.items() if k in columns}
+        if has_add_ts and clean_row.get("add_ts") is None:
+            clean_row["add_ts"] = now_ts
+        fill_counter_columns(model.__table__, clean_row)
+        deduped[tuple(clean_row.get(k) for k in key_columns)] = clean_row
+    return list(deduped.values())
+
+
+def _group_by_fields(rows: List[Dict]) -> List[List[Dict]]:
+    """
+    按字段集合分组：多行 INSERT 要求每行字段一致，用 None 补齐缺失字段会在冲突更新时覆盖库中已有的数据
+    """
+    groups: Dict[frozenset, List[Dict]] = {}
+    for row in rows:
+        groups.setdefault(frozenset(row), []).append(row)
+    return list(groups.values())
+
+
+async def upsert_rows(
+    session: AsyncSession,
+    model,
+    rows: List[Dict],
+    key_columns: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+):
+    """
+    按自然键批量插入或更新
+    模型声明了自然键唯一约束时使用数据库原生 upsert，否则退化为一次 IN 查询 + 批量插入/更新，两种方式都在同一个 session 中完成
+    Args:
+        session: 数据库会话
+        model: ORM 模型类
+        rows: 待写入的数据
+        key_columns: 自然键列名，例如 ["comment_id"]
+        update_columns: 冲突时需要更新的列，默认为除自然键、id、add_ts 之外的所有列
+
+    Returns:
+
+    """
+    for group in _group_by_fields(_prepare_rows(model, rows, key_columns)):
+        await _upsert_group(session, model, group, key_columns, update_columns)
+
+
+async def _upsert_group(
+    session: AsyncSession,
+    model,
+    rows: List[Dict],
+    key_columns: Sequence[str],
+    update_columns: Optional[Sequence[str]],
+):
+    """
+    写入字段一致的一组数据
+    """
+    if update_columns is None:
+        update_columns = [c for c in rows[0] if c not in key_columns and c not in _INSERT_ONLY_COLUMNS]
+    else:
+        # 更新文本计数列时同时更新对应的整数列
+        counter_columns = get_counter_columns(model.__table__)
+        update_columns = list(update_columns) + [c for c, source in counter_columns.items() if source in update_columns]
+        update_columns = [c for c in update_columns if c in rows[0]]
+
+    dialect_name = session.bind.dialect.name
+    if has_unique_key(model, key_columns) and dialect_name in ("mysql", "sqlite"):
+        for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            await session.execute(_build_upsert_stmt(dialect_name, model, rows[i:i + UPSERT_CHUNK_SIZE], key_columns, update_columns))
+        return
+
+    await _merge_rows(session, model, rows, key_columns, update_columns)
+
+
+async def update_existing_rows(session: AsyncSession, model, rows: List[Dict], key_columns: Sequence[str]):
+    """
+    批量更新已存在的记录，库中不存在的数据直接丢弃
+    Args:
+        session: 数据库会话
+        model: ORM 模型类
+        rows: 待更新的数据
+        key_columns: 自然键列名
+
+    Returns:
+
+    """
+    rows = [{k: v for k, v in row.items() if k != "add_ts"} for row in _prepare_rows(model, rows, key_columns)]
+    for group in _group_by_fields(rows):
+        update_columns = [c for c in group[0] if c not in key_columns and c not in _INSERT_ONLY_COLUMNS]
+        await _merge_rows(session, model, group, key_columns, update_columns, insert_missing=False)
+
+
+def _build_upsert_stmt(dialect_name: str, model, rows: List[Dict], key_columns: Sequence[str], update_columns: Sequence[str]):
+    if dialect_name == "mysql":
+        stmt = mysql_insert(model).values(rows)
+        if not update_columns:
+            return stmt.prefix_with("IGNORE")
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in update_columns})
+
+    stmt = sqlite_insert(model).values(rows)
+    if not update_columns:
+        return stmt.on_conflict_do_nothing(index_elements=list(key_columns))
+    return stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={c: stmt.excluded[c] for c in update_columns},
+    )
+
+
+async def _merge_rows(
+    session: AsyncSession,
+    model,
+    rows: List[Dict],
+    key_columns: Sequence[str],
+    update_columns: Sequence[str],
+    insert_missing: bool = True,
+):
+    """
+    没有唯一约束时的批量写入：一次查询出已存在的记录，更新已存在的，插入新增的
+    """
+    key_attrs = [getattr(model, k) for k in key_columns]
+    row_keys = [tuple(row.get(k) for k in key_columns) for row in rows]
+    existing: Dict[tuple, object] = {}
+    for i in range(0, len(row_keys), UPSERT_CHUNK_SIZE):
+        chunk_keys = row_keys[i:i + UPSERT_CHUNK_SIZE]
+        if len(key_attrs) == 1:
+            stmt = select(model).where(key_attrs[0].in_([k[0] for k in chunk_keys]))
+        else:
+            stmt = select(model).where(tuple_(*key_attrs).in_(chunk_keys))
+        result = await session.execute(stmt)
+        for obj in result.scalars().all():
+            # 数据库中的类型可能与传入的不同（如 BigInteger 列传入字符串），统一按字符串比较
+            existing[tuple(str(getattr(obj, k)) for k in key_columns)] = obj
+
+    for row, row_key in zip(rows, row_keys):
+        obj = existing.get(tuple(str(k) for k in row_key))
+        if obj is None:
+            if not insert_missing:
+                continue
+            obj = model(**row)
+            session.add(obj)
+            existing[tuple(str(k) for k in row_key)] = obj
+        else:
+            for column in update_columns:
+                setattr(obj, column, row[column])
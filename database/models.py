@@ -36,11 +36,13 @@ class DailyNews(Base):
     rank_position = Column(Integer, index=True, comment="在热榜中的排名位置")
     add_ts = Column(BigInteger, nullable=False, comment="记录添加时间戳")
     last_modify_ts = Column(BigInteger, nullable=False, comment="记录最后修改时间戳")
-    __table_args__ = UniqueConstraint(
-        "news_id",
-        "source_platform",
-        "crawl_date",
-        name="idx_news_id_source_platform_crawl_date",
+    __table_args__ = (
+        UniqueConstraint(
+            "news_id",
+            "source_platform",
+            "crawl_date",
+            name="idx_news_id_source_platform_crawl_date",
+        ),
     )
 
 
@@ -64,7 +66,9 @@ class DailyTopics(Base):
     )
     add_ts = Column(BigInteger, nullable=False, comment="记录添加时间戳")
     last_modify_ts = Column(BigInteger, nullable=False, comment="记录最后修改时间戳")
-    UniqueConstraint("topic_id", "extract_date", name="idx_daily_topics_unique"),
+    __table_args__ = (
+        UniqueConstraint("topic_id", "extract_date", name="idx_daily_topics_unique"),
+    )
 
 
 class CrawlingTasks(Base):
@@ -140,7 +144,7 @@ class BilibiliVideo(Base):
     user_id = Column(BigInteger, index=True)
     nickname = Column(Text)
     avatar = Column(Text)
-    liked_count = Column(Integer)
+    liked_count = Column(Integer, index=True)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
     video_type = Column(Text)
@@ -148,10 +152,15 @@ class BilibiliVideo(Base):
     desc = Column(Text)
     create_time = Column(BigInteger, index=True)
     disliked_count = Column(Text)
+    disliked_count_num = Column(BigInteger)
     video_play_count = Column(Text)
+    video_play_count_num = Column(BigInteger, index=True)
     video_favorite_count = Column(Text)
+    video_favorite_count_num = Column(BigInteger)
     video_share_count = Column(Text)
+    video_share_count_num = Column(BigInteger)
     video_coin_count = Column(Text)
+    video_coin_count_num = Column(BigInteger)
     video_danmaku = Column(Text)
     video_comment = Column(Text)
     video_cover_url = Column(Text)
@@ -170,19 +179,21 @@ class BilibiliVideoComment(Base):
     avatar = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    comment_id = Column(BigInteger, index=True)
+    comment_id = Column(BigInteger, unique=True, index=True)
     video_id = Column(BigInteger, index=True)
     content = Column(Text)
     create_time = Column(BigInteger)
     sub_comment_count = Column(Text)
+    sub_comment_count_num = Column(BigInteger)
     parent_comment_id = Column(String(255))
     like_count = Column(Text, default="0")
+    like_count_num = Column(BigInteger, index=True)
 
 
 class BilibiliUpInfo(Base):
     __tablename__ = "bilibili_up_info"
     id = Column(Integer, primary_key=True)
-    user_id = Column(BigInteger, index=True)
+    user_id = Column(BigInteger, unique=True, index=True)
     nickname = Column(Text)
     sex = Column(Text)
     sign = Column(Text)
@@ -208,12 +219,15 @@ class BilibiliContactInfo(Base):
     fan_avatar = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
+    __table_args__ = (
+        UniqueConstraint("up_id", "fan_id", name="uq_bilibili_contact_info_up_fan"),
+    )
 
 
 class BilibiliUpDynamic(Base):
     __tablename__ = "bilibili_up_dynamic"
     id = Column(Integer, primary_key=True)
-    dynamic_id = Column(BigInteger, index=True)
+    dynamic_id = Column(BigInteger, unique=True, index=True)
     user_id = Column(String(255))
     user_name = Column(Text)
     text = Column(Text)
@@ -239,15 +253,19 @@ class DouyinAweme(Base):
     ip_location = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    aweme_id = Column(BigInteger, index=True)
+    aweme_id = Column(BigInteger, unique=True, index=True)
     aweme_type = Column(Text)
     title = Column(Text)
     desc = Column(Text)
     create_time = Column(BigInteger, index=True)
     liked_count = Column(Text)
+    liked_count_num = Column(BigInteger, index=True)
     comment_count = Column(Text)
+    comment_count_num = Column(BigInteger, index=True)
     share_count = Column(Text)
+    share_count_num = Column(BigInteger)
     collected_count = Column(Text)
+    collected_count_num = Column(BigInteger, index=True)
     aweme_url = Column(Text)
     cover_url = Column(Text)
     video_download_url = Column(Text)
@@ -271,20 +289,22 @@ class DouyinAwemeComment(Base):
     ip_location = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    comment_id = Column(BigInteger, index=True)
+    comment_id = Column(BigInteger, unique=True, index=True)
     aweme_id = Column(BigInteger, index=True)
     content = Column(Text)
     create_time = Column(BigInteger)
     sub_comment_count = Column(Text)
+    sub_comment_count_num = Column(BigInteger)
     parent_comment_id = Column(String(255))
     like_count = Column(Text, default="0")
+    like_count_num = Column(BigInteger, index=True)
     pictures = Column(Text, default="")
 
 
 class DyCreator(Base):
     __tablename__ = "dy_creator"
     id = Column(Integer, primary_key=True)
-    user_id = Column(String(255))
+    user_id = Column(String(255), unique=True, index=True)
     nickname = Column(Text)
     avatar = Column(Text)
     ip_location = Column(Text)
@@ -306,13 +326,15 @@ class KuaishouVideo(Base):
     avatar = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    video_id = Column(String(255), index=True)
+    video_id = Column(String(255), unique=True, index=True)
     video_type = Column(Text)
     title = Column(Text)
     desc = Column(Text)
     create_time = Column(BigInteger, index=True)
     liked_count = Column(Text)
+    liked_count_num = Column(BigInteger, index=True)
     viewd_count = Column(Text)
+    viewd_count_num = Column(BigInteger, index=True)
     video_url = Column(Text)
     video_cover_url = Column(Text)
     video_play_url = Column(Text)
@@ -329,11 +351,12 @@ class KuaishouVideoComment(Base):
     avatar = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    comment_id = Column(BigInteger, index=True)
+    comment_id = Column(BigInteger, unique=True, index=True)
     video_id = Column(String(255), index=True)
     content = Column(Text)
     create_time = Column(BigInteger)
     sub_comment_count = Column(Text)
+    sub_comment_count_num = Column(BigInteger)
 
 
 class WeiboNote(Base):
@@ -347,13 +370,16 @@ class WeiboNote(Base):
     ip_location = Column(Text, default="")
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    note_id = Column(BigInteger, index=True)
+    note_id = Column(BigInteger, unique=True, index=True)
     content = Column(Text)
     create_time = Column(BigInteger, index=True)
     create_date_time = Column(String(255), index=True)
     liked_count = Column(Text)
+    liked_count_num = Column(BigInteger, index=True)
     comments_count = Column(Text)
+    comments_count_num = Column(BigInteger, index=True)
     shared_count = Column(Text)
+    shared_count_num = Column(BigInteger)
     note_url = Column(Text)
     source_keyword = Column(Text, default="")
     topic_id = Column(String(64), unique=True, comment="关联的话题ID")
@@ -371,20 +397,22 @@ class WeiboNoteComment(Base):
     ip_location = Column(Text, default="")
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    comment_id = Column(BigInteger, index=True)
+    comment_id = Column(BigInteger, unique=True, index=True)
     note_id = Column(BigInteger, index=True)
     content = Column(Text)
     create_time = Column(BigInteger)
     create_date_time = Column(String(255), index=True)
     comment_like_count = Column(Text)
+    comment_like_count_num = Column(BigInteger, index=True)
     sub_comment_count = Column(Text)
+    sub_comment_count_num = Column(BigInteger)
     parent_comment_id = Column(String(255))
 
 
 class WeiboCreator(Base):
     __tablename__ = "weibo_creator"
     id = Column(Integer, primary_key=True)
-    user_id = Column(String(255))
+    user_id = Column(String(255), unique=True, index=True)
     nickname = Column(Text)
     avatar = Column(Text)
     ip_location = Column(Text)
@@ -400,7 +428,7 @@ class WeiboCreator(Base):
 class XhsCreator(Base):
     __tablename__ = "xhs_creator"
     id = Column(Integer, primary_key=True)
-    user_id = Column(String(255))
+    user_id = Column(String(255), unique=True, index=True)
     nickname = Column(Text)
     avatar = Column(Text)
     ip_location = Column(Text)
@@ -423,7 +451,7 @@ class XhsNote(Base):
     ip_location = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    note_id = Column(String(255), index=True)
+    note_id = Column(String(255), unique=True, index=True)
     type = Column(Text)
     title = Column(Text)
     desc = Column(Text)
@@ -431,9 +459,13 @@ class XhsNote(Base):
     time = Column(BigInteger, index=True)
     last_update_time = Column(BigInteger)
     liked_count = Column(Text)
+    liked_count_num = Column(BigInteger, index=True)
     collected_count = Column(Text)
+    collected_count_num = Column(BigInteger, index=True)
     comment_count = Column(Text)
+    comment_count_num = Column(BigInteger, index=True)
     share_count = Column(Text)
+    share_count_num = Column(BigInteger)
     image_list = Column(Text)
     tag_list = Column(Text)
     note_url = Column(Text)
@@ -452,7 +484,7 @@ class XhsNoteComment(Base):
     ip_location = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    comment_id = Column(String(255), index=True)
+    comment_id = Column(String(255), unique=True, index=True)
     create_time = Column(BigInteger, index=True)
     note_id = Column(String(255))
     content = Column(Text)
@@ -460,12 +492,13 @@ class XhsNoteComment(Base):
     pictures = Column(Text)
     parent_comment_id = Column(String(255))
     like_count = Column(Text)
+    like_count_num = Column(BigInteger, index=True)
 
 
 class TiebaNote(Base):
     __tablename__ = "tieba_note"
     id = Column(Integer, primary_key=True)
-    note_id = Column(String(644), index=True)
+    note_id = Column(String(644), unique=True, index=True)
     title = Column(Text)
     desc = Column(Text)
     note_url = Column(Text)
@@ -476,7 +509,7 @@ class TiebaNote(Base):
     tieba_id = Column(String(255), default="")
     tieba_name = Column(Text)
     tieba_link = Column(Text)
-    total_replay_num = Column(Integer, default=0)
+    total_replay_num = Column(Integer, default=0, index=True)
     total_replay_page = Column(Integer, default=0)
     ip_location = Column(Text, default="")
     add_ts = Column(BigInteger)
@@ -489,7 +522,7 @@ class TiebaNote(Base):
 class TiebaComment(Base):
     __tablename__ = "tieba_comment"
     id = Column(Integer, primary_key=True)
-    comment_id = Column(String(255), index=True)
+    comment_id = Column(String(255), unique=True, index=True)
     parent_comment_id = Column(String(255), default="")
     content = Column(Text)
     user_link = Column(Text, default="")
@@ -510,7 +543,7 @@ class TiebaComment(Base):
 class TiebaCreator(Base):
     __tablename__ = "tieba_creator"
     id = Column(Integer, primary_key=True)
-    user_id = Column(String(64))
+    user_id = Column(String(64), unique=True, index=True)
     user_name = Column(Text)
     nickname = Column(Text)
     avatar = Column(Text)
@@ -526,7 +559,7 @@ class TiebaCreator(Base):
 class ZhihuContent(Base):
     __tablename__ = "zhihu_content"
     id = Column(Integer, primary_key=True)
-    content_id = Column(String(64), index=True)
+    content_id = Column(String(64), unique=True, index=True)
     content_type = Column(Text)
     content_text = Column(Text)
     content_url = Column(Text)
@@ -535,8 +568,8 @@ class ZhihuContent(Base):
     desc = Column(Text)
     created_time = Column(String(32), index=True)
     updated_time = Column(Text)
-    voteup_count = Column(Integer, default=0)
-    comment_count = Column(Integer, default=0)
+    voteup_count = Column(Integer, default=0, index=True)
+    comment_count = Column(Integer, default=0, index=True)
     source_keyword = Column(Text)
     user_id = Column(String(255))
     user_link = Column(Text)
@@ -557,13 +590,13 @@ class ZhihuContent(Base):
 class ZhihuComment(Base):
     __tablename__ = "zhihu_comment"
     id = Column(Integer, primary_key=True)
-    comment_id = Column(String(64), index=True)
+    comment_id = Column(String(64), unique=True, index=True)
     parent_comment_id = Column(String(64))
     content = Column(Text)
     publish_time = Column(String(32), index=True)
     ip_location = Column(Text)
     sub_comment_count = Column(Integer, default=0)
-    like_count = Column(Integer, default=0)
+    like_count = Column(Integer, default=0, index=True)
     dislike_count = Column(Integer, default=0)
     content_id = Column(String(64), index=True)
     content_type = Column(Text)
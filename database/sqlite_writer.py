@@ -0,0 +1,145 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : SQLite 单写入者：所有写入串行地落在同一个事务里，由后台写入任务合并提交（group commit）
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from tools import utils
+
+
+class SqliteWriter:
+    """
+    并发的写入协程依次在共享 session 上执行各自的语句（每次写入一个 SAVEPOINT，失败只回滚自己），
+    后台写入任务在攒够 batch_size 次写入或等待 flush_interval 秒后统一提交一次，
+    写入方在所属批次提交成功后才返回，语义与逐条提交一致。
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, batch_size: int, flush_interval: float, stats_interval: int):
+        self._session_factory = session_factory
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._stats_interval = stats_interval
+        self._lock = asyncio.Lock()
+        self._session: Optional[AsyncSession] = None
+        self._commit_future: Optional[asyncio.Future] = None
+        self._pending = 0
+        self._has_pending = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.loop = asyncio.get_running_loop()
+
+        # 提交耗时统计
+        self.commit_count = 0
+        self.write_count = 0
+        self._total_commit_sec = 0.0
+        self._max_commit_sec = 0.0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        获取共享的写入 session，退出时等待所属批次提交完成
+        """
+        async with self._lock:
+            if self._session is None:
+                self._session = self._session_factory()
+                self._commit_future = self.loop.create_future()
+            commit_future = self._commit_future
+            savepoint = await self._session.begin_nested()
+            try:
+                yield self._session
+                if savepoint.is_active:
+                    await savepoint.commit()
+            except BaseException:
+                if savepoint.is_active:
+                    await savepoint.rollback()
+                raise
+            self._pending += 1
+            self._has_pending.set()
+            if self._pending >= self._batch_size:
+                self._batch_full.set()
+        await asyncio.shield(commit_future)
+
+    async def _run(self):
+        while True:
+            await self._has_pending.wait()
+            try:
+                # 留出一点时间让并发的写入合并到同一个事务中
+                await asyncio.wait_for(self._batch_full.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            # 关闭时取消写入任务不能打断进行中的提交
+            await asyncio.shield(self.commit())
+
+    async def commit(self):
+        """
+        提交当前批次
+        """
+        async with self._lock:
+            session, commit_future, write_count = self._session, self._commit_future, self._pending
+            self._session, self._commit_future, self._pending = None, None, 0
+            self._has_pending.clear()
+            self._batch_full.clear()
+            if session is None:
+                return
+            start = time.perf_counter()
+            try:
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                commit_future.set_exception(e)
+                # 没有写入方等待时避免出现 "exception was never retrieved"
+                commit_future.exception()
+            else:
+                commit_future.set_result(None)
+            finally:
+                await session.close()
+            self._record_commit(time.perf_counter() - start, write_count)
+
+    def _record_commit(self, commit_sec: float, write_count: int):
+        self.commit_count += 1
+        self.write_count += write_count
+        self._total_commit_sec += commit_sec
+        self._max_commit_sec = max(self._max_commit_sec, commit_sec)
+        if self._stats_interval and self.commit_count % self._stats_interval == 0:
+            self.report()
+
+    def report(self):
+        if not self.commit_count:
+            return
+        utils.logger.info(
+            f"[SqliteWriter] commits: {self.commit_count}, writes: {self.write_count}, "
+            f"writes/commit: {self.write_count / self.commit_count:.1f}, "
+            f"commit latency avg: {self._total_commit_sec / self.commit_count * 1000:.2f}ms, "
+            f"max: {self._max_commit_sec * 1000:.2f}ms"
+        )
+
+    async def close(self):
+        """
+        提交剩余写入，停止写入任务并输出统计
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.commit()
+        self.report()
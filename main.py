@@ -16,6 +16,7 @@ from typing import Optional
 import cmd_arg
 import config
 from database import db
+from database.db_session import close_sqlite_writer
 from base.base_crawler import AbstractCrawler
 from media_platform.bilibili import BilibiliCrawler
 from media_platform.douyin import DouYinCrawler
@@ -24,7 +25,13 @@ from media_platform.tieba import TieBaCrawler
 from media_platform.weibo import WeiboCrawler
 from media_platform.xhs import XiaoHongShuCrawler
 from media_platform.zhihu import ZhihuCrawler
-from tools.async_file_writer import AsyncFileWriter
+from store.write_behind import drain_store_queue
+from tools.async_file_writer import (AsyncFileWriter, close_csv_files, close_jsonl_files, close_parquet_files,
+                                     compact_written_jsonl_files)
+from tools.http_cassette import close_cassette
+from tools.http_client_pool import close_http_client_pools
+from tools.media_download_pool import drain_media_download_pool
+from tools.media_manifest import print_media_report
 from var import crawler_type_var
 
 
@@ -69,12 +76,46 @@ async def main():
         print(f"Database {args.init_db} initialized successfully.")
         return  # Exit the main function cleanly
 
+    # migrate existing db (dedupe + natural-key unique constraints)
+    if args.migrate_db:
+        await db.migrate_db(args.migrate_db)
+        print(f"Database {args.migrate_db} migrated successfully.")
+        return
+
+    # fill the integer engagement counters of rows stored before they existed
+    if args.backfill_counters:
+        await db.backfill_counters(args.backfill_counters)
+        print(f"Database {args.backfill_counters} counters backfilled successfully.")
+        return
+
+    # report downloaded media from the manifest instead of walking the media directories
+    if args.media_report:
+        print_media_report()
+        return
+
     crawler = CrawlerFactory.create_crawler(platform=config.PLATFORM)
-    await crawler.start()
+    try:
+        await crawler.start()
+    finally:
+        # Finish the queued media downloads, close the pooled connections and the cassette, wait until the store queue is written out,
+        # then commit what the sqlite single writer still holds
+        await drain_media_download_pool()
+        await close_http_client_pools()
+        close_cassette()
+        await drain_store_queue()
+        await close_sqlite_writer()
+
+    # Close jsonl files so that compressed files and the last segment are complete before they are read
+    if config.SAVE_DATA_OPTION == "jsonl":
+        close_jsonl_files()
+
+    # Merge jsonl files into legacy json array files for consumers that need them
+    if config.SAVE_DATA_OPTION == "jsonl" and config.ENABLE_JSONL_COMPACT:
+        await compact_written_jsonl_files()
 
     # Generate wordcloud after crawling is complete
-    # Only for JSON save mode
-    if config.SAVE_DATA_OPTION == "json" and config.ENABLE_GET_WORDCLOUD:
+    # Only for JSON / JSONL save mode
+    if config.SAVE_DATA_OPTION in ["json", "jsonl"] and config.ENABLE_GET_WORDCLOUD:
         try:
             file_writer = AsyncFileWriter(
                 platform=config.PLATFORM, crawler_type=crawler_type_var.get()
@@ -88,6 +129,12 @@ def cleanup():
     if crawler:
         # asyncio.run(crawler.close())
         pass
+    if config.SAVE_DATA_OPTION == "csv":
+        close_csv_files()
+    if config.SAVE_DATA_OPTION == "jsonl":
+        close_jsonl_files()
+    if config.SAVE_DATA_OPTION == "parquet":
+        close_parquet_files()
     if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
         asyncio.run(db.close())
 
@@ -24,6 +24,7 @@ from playwright.async_api import BrowserContext, Page
 import config
 from base.base_crawler import AbstractApiClient
 from tools import utils
+from tools.media_downloader import download_to_file
 
 from .exception import DataFetchError
 from .field import CommentOrderType, SearchOrderType
@@ -48,9 +49,9 @@ class BilibiliClient(AbstractApiClient):
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
 
-    async def request(self, method, url, **kwargs) -> Any:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+    def parse_response(self, response: httpx.Response, return_response: bool = False) -> Any:
+        if return_response:
+            return response.text
         try:
             data: Dict = response.json()
         except json.JSONDecodeError:
@@ -203,19 +204,24 @@ class BilibiliClient(AbstractApiClient):
 
     async def get_video_media(self, url: str) -> Union[bytes, None]:
         # Follow CDN 302 redirects and treat any 2xx as success (some endpoints return 206)
-        async with httpx.AsyncClient(proxy=self.proxy, follow_redirects=True) as client:
-            try:
-                response = await client.request("GET", url, timeout=self.timeout, headers=self.headers)
-                response.raise_for_status()
-                if 200 <= response.status_code < 300:
-                    return response.content
-                utils.logger.error(
-                    f"[BilibiliClient.get_video_media] Unexpected status {response.status_code} for {url}"
-                )
-                return None
-            except httpx.HTTPError as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
-                utils.logger.error(f"[BilibiliClient.get_video_media] {exc.__class__.__name__} for {exc.request.url} - {exc}")  # 保留原始异常类型名称，以便开发者调试
-                return None
+        try:
+            response = await self.http_client.request("GET", url, timeout=self.timeout, follow_redirects=True, headers=self.headers)
+            response.raise_for_status()
+            if 200 <= response.status_code < 300:
+                return response.content
+            utils.logger.error(
+                f"[BilibiliClient.get_video_media] Unexpected status {response.status_code} for {url}"
+            )
+            return None
+        except httpx.HTTPError as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
+            utils.logger.error(f"[BilibiliClient.get_video_media] {exc.__class__.__name__} for {exc.request.url} - {exc}")  # 保留原始异常类型名称，以便开发者调试
+            return None
+
+    async def download_video_media(self, url: str, save_path: str) -> bool:
+        """
+        stream video to save_path chunk by chunk, long videos are never held in memory
+        """
+        return await download_to_file(self.http_client, url, save_path, headers=self.headers, timeout=self.timeout, follow_redirects=True)
 
     async def get_video_comments(
         self,
@@ -240,6 +246,7 @@ class BilibiliClient(AbstractApiClient):
         is_fetch_sub_comments=False,
         callback: Optional[Callable] = None,
         max_count: int = 10,
+        latest_comment_time: Optional[int] = None,
     ):
         """
         get video all comments include sub comments
@@ -248,6 +255,7 @@ class BilibiliClient(AbstractApiClient):
         :param is_fetch_sub_comments:
         :param callback:
         max_count: 一次笔记爬取的最大评论数量
+        latest_comment_time: 增量爬取：已存储评论的最新发布时间，按时间倒序翻页，遇到不比它新的评论即停止
 
         :return:
         """
@@ -255,11 +263,12 @@ class BilibiliClient(AbstractApiClient):
         is_end = False
         next_page = 0
         max_retries = 3
+        order_mode = CommentOrderType.DEFAULT if latest_comment_time is None else CommentOrderType.TIME
         while not is_end and len(result) < max_count:
             comments_res = None
             for attempt in range(max_retries):
                 try:
-                    comments_res = await self.get_video_comments(video_id, CommentOrderType.DEFAULT, next_page)
+                    comments_res = await self.get_video_comments(video_id, order_mode, next_page)
                     break  # Success
                 except DataFetchError as e:
                     if attempt < max_retries - 1:
@@ -291,6 +300,12 @@ class BilibiliClient(AbstractApiClient):
             if not isinstance(is_end, bool):
                 utils.logger.warning(f"[BilibiliClient.get_video_all_comments] 'is_end' is not a boolean for video_id: {video_id}. Assuming end of comments.")
                 is_end = True
+            if latest_comment_time is not None:
+                new_comment_list = [comment for comment in comment_list if comment.get("ctime", 0) > latest_comment_time]
+                if len(new_comment_list) < len(comment_list):
+                    utils.logger.info(f"[BilibiliClient.get_video_all_comments] Reached stored comments of video_id: {video_id}, stop paging.")
+                    is_end = True
+                comment_list = new_comment_list
             if is_fetch_sub_comments:
                 for comment in comment_list:
                     comment_id = comment['rpid']
@@ -14,6 +14,7 @@
 # @Desc    : B站爬虫
 
 import asyncio
+import functools
 import os
 # import random  # Removed as we now use fixed config.CRAWLER_MAX_SLEEP_SEC intervals
 from asyncio import Task
@@ -32,10 +33,15 @@ from playwright._impl._errors import TargetClosedError
 
 import config
 from base.base_crawler import AbstractCrawler
+from cache.seen_index import filter_unseen, mark_seen
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import bilibili as bilibili_store
 from tools import utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.http_cassette import wrap_page
+from tools.media_download_pool import submit_media_download
+from tools.rate_limiter import get_crawl_interval
+from tools.search_checkpoint import SearchCheckpoint
 from var import crawler_type_var, source_keyword_var
 
 from .client import BilibiliClient
@@ -81,7 +87,7 @@ class BilibiliCrawler(AbstractCrawler):
                 # stealth.min.js is a js script to prevent the website from detecting the crawler.
                 await self.browser_context.add_init_script(path="libs/stealth.min.js")
 
-            self.context_page = await self.browser_context.new_page()
+            self.context_page = wrap_page(await self.browser_context.new_page())
             await self.context_page.goto(self.index_url)
 
             # Create a client to interact with the xiaohongshu website.
@@ -176,10 +182,11 @@ class BilibiliCrawler(AbstractCrawler):
         if config.CRAWLER_MAX_NOTES_COUNT < bili_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = bili_limit_count
         start_page = config.START_PAGE  # start page number
-        for keyword in config.KEYWORDS.split(","):
+        checkpoint = SearchCheckpoint("bili", config.KEYWORDS.split(","), scope=config.BILI_SEARCH_MODE)
+        for keyword in checkpoint.iter_keywords():
             source_keyword_var.set(keyword)
             utils.logger.info(f"[BilibiliCrawler.search_by_keywords] Current search keyword: {keyword}")
-            page = 1
+            page = checkpoint.get(keyword, "page", 1)
             while (page - start_page + 1) * bili_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
                 if page < start_page:
                     utils.logger.info(f"[BilibiliCrawler.search_by_keywords] Skip page: {page}")
@@ -205,6 +212,7 @@ class BilibiliCrawler(AbstractCrawler):
                 semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
                 task_list = []
                 try:
+                    video_list = filter_unseen("bili", video_list, lambda item: item.get("aid"))
                     task_list = [self.get_video_info_task(aid=video_item.get("aid"), bvid="", semaphore=semaphore) for video_item in video_list]
                 except Exception as e:
                     utils.logger.warning(f"[BilibiliCrawler.search_by_keywords] error in the task list. The video for this page will not be included. {e}")
@@ -222,6 +230,8 @@ class BilibiliCrawler(AbstractCrawler):
                 utils.logger.info(f"[BilibiliCrawler.search_by_keywords] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
                 
                 await self.batch_get_video_comments(video_id_list)
+                mark_seen("bili", video_id_list)
+                checkpoint.save(keyword, page=page)
 
     async def search_by_keywords_in_time_range(self, daily_limit: bool):
         """
@@ -232,12 +242,16 @@ class BilibiliCrawler(AbstractCrawler):
         bili_limit_count = 20
         start_page = config.START_PAGE
 
-        for keyword in config.KEYWORDS.split(","):
+        checkpoint = SearchCheckpoint("bili", config.KEYWORDS.split(","), scope=config.BILI_SEARCH_MODE)
+        for keyword in checkpoint.iter_keywords():
             source_keyword_var.set(keyword)
             utils.logger.info(f"[BilibiliCrawler.search_by_keywords_in_time_range] Current search keyword: {keyword}")
-            total_notes_crawled_for_keyword = 0
+            total_notes_crawled_for_keyword = checkpoint.get(keyword, "total_count", 0)
+            resume_day = checkpoint.get(keyword, "day")
 
             for day in pd.date_range(start=config.START_DAY, end=config.END_DAY, freq="D"):
+                if resume_day and day.strftime("%Y-%m-%d") < resume_day:
+                    continue
                 if (daily_limit and total_notes_crawled_for_keyword >= config.CRAWLER_MAX_NOTES_COUNT):
                     utils.logger.info(f"[BilibiliCrawler.search] Reached CRAWLER_MAX_NOTES_COUNT limit for keyword '{keyword}', skipping remaining days.")
                     break
@@ -249,6 +263,9 @@ class BilibiliCrawler(AbstractCrawler):
                 pubtime_begin_s, pubtime_end_s = await self.get_pubtime_datetime(start=day.strftime("%Y-%m-%d"), end=day.strftime("%Y-%m-%d"))
                 page = 1
                 notes_count_this_day = 0
+                if resume_day == day.strftime("%Y-%m-%d"):
+                    page = checkpoint.get(keyword, "page", 1)
+                    notes_count_this_day = checkpoint.get(keyword, "day_count", 0)
 
                 while True:
                     if notes_count_this_day >= config.MAX_NOTES_PER_DAY:
@@ -278,6 +295,7 @@ class BilibiliCrawler(AbstractCrawler):
                             break
 
                         semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+                        video_list = filter_unseen("bili", video_list, lambda item: item.get("aid"))
                         task_list = [self.get_video_info_task(aid=video_item.get("aid"), bvid="", semaphore=semaphore) for video_item in video_list]
                         video_items = await asyncio.gather(*task_list)
 
@@ -303,6 +321,9 @@ class BilibiliCrawler(AbstractCrawler):
                         utils.logger.info(f"[BilibiliCrawler.search_by_keywords_in_time_range] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
                         
                         await self.batch_get_video_comments(video_id_list)
+                        mark_seen("bili", video_id_list)
+                        checkpoint.save(keyword, day=day.strftime("%Y-%m-%d"), page=page,
+                                        day_count=notes_count_this_day, total_count=total_notes_crawled_for_keyword)
 
                     except Exception as e:
                         utils.logger.error(f"[BilibiliCrawler.search] Error searching on {day.ctime()}: {e}")
@@ -336,14 +357,18 @@ class BilibiliCrawler(AbstractCrawler):
         async with semaphore:
             try:
                 utils.logger.info(f"[BilibiliCrawler.get_comments] begin get video_id: {video_id} comments ...")
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[BilibiliCrawler.get_comments] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching comments for video {video_id}")
+                await asyncio.sleep(get_crawl_interval())
+                utils.logger.info(f"[BilibiliCrawler.get_comments] Sleeping for {get_crawl_interval()} seconds after fetching comments for video {video_id}")
+                latest_comment_time = None
+                if config.ENABLE_INCREMENTAL_COMMENTS:
+                    latest_comment_time = await bilibili_store.get_latest_comment_time(video_id)
                 await self.bili_client.get_video_all_comments(
                     video_id=video_id,
-                    crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
+                    crawl_interval=get_crawl_interval(),
                     is_fetch_sub_comments=config.ENABLE_GET_SUB_COMMENTS,
                     callback=bilibili_store.batch_update_bilibili_video_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
+                    latest_comment_time=latest_comment_time,
                 )
 
             except DataFetchError as ex:
@@ -415,8 +440,8 @@ class BilibiliCrawler(AbstractCrawler):
                 result = await self.bili_client.get_video_info(aid=aid, bvid=bvid)
                 
                 # Sleep after fetching video details
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[BilibiliCrawler.get_video_info_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching video details {bvid or aid}")
+                await asyncio.sleep(get_crawl_interval())
+                utils.logger.info(f"[BilibiliCrawler.get_video_info_task] Sleeping for {get_crawl_interval()} seconds after fetching video details {bvid or aid}")
                 
                 return result
             except DataFetchError as ex:
@@ -537,7 +562,8 @@ class BilibiliCrawler(AbstractCrawler):
             return await self.launch_browser(chromium, playwright_proxy, user_agent, headless)
 
     async def close(self):
-        """Close browser context"""
+        """Close API client connections and browser context"""
+        await self.bili_client.close()
         try:
             # 如果使用CDP模式，需要特殊处理
             if self.cdp_manager:
@@ -580,13 +606,12 @@ class BilibiliCrawler(AbstractCrawler):
             utils.logger.info("[BilibiliCrawler.get_bilibili_video] get video url failed")
             return
 
-        content = await self.bili_client.get_video_media(video_url)
+        extension_file_name = f"video.mp4"
+        await submit_media_download(
+            video_url, functools.partial(bilibili_store.download_video, aid, video_url, extension_file_name, self.bili_client.download_video_media)
+        )
         await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
         utils.logger.info(f"[BilibiliCrawler.get_bilibili_video] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching video {aid}")
-        if content is None:
-            return
-        extension_file_name = f"video.mp4"
-        await bilibili_store.store_video(aid, content, extension_file_name)
 
     async def get_all_creator_details(self, creator_url_list: List[str]):
         """
@@ -650,7 +675,7 @@ class BilibiliCrawler(AbstractCrawler):
                 utils.logger.info(f"[BilibiliCrawler.get_fans] begin get creator_id: {creator_id} fans ...")
                 await self.bili_client.get_creator_all_fans(
                     creator_info=creator_info,
-                    crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
+                    crawl_interval=get_crawl_interval(),
                     callback=bilibili_store.batch_update_bilibili_creator_fans,
                     max_count=config.CRAWLER_MAX_CONTACTS_COUNT_SINGLENOTES,
                 )
@@ -673,7 +698,7 @@ class BilibiliCrawler(AbstractCrawler):
                 utils.logger.info(f"[BilibiliCrawler.get_followings] begin get creator_id: {creator_id} followings ...")
                 await self.bili_client.get_creator_all_followings(
                     creator_info=creator_info,
-                    crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
+                    crawl_interval=get_crawl_interval(),
                     callback=bilibili_store.batch_update_bilibili_creator_followings,
                     max_count=config.CRAWLER_MAX_CONTACTS_COUNT_SINGLENOTES,
                 )
@@ -696,7 +721,7 @@ class BilibiliCrawler(AbstractCrawler):
                 utils.logger.info(f"[BilibiliCrawler.get_dynamics] begin get creator_id: {creator_id} dynamics ...")
                 await self.bili_client.get_creator_all_dynamics(
                     creator_info=creator_info,
-                    crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
+                    crawl_interval=get_crawl_interval(),
                     callback=bilibili_store.batch_update_bilibili_creator_dynamics,
                     max_count=config.CRAWLER_MAX_DYNAMICS_COUNT_SINGLENOTES,
                 )
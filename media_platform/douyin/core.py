@@ -9,8 +9,8 @@
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
 import asyncio
+import functools
 import os
-import random
 from asyncio import Task
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -24,10 +24,15 @@ from playwright.async_api import (
 
 import config
 from base.base_crawler import AbstractCrawler
+from cache.seen_index import filter_unseen, mark_seen
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import douyin as douyin_store
 from tools import utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.http_cassette import wrap_page
+from tools.media_download_pool import submit_media_download
+from tools.rate_limiter import get_crawl_interval
+from tools.search_checkpoint import SearchCheckpoint
 from var import crawler_type_var, source_keyword_var
 
 from .client import DouYinClient
@@ -77,7 +82,7 @@ class DouYinCrawler(AbstractCrawler):
                 # stealth.min.js is a js script to prevent the website from detecting the crawler.
                 await self.browser_context.add_init_script(path="libs/stealth.min.js")
 
-            self.context_page = await self.browser_context.new_page()
+            self.context_page = wrap_page(await self.browser_context.new_page())
             await self.context_page.goto(self.index_url)
 
             self.dy_client = await self.create_douyin_client(httpx_proxy_format)
@@ -110,12 +115,14 @@ class DouYinCrawler(AbstractCrawler):
         if config.CRAWLER_MAX_NOTES_COUNT < dy_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = dy_limit_count
         start_page = config.START_PAGE  # start page number
-        for keyword in config.KEYWORDS.split(","):
+        checkpoint = SearchCheckpoint("dy", config.KEYWORDS.split(","))
+        for keyword in checkpoint.iter_keywords():
             source_keyword_var.set(keyword)
             utils.logger.info(f"[DouYinCrawler.search] Current keyword: {keyword}")
-            aweme_list: List[str] = []
-            page = 0
-            dy_search_id = ""
+            # 评论在关键词的所有页爬完后统一获取，续爬时带上之前页的作品id
+            aweme_list: List[str] = checkpoint.get(keyword, "aweme_list", [])
+            page = checkpoint.get(keyword, "page", 0)
+            dy_search_id = checkpoint.get(keyword, "search_id", "")
             while (page - start_page + 1) * dy_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
                 if page < start_page:
                     utils.logger.info(f"[DouYinCrawler.search] Skip {page}")
@@ -141,19 +148,23 @@ class DouYinCrawler(AbstractCrawler):
                     utils.logger.error(f"[DouYinCrawler.search] search douyin keyword: {keyword} failed，账号也许被风控了。")
                     break
                 dy_search_id = posts_res.get("extra", {}).get("logid", "")
+                aweme_infos: List[Dict] = []
                 for post_item in posts_res.get("data"):
                     try:
-                        aweme_info: Dict = (post_item.get("aweme_info") or post_item.get("aweme_mix_info", {}).get("mix_items")[0])
+                        aweme_infos.append(post_item.get("aweme_info") or post_item.get("aweme_mix_info", {}).get("mix_items")[0])
                     except TypeError:
                         continue
+                for aweme_info in filter_unseen("dy", aweme_infos, lambda item: item.get("aweme_id")):
                     aweme_list.append(aweme_info.get("aweme_id", ""))
                     await douyin_store.update_douyin_aweme(aweme_item=aweme_info)
                     await self.get_aweme_media(aweme_item=aweme_info)
+                checkpoint.save(keyword, page=page, search_id=dy_search_id, aweme_list=aweme_list)
                 # Sleep after each page navigation
                 await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 utils.logger.info(f"[DouYinCrawler.search] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
             utils.logger.info(f"[DouYinCrawler.search] keyword:{keyword}, aweme_list:{aweme_list}")
             await self.batch_get_note_comments(aweme_list)
+            mark_seen("dy", aweme_list)
 
     async def get_specified_awemes(self):
         """Get the information and comments of the specified post from URLs or IDs"""
@@ -196,8 +207,8 @@ class DouYinCrawler(AbstractCrawler):
             try:
                 result = await self.dy_client.get_video_by_id(aweme_id)
                 # Sleep after fetching aweme detail
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[DouYinCrawler.get_aweme_detail] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching aweme {aweme_id}")
+                await asyncio.sleep(get_crawl_interval())
+                utils.logger.info(f"[DouYinCrawler.get_aweme_detail] Sleeping for {get_crawl_interval()} seconds after fetching aweme {aweme_id}")
                 return result
             except DataFetchError as ex:
                 utils.logger.error(f"[DouYinCrawler.get_aweme_detail] Get aweme detail error: {ex}")
@@ -227,7 +238,7 @@ class DouYinCrawler(AbstractCrawler):
             try:
                 # 将关键词列表传递给 get_aweme_all_comments 方法
                 # Use fixed crawling interval
-                crawl_interval = config.CRAWLER_MAX_SLEEP_SEC
+                crawl_interval = get_crawl_interval()
                 await self.dy_client.get_aweme_all_comments(
                     aweme_id=aweme_id,
                     crawl_interval=crawl_interval,
@@ -361,7 +372,8 @@ class DouYinCrawler(AbstractCrawler):
             return await self.launch_browser(chromium, playwright_proxy, user_agent, headless)
 
     async def close(self) -> None:
-        """Close browser context"""
+        """Close API client connections and browser context"""
+        await self.dy_client.close()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
@@ -405,17 +417,13 @@ class DouYinCrawler(AbstractCrawler):
 
         if not note_download_url:
             return
-        picNum = 0
-        for url in note_download_url:
+        for picNum, url in enumerate(note_download_url):
             if not url:
                 continue
-            content = await self.dy_client.get_aweme_media(url)
-            await asyncio.sleep(random.random())
-            if content is None:
-                continue
             extension_file_name = f"{picNum:>03d}.jpeg"
-            picNum += 1
-            await douyin_store.update_dy_aweme_image(aweme_id, content, extension_file_name)
+            await submit_media_download(
+                url, functools.partial(douyin_store.download_dy_aweme_image, aweme_id, url, extension_file_name, self.dy_client.download_aweme_media)
+            )
 
     async def get_aweme_video(self, aweme_item: Dict):
         """
@@ -433,9 +441,8 @@ class DouYinCrawler(AbstractCrawler):
 
         if not video_download_url:
             return
-        content = await self.dy_client.get_aweme_media(video_download_url)
-        await asyncio.sleep(random.random())
-        if content is None:
-            return
         extension_file_name = f"video.mp4"
-        await douyin_store.update_dy_aweme_video(aweme_id, content, extension_file_name)
+        await submit_media_download(
+            video_download_url,
+            functools.partial(douyin_store.download_dy_aweme_video, aweme_id, video_download_url, extension_file_name, self.dy_client.download_aweme_media),
+        )
@@ -26,11 +26,15 @@ from playwright.async_api import (
 
 import config
 from base.base_crawler import AbstractCrawler
+from cache.seen_index import filter_unseen, mark_seen
 from model.m_kuaishou import VideoUrlInfo, CreatorUrlInfo
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import kuaishou as kuaishou_store
 from tools import utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.http_cassette import wrap_page
+from tools.rate_limiter import get_crawl_interval
+from tools.search_checkpoint import SearchCheckpoint
 from var import comment_tasks_var, crawler_type_var, source_keyword_var
 
 from .client import KuaiShouClient
@@ -82,7 +86,7 @@ class KuaishouCrawler(AbstractCrawler):
                 await self.browser_context.add_init_script(path="libs/stealth.min.js")
 
 
-            self.context_page = await self.browser_context.new_page()
+            self.context_page = wrap_page(await self.browser_context.new_page())
             await self.context_page.goto(f"{self.index_url}?isHome=1")
 
             # Create a client to interact with the kuaishou website.
@@ -121,13 +125,14 @@ class KuaishouCrawler(AbstractCrawler):
         if config.CRAWLER_MAX_NOTES_COUNT < ks_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = ks_limit_count
         start_page = config.START_PAGE
-        for keyword in config.KEYWORDS.split(","):
-            search_session_id = ""
+        checkpoint = SearchCheckpoint("ks", config.KEYWORDS.split(","))
+        for keyword in checkpoint.iter_keywords():
+            search_session_id = checkpoint.get(keyword, "search_session_id", "")
             source_keyword_var.set(keyword)
             utils.logger.info(
                 f"[KuaishouCrawler.search] Current search keyword: {keyword}"
             )
-            page = 1
+            page = checkpoint.get(keyword, "page", 1)
             while (
                 page - start_page + 1
             ) * ks_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
@@ -157,7 +162,8 @@ class KuaishouCrawler(AbstractCrawler):
                     )
                     continue
                 search_session_id = vision_search_photo.get("searchSessionId", "")
-                for video_detail in vision_search_photo.get("feeds"):
+                feeds = filter_unseen("ks", vision_search_photo.get("feeds"), lambda item: item.get("photo", {}).get("id"))
+                for video_detail in feeds:
                     video_id_list.append(video_detail.get("photo", {}).get("id"))
                     await kuaishou_store.update_kuaishou_video(video_item=video_detail)
 
@@ -169,6 +175,8 @@ class KuaishouCrawler(AbstractCrawler):
                 utils.logger.info(f"[KuaishouCrawler.search] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
                 
                 await self.batch_get_video_comments(video_id_list)
+                mark_seen("ks", video_id_list)
+                checkpoint.save(keyword, page=page, search_session_id=search_session_id)
 
     async def get_specified_videos(self):
         """Get the information and comments of the specified post"""
@@ -203,8 +211,8 @@ class KuaishouCrawler(AbstractCrawler):
                 result = await self.ks_client.get_video_info(video_id)
                 
                 # Sleep after fetching video details
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[KuaishouCrawler.get_video_info_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching video details {video_id}")
+                await asyncio.sleep(get_crawl_interval())
+                utils.logger.info(f"[KuaishouCrawler.get_video_info_task] Sleeping for {get_crawl_interval()} seconds after fetching video details {video_id}")
                 
                 utils.logger.info(
                     f"[KuaishouCrawler.get_video_info_task] Get video_id:{video_id} info result: {result} ..."
@@ -261,12 +269,12 @@ class KuaishouCrawler(AbstractCrawler):
                 )
                 
                 # Sleep before fetching comments
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[KuaishouCrawler.get_comments] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds before fetching comments for video {video_id}")
+                await asyncio.sleep(get_crawl_interval())
+                utils.logger.info(f"[KuaishouCrawler.get_comments] Sleeping for {get_crawl_interval()} seconds before fetching comments for video {video_id}")
                 
                 await self.ks_client.get_video_all_comments(
                     photo_id=video_id,
-                    crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
+                    crawl_interval=get_crawl_interval(),
                     callback=kuaishou_store.batch_update_ks_video_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
                 )
@@ -425,7 +433,8 @@ class KuaishouCrawler(AbstractCrawler):
                 await kuaishou_store.update_kuaishou_video(video_detail)
 
     async def close(self):
-        """Close browser context"""
+        """Close API client connections and browser context"""
+        await self.ks_client.close()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
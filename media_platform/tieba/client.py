@@ -13,9 +13,8 @@ import json
 from typing import Any, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode, quote
 
-import requests
+import httpx
 from playwright.async_api import BrowserContext, Page
-from tenacity import RetryError, retry, stop_after_attempt, wait_fixed
 
 import config
 from base.base_crawler import AbstractApiClient
@@ -28,6 +27,10 @@ from .help import TieBaExtractor
 
 
 class BaiduTieBaClient(AbstractApiClient):
+    # 和 requests 一样跟随重定向
+    follow_redirects = True
+    # 状态码错误、账号被封也重试，重试后仍失败时 get 换一个代理再请求
+    retry_exceptions = (Exception,)
 
     def __init__(
         self,
@@ -46,65 +49,20 @@ class BaiduTieBaClient(AbstractApiClient):
         }
         self._host = "https://tieba.baidu.com"
         self._page_extractor = TieBaExtractor()
-        self.default_ip_proxy = default_ip_proxy
+        self.proxy = default_ip_proxy
         self.playwright_page = playwright_page  # Playwright页面对象
 
-    def _sync_request(self, method, url, proxy=None, **kwargs):
+    def parse_response(self, response: httpx.Response, return_response: bool = False) -> Union[str, Any]:
         """
-        同步的requests请求方法
+        处理响应：状态码不是 200 或账号被封时抛出异常
         Args:
-            method: 请求方法
-            url: 请求的URL
-            proxy: 代理IP
-            **kwargs: 其他请求参数
-
-        Returns:
-            response对象
-        """
-        # 构造代理字典
-        proxies = None
-        if proxy:
-            proxies = {
-                "http": proxy,
-                "https": proxy,
-            }
-
-        # 发送请求
-        response = requests.request(
-            method=method,
-            url=url,
-            headers=self.headers,
-            proxies=proxies,
-            timeout=self.timeout,
-            **kwargs
-        )
-        return response
-
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-    async def request(self, method, url, return_ori_content=False, proxy=None, **kwargs) -> Union[str, Any]:
-        """
-        封装requests的公共请求方法，对请求响应做一些处理
-        Args:
-            method: 请求方法
-            url: 请求的URL
-            return_ori_content: 是否返回原始内容
-            proxy: 代理IP
-            **kwargs: 其他请求参数，例如请求头、请求体等
+            response: httpx 响应
+            return_response: 是否返回原始内容
 
         Returns:
 
         """
-        actual_proxy = proxy if proxy else self.default_ip_proxy
-
-        # 在线程池中执行同步的requests请求
-        response = await asyncio.to_thread(
-            self._sync_request,
-            method,
-            url,
-            actual_proxy,
-            **kwargs
-        )
-
+        method, url = response.request.method, response.url
         if response.status_code != 200:
             utils.logger.error(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
             utils.logger.error(f"Request failed, response: {response.text}")
@@ -114,7 +72,7 @@ class BaiduTieBaClient(AbstractApiClient):
             utils.logger.error(f"request params incorrect, response.text: {response.text}")
             raise Exception("account blocked")
 
-        if return_ori_content:
+        if return_response:
             return response.text
 
         return response.json()
@@ -135,14 +93,14 @@ class BaiduTieBaClient(AbstractApiClient):
             final_uri = (f"{uri}?"
                          f"{urlencode(params)}")
         try:
-            res = await self.request(method="GET", url=f"{self._host}{final_uri}", return_ori_content=return_ori_content, **kwargs)
+            res = await self.request(method="GET", url=f"{self._host}{final_uri}", headers=self.headers, return_response=return_ori_content, **kwargs)
             return res
-        except RetryError as e:
+        except Exception as e:
             if self.ip_pool:
                 proxie_model = await self.ip_pool.get_proxy()
                 _, proxy = utils.format_proxy_info(proxie_model)
-                res = await self.request(method="GET", url=f"{self._host}{final_uri}", return_ori_content=return_ori_content, proxy=proxy, **kwargs)
-                self.default_ip_proxy = proxy
+                res = await self.request(method="GET", url=f"{self._host}{final_uri}", headers=self.headers, return_response=return_ori_content, proxy=proxy, **kwargs)
+                self.proxy = proxy
                 return res
 
             utils.logger.error(f"[BaiduTieBaClient.get] 达到了最大重试次数，IP已经被Block，请尝试更换新的IP代理: {e}")
@@ -159,7 +117,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
         """
         json_str = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
-        return await self.request(method="POST", url=f"{self._host}{uri}", data=json_str, **kwargs)
+        return await self.request(method="POST", url=f"{self._host}{uri}", headers=self.headers, content=json_str, **kwargs)
 
     async def pong(self, browser_context: BrowserContext = None) -> bool:
         """
@@ -251,6 +209,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
         try:
             # 使用Playwright访问搜索页面
+            await self.wait_rate_limit(full_url)
             await self.playwright_page.goto(full_url, wait_until="domcontentloaded")
 
             # 等待页面加载,使用配置文件中的延时设置
@@ -288,6 +247,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
         try:
             # 使用Playwright访问帖子详情页面
+            await self.wait_rate_limit(note_url)
             await self.playwright_page.goto(note_url, wait_until="domcontentloaded")
 
             # 等待页面加载,使用配置文件中的延时设置
@@ -336,6 +296,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
             try:
                 # 使用Playwright访问评论页面
+                await self.wait_rate_limit(comment_url)
                 await self.playwright_page.goto(comment_url, wait_until="domcontentloaded")
 
                 # 等待页面加载,使用配置文件中的延时设置
@@ -422,6 +383,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
                 try:
                     # 使用Playwright访问子评论页面
+                    await self.wait_rate_limit(sub_comment_url)
                     await self.playwright_page.goto(sub_comment_url, wait_until="domcontentloaded")
 
                     # 等待页面加载,使用配置文件中的延时设置
@@ -479,6 +441,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
         try:
             # 使用Playwright访问贴吧页面
+            await self.wait_rate_limit(tieba_url)
             await self.playwright_page.goto(tieba_url, wait_until="domcontentloaded")
 
             # 等待页面加载,使用配置文件中的延时设置
@@ -514,6 +477,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
         try:
             # 使用Playwright访问创作者主页
+            await self.wait_rate_limit(creator_url)
             await self.playwright_page.goto(creator_url, wait_until="domcontentloaded")
 
             # 等待页面加载,使用配置文件中的延时设置
@@ -549,6 +513,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
         try:
             # 使用Playwright访问创作者帖子列表页面
+            await self.wait_rate_limit(creator_url)
             await self.playwright_page.goto(creator_url, wait_until="domcontentloaded")
 
             # 等待页面加载,使用配置文件中的延时设置
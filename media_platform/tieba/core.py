@@ -24,11 +24,15 @@ from playwright.async_api import (
 
 import config
 from base.base_crawler import AbstractCrawler
+from cache.seen_index import filter_unseen, mark_seen
 from model.m_baidu_tieba import TiebaCreator, TiebaNote
 from proxy.proxy_ip_pool import IpInfoModel, ProxyIpPool, create_ip_pool
 from store import tieba as tieba_store
 from tools import utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.http_cassette import wrap_page
+from tools.rate_limiter import get_crawl_interval
+from tools.search_checkpoint import SearchCheckpoint
 from var import crawler_type_var, source_keyword_var
 
 from .client import BaiduTieBaClient
@@ -93,7 +97,7 @@ class TieBaCrawler(AbstractCrawler):
             # 注入反检测脚本 - 针对百度的特殊检测
             await self._inject_anti_detection_scripts()
 
-            self.context_page = await self.browser_context.new_page()
+            self.context_page = wrap_page(await self.browser_context.new_page())
 
             # 先访问百度首页,再点击贴吧链接,避免触发安全验证
             await self._navigate_to_tieba_via_baidu()
@@ -145,12 +149,13 @@ class TieBaCrawler(AbstractCrawler):
         if config.CRAWLER_MAX_NOTES_COUNT < tieba_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = tieba_limit_count
         start_page = config.START_PAGE
-        for keyword in config.KEYWORDS.split(","):
+        checkpoint = SearchCheckpoint("tieba", config.KEYWORDS.split(","))
+        for keyword in checkpoint.iter_keywords():
             source_keyword_var.set(keyword)
             utils.logger.info(
                 f"[BaiduTieBaCrawler.search] Current search keyword: {keyword}"
             )
-            page = 1
+            page = checkpoint.get(keyword, "page", 1)
             while (
                 page - start_page + 1
             ) * tieba_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
@@ -179,6 +184,7 @@ class TieBaCrawler(AbstractCrawler):
                     utils.logger.info(
                         f"[BaiduTieBaCrawler.search] Note list len: {len(notes_list)}"
                     )
+                    notes_list = filter_unseen("tieba", notes_list, lambda note: note.note_id)
                     await self.get_specified_notes(
                         note_id_list=[note_detail.note_id for note_detail in notes_list]
                     )
@@ -188,6 +194,7 @@ class TieBaCrawler(AbstractCrawler):
                     utils.logger.info(f"[TieBaCrawler.search] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page}")
                     
                     page += 1
+                    checkpoint.save(keyword, page=page)
                 except Exception as ex:
                     utils.logger.error(
                         f"[BaiduTieBaCrawler.search] Search keywords error, current page: {page}, current keyword: {keyword}, err: {ex}"
@@ -254,6 +261,7 @@ class TieBaCrawler(AbstractCrawler):
                 note_details_model.append(note_detail)
                 await tieba_store.update_tieba_note(note_detail)
         await self.batch_get_note_comments(note_details_model)
+        mark_seen("tieba", [note_detail.note_id for note_detail in note_details_model])
 
     async def get_note_detail_async_task(
         self, note_id: str, semaphore: asyncio.Semaphore
@@ -275,8 +283,8 @@ class TieBaCrawler(AbstractCrawler):
                 note_detail: TiebaNote = await self.tieba_client.get_note_by_id(note_id)
                 
                 # Sleep after fetching note details
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[TieBaCrawler.get_note_detail_async_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching note details {note_id}")
+                await asyncio.sleep(get_crawl_interval())
+                utils.logger.info(f"[TieBaCrawler.get_note_detail_async_task] Sleeping for {get_crawl_interval()} seconds after fetching note details {note_id}")
                 
                 if not note_detail:
                     utils.logger.error(
@@ -335,12 +343,12 @@ class TieBaCrawler(AbstractCrawler):
             )
             
             # Sleep before fetching comments
-            await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-            utils.logger.info(f"[TieBaCrawler.get_comments_async_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds before fetching comments for note {note_detail.note_id}")
+            await asyncio.sleep(get_crawl_interval())
+            utils.logger.info(f"[TieBaCrawler.get_comments_async_task] Sleeping for {get_crawl_interval()} seconds before fetching comments for note {note_detail.note_id}")
             
             await self.tieba_client.get_note_all_comments(
                 note_detail=note_detail,
-                crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
+                crawl_interval=get_crawl_interval(),
                 callback=tieba_store.batch_update_tieba_note_comments,
                 max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
             )
@@ -457,7 +465,7 @@ class TieBaCrawler(AbstractCrawler):
                 await self.context_page.close()
 
                 # 切换到新的贴吧页面
-                self.context_page = new_page
+                self.context_page = wrap_page(new_page)
                 utils.logger.info("[TieBaCrawler] ✅ 已切换到新标签页 (贴吧页面)")
             else:
                 # 如果是同一标签页跳转,正常等待导航
@@ -658,10 +666,11 @@ class TieBaCrawler(AbstractCrawler):
 
     async def close(self):
         """
-        Close browser context
+        Close API client connections and browser context
         Returns:
 
         """
+        await self.tieba_client.close()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
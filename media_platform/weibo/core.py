@@ -14,6 +14,7 @@
 # @Desc    : 微博爬虫主流程代码
 
 import asyncio
+import functools
 import os
 # import random  # Removed as we now use fixed config.CRAWLER_MAX_SLEEP_SEC intervals
 from asyncio import Task
@@ -29,10 +30,15 @@ from playwright.async_api import (
 
 import config
 from base.base_crawler import AbstractCrawler
+from cache.seen_index import filter_unseen, mark_seen
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import weibo as weibo_store
 from tools import utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.http_cassette import wrap_page
+from tools.media_download_pool import submit_media_download
+from tools.rate_limiter import get_crawl_interval
+from tools.search_checkpoint import SearchCheckpoint
 from var import crawler_type_var, source_keyword_var
 
 from .client import WeiboClient
@@ -82,7 +88,7 @@ class WeiboCrawler(AbstractCrawler):
                 await self.browser_context.add_init_script(path="libs/stealth.min.js")
 
 
-            self.context_page = await self.browser_context.new_page()
+            self.context_page = wrap_page(await self.browser_context.new_page())
             await self.context_page.goto(self.mobile_index_url)
 
             # Create a client to interact with the xiaohongshu website.
@@ -141,10 +147,11 @@ class WeiboCrawler(AbstractCrawler):
             utils.logger.error(f"[WeiboCrawler.search] Invalid WEIBO_SEARCH_TYPE: {config.WEIBO_SEARCH_TYPE}")
             return
 
-        for keyword in config.KEYWORDS.split(","):
+        checkpoint = SearchCheckpoint("wb", config.KEYWORDS.split(","), scope=config.WEIBO_SEARCH_TYPE)
+        for keyword in checkpoint.iter_keywords():
             source_keyword_var.set(keyword)
             utils.logger.info(f"[WeiboCrawler.search] Current search keyword: {keyword}")
-            page = 1
+            page = checkpoint.get(keyword, "page", 1)
             while (page - start_page + 1) * weibo_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
                 if page < start_page:
                     utils.logger.info(f"[WeiboCrawler.search] Skip page: {page}")
@@ -154,6 +161,7 @@ class WeiboCrawler(AbstractCrawler):
                 search_res = await self.wb_client.get_note_by_keyword(keyword=keyword, page=page, search_type=search_type)
                 note_id_list: List[str] = []
                 note_list = filter_search_result_card(search_res.get("cards"))
+                note_list = filter_unseen("wb", note_list, lambda item: (item.get("mblog") or {}).get("id") if item else None)
                 for note_item in note_list:
                     if note_item:
                         mblog: Dict = note_item.get("mblog")
@@ -169,6 +177,8 @@ class WeiboCrawler(AbstractCrawler):
                 utils.logger.info(f"[WeiboCrawler.search] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
                 
                 await self.batch_get_notes_comments(note_id_list)
+                mark_seen("wb", note_id_list)
+                checkpoint.save(keyword, page=page)
 
     async def get_specified_notes(self):
         """
@@ -195,8 +205,8 @@ class WeiboCrawler(AbstractCrawler):
                 result = await self.wb_client.get_note_info_by_id(note_id)
                 
                 # Sleep after fetching note details
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[WeiboCrawler.get_note_info_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching note details {note_id}")
+                await asyncio.sleep(get_crawl_interval())
+                utils.logger.info(f"[WeiboCrawler.get_note_info_task] Sleeping for {get_crawl_interval()} seconds after fetching note details {note_id}")
                 
                 return result
             except DataFetchError as ex:
@@ -236,12 +246,12 @@ class WeiboCrawler(AbstractCrawler):
                 utils.logger.info(f"[WeiboCrawler.get_note_comments] begin get note_id: {note_id} comments ...")
                 
                 # Sleep before fetching comments
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[WeiboCrawler.get_note_comments] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds before fetching comments for note {note_id}")
+                await asyncio.sleep(get_crawl_interval())
+                utils.logger.info(f"[WeiboCrawler.get_note_comments] Sleeping for {get_crawl_interval()} seconds before fetching comments for note {note_id}")
                 
                 await self.wb_client.get_note_all_comments(
                     note_id=note_id,
-                    crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,  # Use fixed interval instead of random
+                    crawl_interval=get_crawl_interval(),
                     callback=weibo_store.batch_update_weibo_note_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
                 )
@@ -267,12 +277,10 @@ class WeiboCrawler(AbstractCrawler):
             url = pic.get("url")
             if not url:
                 continue
-            content = await self.wb_client.get_note_image(url)
-            await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-            utils.logger.info(f"[WeiboCrawler.get_note_images] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching image")
-            if content != None:
-                extension_file_name = url.split(".")[-1]
-                await weibo_store.update_weibo_note_image(pic["pid"], content, extension_file_name)
+            extension_file_name = url.split(".")[-1]
+            await submit_media_download(
+                url, functools.partial(weibo_store.download_weibo_note_image, pic["pid"], url, extension_file_name, self.wb_client.download_note_image)
+            )
 
     async def get_creators_and_notes(self) -> None:
         """
@@ -382,7 +390,8 @@ class WeiboCrawler(AbstractCrawler):
             return await self.launch_browser(chromium, playwright_proxy, user_agent, headless)
 
     async def close(self):
-        """Close browser context"""
+        """Close API client connections and browser context"""
+        await self.wb_client.close()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
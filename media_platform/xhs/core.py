@@ -9,8 +9,8 @@
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
 import asyncio
+import functools
 import os
-import random
 from asyncio import Task
 from typing import Dict, List, Optional
 
@@ -21,16 +21,20 @@ from playwright.async_api import (
     Playwright,
     async_playwright,
 )
-from tenacity import RetryError
 
 import config
 from base.base_crawler import AbstractCrawler
+from cache.seen_index import filter_unseen, mark_seen
 from config import CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES
 from model.m_xiaohongshu import NoteUrlInfo, CreatorUrlInfo
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import xhs as xhs_store
 from tools import utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.http_cassette import wrap_page
+from tools.media_download_pool import submit_media_download
+from tools.rate_limiter import get_crawl_interval
+from tools.search_checkpoint import SearchCheckpoint
 from var import crawler_type_var, source_keyword_var
 
 from .client import XiaoHongShuClient
@@ -82,7 +86,7 @@ class XiaoHongShuCrawler(AbstractCrawler):
                 # stealth.min.js is a js script to prevent the website from detecting the crawler.
                 await self.browser_context.add_init_script(path="libs/stealth.min.js")
 
-            self.context_page = await self.browser_context.new_page()
+            self.context_page = wrap_page(await self.browser_context.new_page())
             await self.context_page.goto(self.index_url)
 
             # Create a client to interact with the xiaohongshu website.
@@ -120,11 +124,12 @@ class XiaoHongShuCrawler(AbstractCrawler):
         if config.CRAWLER_MAX_NOTES_COUNT < xhs_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = xhs_limit_count
         start_page = config.START_PAGE
-        for keyword in config.KEYWORDS.split(","):
+        checkpoint = SearchCheckpoint("xhs", config.KEYWORDS.split(","))
+        for keyword in checkpoint.iter_keywords():
             source_keyword_var.set(keyword)
             utils.logger.info(f"[XiaoHongShuCrawler.search] Current search keyword: {keyword}")
-            page = 1
-            search_id = get_search_id()
+            page = checkpoint.get(keyword, "page", 1)
+            search_id = checkpoint.get(keyword, "search_id") or get_search_id()
             while (page - start_page + 1) * xhs_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
                 if page < start_page:
                     utils.logger.info(f"[XiaoHongShuCrawler.search] Skip page {page}")
@@ -146,13 +151,14 @@ class XiaoHongShuCrawler(AbstractCrawler):
                         utils.logger.info("No more content!")
                         break
                     semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+                    post_items = [post_item for post_item in notes_res.get("items", {}) if post_item.get("model_type") not in ("rec_query", "hot_query")]
                     task_list = [
                         self.get_note_detail_async_task(
                             note_id=post_item.get("id"),
                             xsec_source=post_item.get("xsec_source"),
                             xsec_token=post_item.get("xsec_token"),
                             semaphore=semaphore,
-                        ) for post_item in notes_res.get("items", {}) if post_item.get("model_type") not in ("rec_query", "hot_query")
+                        ) for post_item in filter_unseen("xhs", post_items, lambda item: item.get("id"))
                     ]
                     note_details = await asyncio.gather(*task_list)
                     for note_detail in note_details:
@@ -164,7 +170,9 @@ class XiaoHongShuCrawler(AbstractCrawler):
                     page += 1
                     utils.logger.info(f"[XiaoHongShuCrawler.search] Note details: {note_details}")
                     await self.batch_get_note_comments(note_ids, xsec_tokens)
-                    
+                    mark_seen("xhs", note_ids)
+                    checkpoint.save(keyword, page=page, search_id=search_id)
+
                     # Sleep after each page navigation
                     await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
                     utils.logger.info(f"[XiaoHongShuCrawler.search] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
@@ -289,8 +297,8 @@ class XiaoHongShuCrawler(AbstractCrawler):
                 note_detail.update({"xsec_token": xsec_token, "xsec_source": xsec_source})
                 
                 # Sleep after fetching note detail
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[get_note_detail_async_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching note {note_id}")
+                await asyncio.sleep(get_crawl_interval())
+                utils.logger.info(f"[get_note_detail_async_task] Sleeping for {get_crawl_interval()} seconds after fetching note {note_id}")
                 
                 return note_detail
 
@@ -323,7 +331,7 @@ class XiaoHongShuCrawler(AbstractCrawler):
         async with semaphore:
             utils.logger.info(f"[XiaoHongShuCrawler.get_comments] Begin get note id comments {note_id}")
             # Use fixed crawling interval
-            crawl_interval = config.CRAWLER_MAX_SLEEP_SEC
+            crawl_interval = get_crawl_interval()
             await self.xhs_client.get_note_all_comments(
                 note_id=note_id,
                 xsec_token=xsec_token,
@@ -427,7 +435,8 @@ class XiaoHongShuCrawler(AbstractCrawler):
             return await self.launch_browser(chromium, playwright_proxy, user_agent, headless)
 
     async def close(self):
-        """Close browser context"""
+        """Close API client connections and browser context"""
+        await self.xhs_client.close()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
@@ -460,18 +469,14 @@ class XiaoHongShuCrawler(AbstractCrawler):
 
         if not image_list:
             return
-        picNum = 0
-        for pic in image_list:
+        for picNum, pic in enumerate(image_list):
             url = pic.get("url")
             if not url:
                 continue
-            content = await self.xhs_client.get_note_media(url)
-            await asyncio.sleep(random.random())
-            if content is None:
-                continue
             extension_file_name = f"{picNum}.jpg"
-            picNum += 1
-            await xhs_store.update_xhs_note_image(note_id, content, extension_file_name)
+            await submit_media_download(
+                url, functools.partial(xhs_store.download_xhs_note_image, note_id, url, extension_file_name, self.xhs_client.download_note_media)
+            )
 
     async def get_notice_video(self, note_item: Dict):
         """
@@ -487,12 +492,8 @@ class XiaoHongShuCrawler(AbstractCrawler):
 
         if not videos:
             return
-        videoNum = 0
-        for url in videos:
-            content = await self.xhs_client.get_note_media(url)
-            await asyncio.sleep(random.random())
-            if content is None:
-                continue
+        for videoNum, url in enumerate(videos):
             extension_file_name = f"{videoNum}.mp4"
-            videoNum += 1
-            await xhs_store.update_xhs_note_video(note_id, content, extension_file_name)
+            await submit_media_download(
+                url, functools.partial(xhs_store.download_xhs_note_video, note_id, url, extension_file_name, self.xhs_client.download_note_media)
+            )
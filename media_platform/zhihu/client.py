@@ -14,10 +14,8 @@ import json
 from typing import Any, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode
 
-import httpx
 from httpx import Response
 from playwright.async_api import BrowserContext, Page
-from tenacity import retry, stop_after_attempt, wait_fixed
 
 import config
 from base.base_crawler import AbstractApiClient
@@ -31,6 +29,8 @@ from .help import ZhihuExtractor, sign
 
 
 class ZhiHuClient(AbstractApiClient):
+    # 接口错误也重试
+    retry_exceptions = (Exception,)
 
     def __init__(
         self,
@@ -64,26 +64,18 @@ class ZhiHuClient(AbstractApiClient):
         headers['x-zse-96'] = sign_res["x-zse-96"]
         return headers
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-    async def request(self, method, url, **kwargs) -> Union[str, Any]:
+    def parse_response(self, response: Response, return_response: bool = False) -> Union[str, Any]:
         """
-        封装httpx的公共请求方法，对请求响应做一些处理
+        处理响应：403 转换成 ForbiddenError，其他错误转换成 DataFetchError
         Args:
-            method: 请求方法
-            url: 请求的URL
-            **kwargs: 其他请求参数，例如请求头、请求体等
+            response: httpx 响应
+            return_response: 是否返回响应文本
 
         Returns:
 
         """
-        # return response.text
-        return_response = kwargs.pop('return_response', False)
-
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-
         if response.status_code != 200:
-            utils.logger.error(f"[ZhiHuClient.request] Requset Url: {url}, Request error: {response.text}")
+            utils.logger.error(f"[ZhiHuClient.parse_response] Requset Url: {response.url}, Request error: {response.text}")
             if response.status_code == 403:
                 raise ForbiddenError(response.text)
             elif response.status_code == 404:  # 如果一个content没有评论也是404
@@ -96,11 +88,11 @@ class ZhiHuClient(AbstractApiClient):
         try:
             data: Dict = response.json()
             if data.get("error"):
-                utils.logger.error(f"[ZhiHuClient.request] Request error: {data}")
+                utils.logger.error(f"[ZhiHuClient.parse_response] Request error: {data}")
                 raise DataFetchError(data.get("error", {}).get("message"))
             return data
         except json.JSONDecodeError:
-            utils.logger.error(f"[ZhiHuClient.request] Request error: {response.text}")
+            utils.logger.error(f"[ZhiHuClient.parse_response] Request error: {response.text}")
             raise DataFetchError(response.text)
 
     async def get(self, uri: str, params=None, **kwargs) -> Union[Response, Dict, str]:
@@ -266,6 +258,7 @@ class ZhiHuClient(AbstractApiClient):
         content: ZhihuContent,
         crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
+        latest_comment_time: Optional[int] = None,
     ) -> List[ZhihuComment]:
         """
         获取指定帖子下的所有一级评论，该方法会一直查找一个帖子下的所有评论信息
@@ -273,6 +266,7 @@ class ZhiHuClient(AbstractApiClient):
             content: 内容详情对象(问题｜文章｜视频)
             crawl_interval: 爬取一次笔记的延迟单位（秒）
             callback: 一次笔记爬取结束后
+            latest_comment_time: 增量爬取：已存储评论的最新发布时间，按时间倒序翻页，遇到不比它新的评论即停止
 
         Returns:
 
@@ -281,14 +275,21 @@ class ZhiHuClient(AbstractApiClient):
         is_end: bool = False
         offset: str = ""
         limit: int = 10
+        order_by = "score" if latest_comment_time is None else "ts"
         while not is_end:
-            root_comment_res = await self.get_root_comments(content.content_id, content.content_type, offset, limit)
+            root_comment_res = await self.get_root_comments(content.content_id, content.content_type, offset, limit, order_by)
             if not root_comment_res:
                 break
             paging_info = root_comment_res.get("paging", {})
             is_end = paging_info.get("is_end")
             offset = self._extractor.extract_offset(paging_info)
             comments = self._extractor.extract_comments(content, root_comment_res.get("data"))
+            if latest_comment_time is not None:
+                new_comments = [comment for comment in comments if comment.publish_time > latest_comment_time]
+                if len(new_comments) < len(comments):
+                    utils.logger.info(f"[ZhiHuClient.get_note_all_comments] Reached stored comments of content: {content.content_id}, stop paging")
+                    is_end = True
+                comments = new_comments
 
             if not comments:
                 break
@@ -27,11 +27,15 @@ from playwright.async_api import (
 import config
 from constant import zhihu as constant
 from base.base_crawler import AbstractCrawler
+from cache.seen_index import filter_unseen, mark_seen
 from model.m_zhihu import ZhihuContent, ZhihuCreator
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import zhihu as zhihu_store
 from tools import utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.http_cassette import wrap_page
+from tools.rate_limiter import get_crawl_interval
+from tools.search_checkpoint import SearchCheckpoint
 from var import crawler_type_var, source_keyword_var
 
 from .client import ZhiHuClient
@@ -89,7 +93,7 @@ class ZhihuCrawler(AbstractCrawler):
                 # stealth.min.js is a js script to prevent the website from detecting the crawler.
                 await self.browser_context.add_init_script(path="libs/stealth.min.js")
 
-            self.context_page = await self.browser_context.new_page()
+            self.context_page = wrap_page(await self.browser_context.new_page())
             await self.context_page.goto(self.index_url, wait_until="domcontentloaded")
 
             # Create a client to interact with the zhihu website.
@@ -139,12 +143,13 @@ class ZhihuCrawler(AbstractCrawler):
         if config.CRAWLER_MAX_NOTES_COUNT < zhihu_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = zhihu_limit_count
         start_page = config.START_PAGE
-        for keyword in config.KEYWORDS.split(","):
+        checkpoint = SearchCheckpoint("zhihu", config.KEYWORDS.split(","))
+        for keyword in checkpoint.iter_keywords():
             source_keyword_var.set(keyword)
             utils.logger.info(
                 f"[ZhihuCrawler.search] Current search keyword: {keyword}"
             )
-            page = 1
+            page = checkpoint.get(keyword, "page", 1)
             while (
                 page - start_page + 1
             ) * zhihu_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
@@ -175,10 +180,13 @@ class ZhihuCrawler(AbstractCrawler):
                     utils.logger.info(f"[ZhihuCrawler.search] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
                     
                     page += 1
+                    content_list = filter_unseen("zhihu", content_list, lambda item: item.content_id)
                     for content in content_list:
                         await zhihu_store.update_zhihu_content(content)
 
                     await self.batch_get_content_comments(content_list)
+                    mark_seen("zhihu", [content.content_id for content in content_list])
+                    checkpoint.save(keyword, page=page)
                 except DataFetchError:
                     utils.logger.error("[ZhihuCrawler.search] Search content error")
                     return
@@ -225,13 +233,17 @@ class ZhihuCrawler(AbstractCrawler):
             )
             
             # Sleep before fetching comments
-            await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-            utils.logger.info(f"[ZhihuCrawler.get_comments] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds before fetching comments for content {content_item.content_id}")
+            await asyncio.sleep(get_crawl_interval())
+            utils.logger.info(f"[ZhihuCrawler.get_comments] Sleeping for {get_crawl_interval()} seconds before fetching comments for content {content_item.content_id}")
             
+            latest_comment_time = None
+            if config.ENABLE_INCREMENTAL_COMMENTS:
+                latest_comment_time = await zhihu_store.get_latest_comment_time(content_item.content_id)
             await self.zhihu_client.get_note_all_comments(
                 content=content_item,
-                crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
+                crawl_interval=get_crawl_interval(),
                 callback=zhihu_store.batch_update_zhihu_note_comments,
+                latest_comment_time=latest_comment_time,
             )
 
     async def get_creators_and_notes(self) -> None:
@@ -316,8 +328,8 @@ class ZhihuCrawler(AbstractCrawler):
                 result = await self.zhihu_client.get_answer_info(question_id, answer_id)
                 
                 # Sleep after fetching answer details
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[ZhihuCrawler.get_note_detail] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching answer details {answer_id}")
+                await asyncio.sleep(get_crawl_interval())
+                utils.logger.info(f"[ZhihuCrawler.get_note_detail] Sleeping for {get_crawl_interval()} seconds after fetching answer details {answer_id}")
                 
                 return result
 
@@ -329,8 +341,8 @@ class ZhihuCrawler(AbstractCrawler):
                 result = await self.zhihu_client.get_article_info(article_id)
                 
                 # Sleep after fetching article details
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[ZhihuCrawler.get_note_detail] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching article details {article_id}")
+                await asyncio.sleep(get_crawl_interval())
+                utils.logger.info(f"[ZhihuCrawler.get_note_detail] Sleeping for {get_crawl_interval()} seconds after fetching article details {article_id}")
                 
                 return result
 
@@ -342,8 +354,8 @@ class ZhihuCrawler(AbstractCrawler):
                 result = await self.zhihu_client.get_video_info(video_id)
                 
                 # Sleep after fetching video details
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[ZhihuCrawler.get_note_detail] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching video details {video_id}")
+                await asyncio.sleep(get_crawl_interval())
+                utils.logger.info(f"[ZhihuCrawler.get_note_detail] Sleeping for {get_crawl_interval()} seconds after fetching video details {video_id}")
                 
                 return result
 
@@ -472,7 +484,8 @@ class ZhihuCrawler(AbstractCrawler):
             )
 
     async def close(self):
-        """Close browser context"""
+        """Close API client connections and browser context"""
+        await self.zhihu_client.close()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
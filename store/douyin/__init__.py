@@ -12,10 +12,12 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/1/14 18:46
 # @Desc    :
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 import config
-from var import source_keyword_var
+from base.base_crawler import MediaDownloadFunc
+from store.write_behind import write_behind
+from var import crawler_type_var, source_keyword_var
 
 from ._store_impl import *
 from .douyin_store_media import *
@@ -26,15 +28,25 @@ class DouyinStoreFactory:
         "csv": DouyinCsvStoreImplement,
         "db": DouyinDbStoreImplement,
         "json": DouyinJsonStoreImplement,
+        "jsonl": DouyinJsonlStoreImplement,
+        "parquet": DouyinParquetStoreImplement,
         "sqlite": DouyinSqliteStoreImplement,
     }
 
+    # 按（保存方式, 爬取类型）缓存的 store 实例，整个进程共用一个 store 及其文件写锁
+    _store_instances: Dict[Tuple[str, str], AbstractStore] = {}
+
     @staticmethod
     def create_store() -> AbstractStore:
+        store_key = (config.SAVE_DATA_OPTION, crawler_type_var.get())
+        if store_key in DouyinStoreFactory._store_instances:
+            return DouyinStoreFactory._store_instances[store_key]
         store_class = DouyinStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[DouyinStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+            raise ValueError("[DouyinStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or sqlite or parquet ...")
+        store = store_class()
+        DouyinStoreFactory._store_instances[store_key] = store
+        return store
 
 
 def _extract_note_image_list(aweme_detail: Dict) -> List[str]:
@@ -141,6 +153,7 @@ def _extract_music_download_url(aweme_detail: Dict) -> str:
     return music_url
 
 
+@write_behind
 async def update_douyin_aweme(aweme_item: Dict):
     aweme_id = aweme_item.get("aweme_id")
     user_info = aweme_item.get("author", {})
@@ -158,10 +171,10 @@ async def update_douyin_aweme(aweme_item: Dict):
         "user_signature": user_info.get("signature"),
         "nickname": user_info.get("nickname"),
         "avatar": user_info.get("avatar_thumb", {}).get("url_list", [""])[0],
-        "liked_count": str(interact_info.get("digg_count")),
-        "collected_count": str(interact_info.get("collect_count")),
-        "comment_count": str(interact_info.get("comment_count")),
-        "share_count": str(interact_info.get("share_count")),
+        "liked_count": utils.interact_count_text(interact_info.get("digg_count")),
+        "collected_count": utils.interact_count_text(interact_info.get("collect_count")),
+        "comment_count": utils.interact_count_text(interact_info.get("comment_count")),
+        "share_count": utils.interact_count_text(interact_info.get("share_count")),
         "ip_location": aweme_item.get("ip_label", ""),
         "last_modify_ts": utils.get_current_timestamp(),
         "aweme_url": f"https://www.douyin.com/video/{aweme_id}",
@@ -175,18 +188,38 @@ async def update_douyin_aweme(aweme_item: Dict):
     await DouyinStoreFactory.create_store().store_content(content_item=save_content_item)
 
 
+@write_behind
 async def batch_update_dy_aweme_comments(aweme_id: str, comments: List[Dict]):
     if not comments:
         return
-    for comment_item in comments:
-        await update_dy_aweme_comment(aweme_id, comment_item)
+    save_comment_items = [_build_comment_item(aweme_id, comment_item) for comment_item in comments]
+    save_comment_items = [item for item in save_comment_items if item]
+    await DouyinStoreFactory.create_store().store_comments(save_comment_items)
 
 
+@write_behind
 async def update_dy_aweme_comment(aweme_id: str, comment_item: Dict):
+    save_comment_item = _build_comment_item(aweme_id, comment_item)
+    if not save_comment_item:
+        return
+    await DouyinStoreFactory.create_store().store_comment(comment_item=save_comment_item)
+
+
+def _build_comment_item(aweme_id: str, comment_item: Dict) -> Optional[Dict]:
+    """
+    将抖音评论转换为存储的字段
+
+    Args:
+        aweme_id (str): 视频id
+        comment_item (Dict): 抖音评论
+
+    Returns:
+        Optional[Dict]: 存储的评论，评论不属于该视频时返回 None
+    """
     comment_aweme_id = comment_item.get("aweme_id")
     if aweme_id != comment_aweme_id:
         utils.logger.error(f"[store.douyin.update_dy_aweme_comment] comment_aweme_id: {comment_aweme_id} != aweme_id: {aweme_id}")
-        return
+        return None
     user_info = comment_item.get("user", {})
     comment_id = comment_item.get("cid")
     parent_comment_id = comment_item.get("reply_id", "0")
@@ -204,17 +237,17 @@ async def update_dy_aweme_comment(aweme_id: str, comment_item: Dict):
         "user_signature": user_info.get("signature"),
         "nickname": user_info.get("nickname"),
         "avatar": avatar_info.get("url_list", [""])[0],
-        "sub_comment_count": str(comment_item.get("reply_comment_total", 0)),
+        "sub_comment_count": utils.interact_count_text(comment_item.get("reply_comment_total")),
         "like_count": (comment_item.get("digg_count") if comment_item.get("digg_count") else 0),
         "last_modify_ts": utils.get_current_timestamp(),
         "parent_comment_id": parent_comment_id,
         "pictures": ",".join(_extract_comment_image_list(comment_item)),
     }
     utils.logger.info(f"[store.douyin.update_dy_aweme_comment] douyin aweme comment: {comment_id}, content: {save_comment_item.get('content')}")
-
-    await DouyinStoreFactory.create_store().store_comment(comment_item=save_comment_item)
+    return save_comment_item
 
 
+@write_behind
 async def save_creator(user_id: str, creator: Dict):
     user_info = creator.get("user", {})
     gender_map = {0: "未知", 1: "男", 2: "女"}
@@ -264,3 +297,33 @@ async def update_dy_aweme_video(aweme_id, video_content, extension_file_name):
     """
 
     await DouYinVideo().store_video({"aweme_id": aweme_id, "video_content": video_content, "extension_file_name": extension_file_name})
+
+
+async def download_dy_aweme_image(aweme_id: str, url: str, extension_file_name: str, download: MediaDownloadFunc) -> bool:
+    """
+    流式下载抖音作品图片
+    Args:
+        aweme_id:
+        url: 图片地址
+        extension_file_name:
+        download: client 提供的流式下载函数
+
+    Returns:
+        是否下载成功
+    """
+    return await DouYinImage().download_image(aweme_id, url, extension_file_name, download)
+
+
+async def download_dy_aweme_video(aweme_id: str, url: str, extension_file_name: str, download: MediaDownloadFunc) -> bool:
+    """
+    流式下载抖音短视频
+    Args:
+        aweme_id:
+        url: 视频地址
+        extension_file_name:
+        download: client 提供的流式下载函数
+
+    Returns:
+        是否下载成功
+    """
+    return await DouYinVideo().download_video(aweme_id, url, extension_file_name, download)
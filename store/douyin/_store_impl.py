@@ -17,13 +17,15 @@ import asyncio
 import json
 import os
 import pathlib
-from typing import Dict
+from typing import AsyncIterator, Dict, List, Optional
 
 from sqlalchemy import select
 
 import config
 from base.base_crawler import AbstractStore
 from database.db_session import get_session
+from database.db_stream import stream_comments, stream_contents
+from database.db_upsert import update_existing_rows, upsert_rows
 from database.models import DouyinAweme, DouyinAwemeComment, DyCreator
 from tools import utils, words
 from tools.async_file_writer import AsyncFileWriter
@@ -31,10 +33,30 @@ from var import crawler_type_var
 
 
 class DouyinCsvStoreImplement(AbstractStore):
+    # csv 列顺序，与 store/douyin/__init__.py 中组装的字段保持一致
+    CSV_SCHEMAS = {
+        "contents": [
+            "aweme_id", "aweme_type", "title", "desc", "create_time", "user_id", "sec_uid", "short_user_id",
+            "user_unique_id", "user_signature", "nickname", "avatar", "liked_count", "collected_count",
+            "comment_count", "share_count", "ip_location", "last_modify_ts", "aweme_url", "cover_url",
+            "video_download_url", "music_download_url", "note_download_url", "source_keyword",
+        ],
+        "comments": [
+            "comment_id", "create_time", "ip_location", "aweme_id", "content", "user_id", "sec_uid",
+            "short_user_id", "user_unique_id", "user_signature", "nickname", "avatar", "sub_comment_count",
+            "like_count", "last_modify_ts", "parent_comment_id", "pictures",
+        ],
+        "creators": [
+            "user_id", "nickname", "gender", "avatar", "desc", "ip_location", "follows", "fans",
+            "interaction", "videos_count", "last_modify_ts",
+        ],
+    }
+
     def __init__(self):
         self.file_writer = AsyncFileWriter(
             crawler_type=crawler_type_var.get(),
-            platform="douyin"
+            platform="douyin",
+            csv_schemas=self.CSV_SCHEMAS
         )
 
     async def store_content(self, content_item: Dict):
@@ -87,20 +109,22 @@ class DouyinDbStoreImplement(AbstractStore):
         Args:
             content_item: content item dict
         """
-        aweme_id = content_item.get("aweme_id")
+        await self.store_contents([content_item])
+
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        Douyin contents DB batch storage implementation, one upsert per page
+        Args:
+            content_items: content item dicts
+        """
+        # 没有标题的视频只更新已有记录，不新增
+        insert_items = [item for item in content_items if item.get("title")]
+        update_items = [item for item in content_items if not item.get("title")]
         async with get_session() as session:
-            result = await session.execute(select(DouyinAweme).where(DouyinAweme.aweme_id == aweme_id))
-            aweme_detail = result.scalar_one_or_none()
-
-            if not aweme_detail:
-                content_item["add_ts"] = utils.get_current_timestamp()
-                if content_item.get("title"):
-                    new_content = DouyinAweme(**content_item)
-                    session.add(new_content)
-            else:
-                for key, value in content_item.items():
-                    setattr(aweme_detail, key, value)
-            await session.commit()
+            if insert_items:
+                await upsert_rows(session, DouyinAweme, insert_items, ["aweme_id"])
+            if update_items:
+                await update_existing_rows(session, DouyinAweme, update_items, ["aweme_id"])
 
     async def store_comment(self, comment_item: Dict):
         """
@@ -108,19 +132,18 @@ class DouyinDbStoreImplement(AbstractStore):
         Args:
             comment_item: comment item dict
         """
-        comment_id = comment_item.get("comment_id")
-        async with get_session() as session:
-            result = await session.execute(select(DouyinAwemeComment).where(DouyinAwemeComment.comment_id == comment_id))
-            comment_detail = result.scalar_one_or_none()
+        await self.store_comments([comment_item])
 
-            if not comment_detail:
-                comment_item["add_ts"] = utils.get_current_timestamp()
-                new_comment = DouyinAwemeComment(**comment_item)
-                session.add(new_comment)
-            else:
-                for key, value in comment_item.items():
-                    setattr(comment_detail, key, value)
-            await session.commit()
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        Douyin comments DB batch storage implementation, one upsert per page
+        Args:
+            comment_items: comment item dicts
+        """
+        if not comment_items:
+            return
+        async with get_session() as session:
+            await upsert_rows(session, DouyinAwemeComment, comment_items, ["comment_id"])
 
     async def store_creator(self, creator: Dict):
         """
@@ -140,7 +163,30 @@ class DouyinDbStoreImplement(AbstractStore):
             else:
                 for key, value in creator.items():
                     setattr(user_detail, key, value)
-            await session.commit()
+
+    def iter_contents(self, aweme_id: Optional[int] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream awemes in batches instead of loading the whole table, e.g. async for rows in store.iter_contents(keyword=...)
+        Args:
+            aweme_id: only this aweme
+            keyword: only awemes found by this search keyword
+            start_ts: add_ts lower bound in milliseconds, inclusive
+            end_ts: add_ts upper bound in milliseconds, exclusive
+            batch_size: rows per batch, DB_STREAM_BATCH_SIZE by default
+
+        Returns:
+            async iterator of row dict lists
+        """
+        return stream_contents(DouyinAweme, "aweme_id", aweme_id, keyword, start_ts, end_ts, batch_size)
+
+    def iter_comments(self, aweme_id: Optional[int] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream comments in batches, the filters are the same as iter_contents,
+        keyword matches the search keyword of the aweme a comment belongs to
+        """
+        return stream_comments(DouyinAwemeComment, DouyinAweme, "aweme_id", aweme_id, keyword, start_ts, end_ts, batch_size)
 
 
 class DouyinJsonStoreImplement(AbstractStore):
@@ -193,6 +239,109 @@ class DouyinJsonStoreImplement(AbstractStore):
         )
 
 
+class DouyinJsonlStoreImplement(AbstractStore):
+    def __init__(self):
+        self.file_writer = AsyncFileWriter(
+            crawler_type=crawler_type_var.get(),
+            platform="douyin"
+        )
+
+    async def store_content(self, content_item: Dict):
+        """
+        content JSONL storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_single_item_to_jsonl(
+            item=content_item,
+            item_type="contents"
+        )
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment JSONL storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_single_item_to_jsonl(
+            item=comment_item,
+            item_type="comments"
+        )
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator JSONL storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.file_writer.write_single_item_to_jsonl(
+            item=creator,
+            item_type="creators"
+        )
+
+
+class DouyinParquetStoreImplement(AbstractStore):
+    # parquet 列与 csv 相同
+    PARQUET_SCHEMAS = DouyinCsvStoreImplement.CSV_SCHEMAS
+
+    def __init__(self):
+        self.file_writer = AsyncFileWriter(
+            crawler_type=crawler_type_var.get(),
+            platform="douyin",
+            csv_schemas=self.PARQUET_SCHEMAS
+        )
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(
+            item=content_item,
+            item_type="contents"
+        )
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(
+            item=comment_item,
+            item_type="comments"
+        )
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator Parquet storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(
+            item=creator,
+            item_type="creators"
+        )
+
 
 class DouyinSqliteStoreImplement(DouyinDbStoreImplement):
     pass
\ No newline at end of file
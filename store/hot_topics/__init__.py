@@ -1,30 +1,43 @@
-from typing import List
+from typing import Dict, List, Tuple
 
 import config
-from var import source_keyword_var
+from database.db_session import unit_of_work
+from store.write_behind import write_behind
+from var import crawler_type_var, source_keyword_var
 
 from ._store_impl import *
-from .bilibilli_store_media import *
+from store.bilibili.bilibilli_store_media import *
 
 
 class HotTopicsStoreFactory:
     STORES = {
-        "csv": BiliCsvStoreImplement,
-        "db": BiliDbStoreImplement,
-        "json": BiliJsonStoreImplement,
-        "sqlite": BiliSqliteStoreImplement,
+        "csv": HotTopicsCsvStoreImplement,
+        "db": HotTopicsDbStoreImplement,
+        "json": HotTopicsJsonStoreImplement,
+        "jsonl": HotTopicsJsonlStoreImplement,
+        "parquet": HotTopicsParquetStoreImplement,
+        "sqlite": HotTopicsSqliteStoreImplement,
     }
 
+    # 按（保存方式, 爬取类型）缓存的 store 实例，整个进程共用一个 store 及其文件写锁
+    _store_instances: Dict[Tuple[str, str], AbstractStore] = {}
+
     @staticmethod
     def create_store() -> AbstractStore:
+        store_key = (config.SAVE_DATA_OPTION, crawler_type_var.get())
+        if store_key in HotTopicsStoreFactory._store_instances:
+            return HotTopicsStoreFactory._store_instances[store_key]
         store_class = HotTopicsStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
             raise ValueError(
-                "[HotTopicsStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ..."
+                "[HotTopicsStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or sqlite or parquet ..."
             )
-        return store_class()
+        store = store_class()
+        HotTopicsStoreFactory._store_instances[store_key] = store
+        return store
 
 
+@write_behind
 async def update_bilibili_video(video_item: Dict):
     video_item_view: Dict = video_item.get("View")
     video_user_info: Dict = video_item_view.get("owner")
@@ -39,14 +52,14 @@ async def update_bilibili_video(video_item: Dict):
         "user_id": str(video_user_info.get("mid")),
         "nickname": video_user_info.get("name"),
         "avatar": video_user_info.get("face", ""),
-        "liked_count": str(video_item_stat.get("like", "")),
-        "disliked_count": str(video_item_stat.get("dislike", "")),
-        "video_play_count": str(video_item_stat.get("view", "")),
-        "video_favorite_count": str(video_item_stat.get("favorite", "")),
-        "video_share_count": str(video_item_stat.get("share", "")),
-        "video_coin_count": str(video_item_stat.get("coin", "")),
-        "video_danmaku": str(video_item_stat.get("danmaku", "")),
-        "video_comment": str(video_item_stat.get("reply", "")),
+        "liked_count": utils.interact_count_text(video_item_stat.get("like")),
+        "disliked_count": utils.interact_count_text(video_item_stat.get("dislike")),
+        "video_play_count": utils.interact_count_text(video_item_stat.get("view")),
+        "video_favorite_count": utils.interact_count_text(video_item_stat.get("favorite")),
+        "video_share_count": utils.interact_count_text(video_item_stat.get("share")),
+        "video_coin_count": utils.interact_count_text(video_item_stat.get("coin")),
+        "video_danmaku": utils.interact_count_text(video_item_stat.get("danmaku")),
+        "video_comment": utils.interact_count_text(video_item_stat.get("reply")),
         "last_modify_ts": utils.get_current_timestamp(),
         "video_url": f"https://www.bilibili.com/video/av{video_id}",
         "video_cover_url": video_item_view.get("pic", ""),
@@ -60,6 +73,7 @@ async def update_bilibili_video(video_item: Dict):
     )
 
 
+@write_behind
 async def update_up_info(video_item: Dict):
     video_item_card_list: Dict = video_item.get("Card")
     video_item_card: Dict = video_item_card_list.get("card")
@@ -81,14 +95,29 @@ async def update_up_info(video_item: Dict):
     await HotTopicsStoreFactory.create_store().store_creator(creator=saver_up_info)
 
 
+@write_behind
 async def batch_update_bilibili_video_comments(video_id: str, comments: List[Dict]):
     if not comments:
         return
-    for comment_item in comments:
-        await update_bilibili_video_comment(video_id, comment_item)
+    save_comment_items = [_build_comment_item(video_id, comment_item) for comment_item in comments]
+    await HotTopicsStoreFactory.create_store().store_comments(save_comment_items)
 
 
+@write_behind
 async def update_bilibili_video_comment(video_id: str, comment_item: Dict):
+    await HotTopicsStoreFactory.create_store().store_comment(_build_comment_item(video_id, comment_item))
+
+
+def _build_comment_item(video_id: str, comment_item: Dict) -> Dict:
+    """
+    Convert bilibili video comment to the stored fields
+    Args:
+        video_id:
+        comment_item:
+
+    Returns:
+
+    """
     comment_id = str(comment_item.get("rpid"))
     parent_comment_id = str(comment_item.get("parent", 0))
     content: Dict = comment_item.get("content")
@@ -105,16 +134,14 @@ async def update_bilibili_video_comment(video_id: str, comment_item: Dict):
         "sex": user_info.get("sex"),
         "sign": user_info.get("sign"),
         "avatar": user_info.get("avatar"),
-        "sub_comment_count": str(comment_item.get("rcount", 0)),
+        "sub_comment_count": utils.interact_count_text(comment_item.get("rcount")),
         "like_count": like_count,
         "last_modify_ts": utils.get_current_timestamp(),
     }
     utils.logger.info(
         f"[store.bilibili.update_bilibili_video_comment] Bilibili video comment: {comment_id}, content: {save_comment_item.get('content')}"
     )
-    await HotTopicsStoreFactory.create_store().store_comment(
-        comment_item=save_comment_item
-    )
+    return save_comment_item
 
 
 async def store_video(aid, video_content, extension_file_name):
@@ -134,68 +161,78 @@ async def store_video(aid, video_content, extension_file_name):
     )
 
 
+@write_behind
 async def batch_update_bilibili_creator_fans(creator_info: Dict, fans_list: List[Dict]):
     if not fans_list:
         return
-    for fan_item in fans_list:
-        fan_info: Dict = {
-            "id": fan_item.get("mid"),
-            "name": fan_item.get("uname"),
-            "sign": fan_item.get("sign"),
-            "avatar": fan_item.get("face"),
-        }
-        await update_bilibili_creator_contact(
-            creator_info=creator_info, fan_info=fan_info
-        )
+    # 一页数据共用一个 session，只提交一次
+    async with unit_of_work():
+        for fan_item in fans_list:
+            fan_info: Dict = {
+                "id": fan_item.get("mid"),
+                "name": fan_item.get("uname"),
+                "sign": fan_item.get("sign"),
+                "avatar": fan_item.get("face"),
+            }
+            await update_bilibili_creator_contact(
+                creator_info=creator_info, fan_info=fan_info
+            )
 
 
+@write_behind
 async def batch_update_bilibili_creator_followings(
     creator_info: Dict, followings_list: List[Dict]
 ):
     if not followings_list:
         return
-    for following_item in followings_list:
-        following_info: Dict = {
-            "id": following_item.get("mid"),
-            "name": following_item.get("uname"),
-            "sign": following_item.get("sign"),
-            "avatar": following_item.get("face"),
-        }
-        await update_bilibili_creator_contact(
-            creator_info=following_info, fan_info=creator_info
-        )
+    # 一页数据共用一个 session，只提交一次
+    async with unit_of_work():
+        for following_item in followings_list:
+            following_info: Dict = {
+                "id": following_item.get("mid"),
+                "name": following_item.get("uname"),
+                "sign": following_item.get("sign"),
+                "avatar": following_item.get("face"),
+            }
+            await update_bilibili_creator_contact(
+                creator_info=following_info, fan_info=creator_info
+            )
 
 
+@write_behind
 async def batch_update_bilibili_creator_dynamics(
     creator_info: Dict, dynamics_list: List[Dict]
 ):
     if not dynamics_list:
         return
-    for dynamic_item in dynamics_list:
-        dynamic_id: str = dynamic_item["id_str"]
-        dynamic_text: str = ""
-        if dynamic_item["modules"]["module_dynamic"].get("desc"):
-            dynamic_text = dynamic_item["modules"]["module_dynamic"]["desc"]["text"]
-        dynamic_type: str = dynamic_item["type"].split("_")[-1]
-        dynamic_pub_ts: str = dynamic_item["modules"]["module_author"]["pub_ts"]
-        dynamic_stat: Dict = dynamic_item["modules"]["module_stat"]
-        dynamic_comment: int = dynamic_stat["comment"]["count"]
-        dynamic_forward: int = dynamic_stat["forward"]["count"]
-        dynamic_like: int = dynamic_stat["like"]["count"]
-        dynamic_info: Dict = {
-            "dynamic_id": dynamic_id,
-            "text": dynamic_text,
-            "type": dynamic_type,
-            "pub_ts": dynamic_pub_ts,
-            "total_comments": dynamic_comment,
-            "total_forwards": dynamic_forward,
-            "total_liked": dynamic_like,
-        }
-        await update_bilibili_creator_dynamic(
-            creator_info=creator_info, dynamic_info=dynamic_info
-        )
+    # 一页数据共用一个 session，只提交一次
+    async with unit_of_work():
+        for dynamic_item in dynamics_list:
+            dynamic_id: str = dynamic_item["id_str"]
+            dynamic_text: str = ""
+            if dynamic_item["modules"]["module_dynamic"].get("desc"):
+                dynamic_text = dynamic_item["modules"]["module_dynamic"]["desc"]["text"]
+            dynamic_type: str = dynamic_item["type"].split("_")[-1]
+            dynamic_pub_ts: str = dynamic_item["modules"]["module_author"]["pub_ts"]
+            dynamic_stat: Dict = dynamic_item["modules"]["module_stat"]
+            dynamic_comment: int = dynamic_stat["comment"]["count"]
+            dynamic_forward: int = dynamic_stat["forward"]["count"]
+            dynamic_like: int = dynamic_stat["like"]["count"]
+            dynamic_info: Dict = {
+                "dynamic_id": dynamic_id,
+                "text": dynamic_text,
+                "type": dynamic_type,
+                "pub_ts": dynamic_pub_ts,
+                "total_comments": dynamic_comment,
+                "total_forwards": dynamic_forward,
+                "total_liked": dynamic_like,
+            }
+            await update_bilibili_creator_dynamic(
+                creator_info=creator_info, dynamic_info=dynamic_info
+            )
 
 
+@write_behind
 async def update_bilibili_creator_contact(creator_info: Dict, fan_info: Dict):
     save_contact_item = {
         "up_id": creator_info["id"],
@@ -214,6 +251,7 @@ async def update_bilibili_creator_contact(creator_info: Dict, fan_info: Dict):
     )
 
 
+@write_behind
 async def update_bilibili_creator_dynamic(creator_info: Dict, dynamic_info: Dict):
     save_dynamic_item = {
         "dynamic_id": dynamic_info["dynamic_id"],
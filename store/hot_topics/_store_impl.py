@@ -18,7 +18,7 @@ import csv
 import json
 import os
 import pathlib
-from typing import Dict
+from typing import AsyncIterator, Dict, List, Optional
 
 import aiofiles
 from sqlalchemy import select
@@ -27,6 +27,8 @@ from sqlalchemy.orm import sessionmaker
 import config
 from base.base_crawler import AbstractStore
 from database.db_session import get_session
+from database.db_stream import stream_comments, stream_contents
+from database.db_upsert import upsert_rows
 from database.models import (
     BilibiliVideoComment,
     BilibiliVideo,
@@ -40,9 +42,33 @@ from var import crawler_type_var
 
 
 class HotTopicsCsvStoreImplement(AbstractStore):
+    # csv 列顺序，与 store/hot_topics/__init__.py 中组装的字段保持一致
+    CSV_SCHEMAS = {
+        "videos": [
+            "video_id", "video_type", "title", "desc", "create_time", "user_id", "nickname", "avatar",
+            "liked_count", "disliked_count", "video_play_count", "video_favorite_count", "video_share_count",
+            "video_coin_count", "video_danmaku", "video_comment", "last_modify_ts", "video_url",
+            "video_cover_url", "source_keyword",
+        ],
+        "comments": [
+            "comment_id", "parent_comment_id", "create_time", "video_id", "content", "user_id", "nickname",
+            "sex", "sign", "avatar", "sub_comment_count", "like_count", "last_modify_ts",
+        ],
+        "contacts": [
+            "up_id", "fan_id", "up_name", "fan_name", "up_sign", "fan_sign", "up_avatar", "fan_avatar",
+            "last_modify_ts",
+        ],
+        "dynamics": [
+            "dynamic_id", "user_id", "user_name", "text", "type", "pub_ts", "total_comments",
+            "total_forwards", "total_liked", "last_modify_ts",
+        ],
+    }
+
     def __init__(self):
         self.file_writer = AsyncFileWriter(
-            crawler_type=crawler_type_var.get(), platform="bili"
+            crawler_type=crawler_type_var.get(),
+            platform="bili",
+            csv_schemas=self.CSV_SCHEMAS,
         )
 
     async def store_content(self, content_item: Dict):
@@ -109,49 +135,40 @@ class HotTopicsDbStoreImplement(AbstractStore):
     async def store_content(self, content_item: Dict):
         """
         HotTopics content DB storage implementation
-        for daily news store
         Args:
             content_item: content item dict
         """
-        video_id = content_item.get("video_id")
-        async with get_session() as session:
-            result = await session.execute(
-                select(BilibiliVideo).where(BilibiliVideo.video_id == video_id)
-            )
-            video_detail = result.scalar_one_or_none()
+        await self.store_contents([content_item])
 
-            if not video_detail:
-                content_item["add_ts"] = utils.get_current_timestamp()
-                new_content = BilibiliVideo(**content_item)
-                session.add(new_content)
-            else:
-                for key, value in content_item.items():
-                    setattr(video_detail, key, value)
-            await session.commit()
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        HotTopics contents DB batch storage implementation, one upsert per page
+        Args:
+            content_items: content item dicts
+        """
+        if not content_items:
+            return
+        async with get_session() as session:
+            await upsert_rows(session, BilibiliVideo, content_items, ["video_id"])
 
     async def store_comment(self, comment_item: Dict):
         """
-        Bilibili comment DB storage implementation
+        HotTopics comment DB storage implementation
         Args:
             comment_item: comment item dict
         """
-        comment_id = comment_item.get("comment_id")
-        async with get_session() as session:
-            result = await session.execute(
-                select(BilibiliVideoComment).where(
-                    BilibiliVideoComment.comment_id == comment_id
-                )
-            )
-            comment_detail = result.scalar_one_or_none()
+        await self.store_comments([comment_item])
 
-            if not comment_detail:
-                comment_item["add_ts"] = utils.get_current_timestamp()
-                new_comment = BilibiliVideoComment(**comment_item)
-                session.add(new_comment)
-            else:
-                for key, value in comment_item.items():
-                    setattr(comment_detail, key, value)
-            await session.commit()
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        HotTopics comments DB batch storage implementation, one upsert per page
+        Args:
+            comment_items: comment item dicts
+        """
+        if not comment_items:
+            return
+        async with get_session() as session:
+            await upsert_rows(session, BilibiliVideoComment, comment_items, ["comment_id"])
 
     async def store_creator(self, creator: Dict):
         """
@@ -173,7 +190,6 @@ class HotTopicsDbStoreImplement(AbstractStore):
             else:
                 for key, value in creator.items():
                     setattr(creator_detail, key, value)
-            await session.commit()
 
     async def store_contact(self, contact_item: Dict):
         """
@@ -199,7 +215,6 @@ class HotTopicsDbStoreImplement(AbstractStore):
             else:
                 for key, value in contact_item.items():
                     setattr(contact_detail, key, value)
-            await session.commit()
 
     async def store_dynamic(self, dynamic_item):
         """
@@ -223,7 +238,30 @@ class HotTopicsDbStoreImplement(AbstractStore):
             else:
                 for key, value in dynamic_item.items():
                     setattr(dynamic_detail, key, value)
-            await session.commit()
+
+    def iter_contents(self, video_id: Optional[int] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream videos in batches instead of loading the whole table, e.g. async for rows in store.iter_contents(keyword=...)
+        Args:
+            video_id: only this video
+            keyword: only videos found by this search keyword
+            start_ts: add_ts lower bound in milliseconds, inclusive
+            end_ts: add_ts upper bound in milliseconds, exclusive
+            batch_size: rows per batch, DB_STREAM_BATCH_SIZE by default
+
+        Returns:
+            async iterator of row dict lists
+        """
+        return stream_contents(BilibiliVideo, "video_id", video_id, keyword, start_ts, end_ts, batch_size)
+
+    def iter_comments(self, video_id: Optional[int] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream comments in batches, the filters are the same as iter_contents,
+        keyword matches the search keyword of the video a comment belongs to
+        """
+        return stream_comments(BilibiliVideoComment, BilibiliVideo, "video_id", video_id, keyword, start_ts, end_ts, batch_size)
 
 
 class HotTopicsJsonStoreImplement(AbstractStore):
@@ -298,5 +336,152 @@ class HotTopicsJsonStoreImplement(AbstractStore):
         )
 
 
+class HotTopicsJsonlStoreImplement(AbstractStore):
+    def __init__(self):
+        self.file_writer = AsyncFileWriter(
+            crawler_type=crawler_type_var.get(), platform="bili"
+        )
+
+    async def store_content(self, content_item: Dict):
+        """
+        content JSONL storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_single_item_to_jsonl(
+            item=content_item, item_type="contents"
+        )
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment JSONL storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_single_item_to_jsonl(
+            item=comment_item, item_type="comments"
+        )
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator JSONL storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.file_writer.write_single_item_to_jsonl(
+            item=creator, item_type="creators"
+        )
+
+    async def store_contact(self, contact_item: Dict):
+        """
+        creator contact JSONL storage implementation
+        Args:
+            contact_item: creator's contact item dict
+
+        Returns:
+
+        """
+        await self.file_writer.write_single_item_to_jsonl(
+            item=contact_item, item_type="contacts"
+        )
+
+    async def store_dynamic(self, dynamic_item: Dict):
+        """
+        creator dynamic JSONL storage implementation
+        Args:
+            dynamic_item: creator's contact item dict
+
+        Returns:
+
+        """
+        await self.file_writer.write_single_item_to_jsonl(
+            item=dynamic_item, item_type="dynamics"
+        )
+
+
+class HotTopicsParquetStoreImplement(AbstractStore):
+    # parquet 列与 csv 相同，内容统一写到 contents 中
+    PARQUET_SCHEMAS = {**HotTopicsCsvStoreImplement.CSV_SCHEMAS, "contents": HotTopicsCsvStoreImplement.CSV_SCHEMAS["videos"]}
+
+    def __init__(self):
+        self.file_writer = AsyncFileWriter(
+            crawler_type=crawler_type_var.get(), platform="bili", csv_schemas=self.PARQUET_SCHEMAS
+        )
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(
+            item=content_item, item_type="contents"
+        )
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(
+            item=comment_item, item_type="comments"
+        )
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator Parquet storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(
+            item=creator, item_type="creators"
+        )
+
+    async def store_contact(self, contact_item: Dict):
+        """
+        creator contact Parquet storage implementation
+        Args:
+            contact_item: creator's contact item dict
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(
+            item=contact_item, item_type="contacts"
+        )
+
+    async def store_dynamic(self, dynamic_item: Dict):
+        """
+        creator dynamic Parquet storage implementation
+        Args:
+            dynamic_item: creator's contact item dict
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(
+            item=dynamic_item, item_type="dynamics"
+        )
+
+
 class HotTopicsSqliteStoreImplement(HotTopicsDbStoreImplement):
     pass
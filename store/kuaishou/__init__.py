@@ -13,10 +13,11 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/1/14 20:03
 # @Desc    :
-from typing import List
+from typing import Dict, List, Tuple
 
 import config
-from var import source_keyword_var
+from store.write_behind import write_behind
+from var import crawler_type_var, source_keyword_var
 
 from ._store_impl import *
 
@@ -26,18 +27,29 @@ class KuaishouStoreFactory:
         "csv": KuaishouCsvStoreImplement,
         "db": KuaishouDbStoreImplement,
         "json": KuaishouJsonStoreImplement,
+        "jsonl": KuaishouJsonlStoreImplement,
+        "parquet": KuaishouParquetStoreImplement,
         "sqlite": KuaishouSqliteStoreImplement
     }
 
+    # 按（保存方式, 爬取类型）缓存的 store 实例，整个进程共用一个 store 及其文件写锁
+    _store_instances: Dict[Tuple[str, str], AbstractStore] = {}
+
     @staticmethod
     def create_store() -> AbstractStore:
+        store_key = (config.SAVE_DATA_OPTION, crawler_type_var.get())
+        if store_key in KuaishouStoreFactory._store_instances:
+            return KuaishouStoreFactory._store_instances[store_key]
         store_class = KuaishouStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
             raise ValueError(
-                "[KuaishouStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+                "[KuaishouStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or sqlite or parquet ...")
+        store = store_class()
+        KuaishouStoreFactory._store_instances[store_key] = store
+        return store
 
 
+@write_behind
 async def update_kuaishou_video(video_item: Dict):
     photo_info: Dict = video_item.get("photo", {})
     video_id = photo_info.get("id")
@@ -53,8 +65,8 @@ async def update_kuaishou_video(video_item: Dict):
         "user_id": user_info.get("id"),
         "nickname": user_info.get("name"),
         "avatar": user_info.get("headerUrl", ""),
-        "liked_count": str(photo_info.get("realLikeCount")),
-        "viewd_count": str(photo_info.get("viewCount")),
+        "liked_count": utils.interact_count_text(photo_info.get("realLikeCount")),
+        "viewd_count": utils.interact_count_text(photo_info.get("viewCount")),
         "last_modify_ts": utils.get_current_timestamp(),
         "video_url": f"https://www.kuaishou.com/short-video/{video_id}",
         "video_cover_url": photo_info.get("coverUrl", ""),
@@ -66,15 +78,30 @@ async def update_kuaishou_video(video_item: Dict):
     await KuaishouStoreFactory.create_store().store_content(content_item=save_content_item)
 
 
+@write_behind
 async def batch_update_ks_video_comments(video_id: str, comments: List[Dict]):
     utils.logger.info(f"[store.kuaishou.batch_update_ks_video_comments] video_id:{video_id}, comments:{comments}")
     if not comments:
         return
-    for comment_item in comments:
-        await update_ks_video_comment(video_id, comment_item)
+    save_comment_items = [_build_comment_item(video_id, comment_item) for comment_item in comments]
+    await KuaishouStoreFactory.create_store().store_comments(save_comment_items)
 
 
+@write_behind
 async def update_ks_video_comment(video_id: str, comment_item: Dict):
+    await KuaishouStoreFactory.create_store().store_comment(_build_comment_item(video_id, comment_item))
+
+
+def _build_comment_item(video_id: str, comment_item: Dict) -> Dict:
+    """
+    Convert kuaishou video comment to the stored fields
+    Args:
+        video_id:
+        comment_item:
+
+    Returns:
+
+    """
     comment_id = comment_item.get("commentId")
     save_comment_item = {
         "comment_id": comment_id,
@@ -84,13 +111,15 @@ async def update_ks_video_comment(video_id: str, comment_item: Dict):
         "user_id": comment_item.get("authorId"),
         "nickname": comment_item.get("authorName"),
         "avatar": comment_item.get("headurl"),
-        "sub_comment_count": str(comment_item.get("subCommentCount", 0)),
+        "sub_comment_count": utils.interact_count_text(comment_item.get("subCommentCount")),
         "last_modify_ts": utils.get_current_timestamp(),
     }
     utils.logger.info(
         f"[store.kuaishou.update_ks_video_comment] Kuaishou video comment: {comment_id}, content: {save_comment_item.get('content')}")
-    await KuaishouStoreFactory.create_store().store_comment(comment_item=save_comment_item)
+    return save_comment_item
+
 
+@write_behind
 async def save_creator(user_id: str, creator: Dict):
     ownerCount = creator.get('ownerCount', {})
     profile = creator.get('profile', {})
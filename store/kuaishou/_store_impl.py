@@ -18,7 +18,7 @@ import csv
 import json
 import os
 import pathlib
-from typing import Dict
+from typing import AsyncIterator, Dict, List, Optional
 from tools.async_file_writer import AsyncFileWriter
 
 import aiofiles
@@ -27,6 +27,8 @@ from sqlalchemy import select
 import config
 from base.base_crawler import AbstractStore
 from database.db_session import get_session
+from database.db_stream import stream_comments, stream_contents
+from database.db_upsert import upsert_rows
 from database.models import KuaishouVideo, KuaishouVideoComment
 from tools import utils, words
 from var import crawler_type_var
@@ -48,9 +50,22 @@ def calculate_number_of_files(file_store_path: str) -> int:
 
 
 class KuaishouCsvStoreImplement(AbstractStore):
+    # csv 列顺序，与 store/kuaishou/__init__.py 中组装的字段保持一致
+    CSV_SCHEMAS = {
+        "contents": [
+            "video_id", "video_type", "title", "desc", "create_time", "user_id", "nickname", "avatar",
+            "liked_count", "viewd_count", "last_modify_ts", "video_url", "video_cover_url", "video_play_url",
+            "source_keyword",
+        ],
+        "comments": [
+            "comment_id", "create_time", "video_id", "content", "user_id", "nickname", "avatar",
+            "sub_comment_count", "last_modify_ts",
+        ],
+    }
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.writer = AsyncFileWriter(platform="kuaishou", crawler_type=crawler_type_var.get())
+        self.writer = AsyncFileWriter(platform="kuaishou", crawler_type=crawler_type_var.get(), csv_schemas=self.CSV_SCHEMAS)
 
     async def store_content(self, content_item: Dict):
         """
@@ -88,19 +103,18 @@ class KuaishouDbStoreImplement(AbstractStore):
         Args:
             content_item: content item dict
         """
-        video_id = content_item.get("video_id")
+        await self.store_contents([content_item])
+
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        Kuaishou contents DB batch storage implementation, one upsert per page
+        Args:
+            content_items: content item dicts
+        """
+        if not content_items:
+            return
         async with get_session() as session:
-            result = await session.execute(select(KuaishouVideo).where(KuaishouVideo.video_id == video_id))
-            video_detail = result.scalar_one_or_none()
-
-            if not video_detail:
-                content_item["add_ts"] = utils.get_current_timestamp()
-                new_content = KuaishouVideo(**content_item)
-                session.add(new_content)
-            else:
-                for key, value in content_item.items():
-                    setattr(video_detail, key, value)
-            await session.commit()
+            await upsert_rows(session, KuaishouVideo, content_items, ["video_id"])
 
     async def store_comment(self, comment_item: Dict):
         """
@@ -108,20 +122,42 @@ class KuaishouDbStoreImplement(AbstractStore):
         Args:
             comment_item: comment item dict
         """
-        comment_id = comment_item.get("comment_id")
+        await self.store_comments([comment_item])
+
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        Kuaishou comments DB batch storage implementation, one upsert per page
+        Args:
+            comment_items: comment item dicts
+        """
+        if not comment_items:
+            return
         async with get_session() as session:
-            result = await session.execute(
-                select(KuaishouVideoComment).where(KuaishouVideoComment.comment_id == comment_id))
-            comment_detail = result.scalar_one_or_none()
+            await upsert_rows(session, KuaishouVideoComment, comment_items, ["comment_id"])
 
-            if not comment_detail:
-                comment_item["add_ts"] = utils.get_current_timestamp()
-                new_comment = KuaishouVideoComment(**comment_item)
-                session.add(new_comment)
-            else:
-                for key, value in comment_item.items():
-                    setattr(comment_detail, key, value)
-            await session.commit()
+    def iter_contents(self, video_id: Optional[str] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream videos in batches instead of loading the whole table, e.g. async for rows in store.iter_contents(keyword=...)
+        Args:
+            video_id: only this video
+            keyword: only videos found by this search keyword
+            start_ts: add_ts lower bound in milliseconds, inclusive
+            end_ts: add_ts upper bound in milliseconds, exclusive
+            batch_size: rows per batch, DB_STREAM_BATCH_SIZE by default
+
+        Returns:
+            async iterator of row dict lists
+        """
+        return stream_contents(KuaishouVideo, "video_id", video_id, keyword, start_ts, end_ts, batch_size)
+
+    def iter_comments(self, video_id: Optional[str] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream comments in batches, the filters are the same as iter_contents,
+        keyword matches the search keyword of the video a comment belongs to
+        """
+        return stream_comments(KuaishouVideoComment, KuaishouVideo, "video_id", video_id, keyword, start_ts, end_ts, batch_size)
 
 
 class KuaishouJsonStoreImplement(AbstractStore):
@@ -155,6 +191,71 @@ class KuaishouJsonStoreImplement(AbstractStore):
         pass
 
 
+class KuaishouJsonlStoreImplement(AbstractStore):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="kuaishou", crawler_type=crawler_type_var.get())
+
+    async def store_content(self, content_item: Dict):
+        """
+        content JSONL storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="contents", item=content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment JSONL storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="comments", item=comment_item)
+
+    async def store_creator(self, creator: Dict):
+        pass
+
+
+class KuaishouParquetStoreImplement(AbstractStore):
+    # parquet 列与 csv 相同
+    PARQUET_SCHEMAS = KuaishouCsvStoreImplement.CSV_SCHEMAS
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="kuaishou", crawler_type=crawler_type_var.get(), csv_schemas=self.PARQUET_SCHEMAS)
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item_type="contents", item=content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item_type="comments", item=comment_item)
+
+    async def store_creator(self, creator: Dict):
+        pass
+
+
 class KuaishouSqliteStoreImplement(KuaishouDbStoreImplement):
     async def store_creator(self, creator: Dict):
         pass
\ No newline at end of file
@@ -10,10 +10,11 @@
 
 
 # -*- coding: utf-8 -*-
-from typing import List
+from typing import Dict, List, Tuple
 
 from model.m_baidu_tieba import TiebaComment, TiebaCreator, TiebaNote
-from var import source_keyword_var
+from store.write_behind import write_behind
+from var import crawler_type_var, source_keyword_var
 
 from ._store_impl import *
 
@@ -23,18 +24,29 @@ class TieBaStoreFactory:
         "csv": TieBaCsvStoreImplement,
         "db": TieBaDbStoreImplement,
         "json": TieBaJsonStoreImplement,
+        "jsonl": TieBaJsonlStoreImplement,
+        "parquet": TieBaParquetStoreImplement,
         "sqlite": TieBaSqliteStoreImplement
     }
 
+    # 按（保存方式, 爬取类型）缓存的 store 实例，整个进程共用一个 store 及其文件写锁
+    _store_instances: Dict[Tuple[str, str], AbstractStore] = {}
+
     @staticmethod
     def create_store() -> AbstractStore:
+        store_key = (config.SAVE_DATA_OPTION, crawler_type_var.get())
+        if store_key in TieBaStoreFactory._store_instances:
+            return TieBaStoreFactory._store_instances[store_key]
         store_class = TieBaStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
             raise ValueError(
-                "[TieBaStoreFactory.create_store] Invalid save option only supported csv or db or json ...")
-        return store_class()
+                "[TieBaStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or sqlite or parquet ...")
+        store = store_class()
+        TieBaStoreFactory._store_instances[store_key] = store
+        return store
 
 
+@write_behind
 async def batch_update_tieba_notes(note_list: List[TiebaNote]):
     """
     Batch update tieba notes
@@ -46,10 +58,10 @@ async def batch_update_tieba_notes(note_list: List[TiebaNote]):
     """
     if not note_list:
         return
-    for note_item in note_list:
-        await update_tieba_note(note_item)
+    await TieBaStoreFactory.create_store().store_contents([_build_note_item(note_item) for note_item in note_list])
 
 
+@write_behind
 async def update_tieba_note(note_item: TiebaNote):
     """
     Add or Update tieba note
@@ -58,15 +70,27 @@ async def update_tieba_note(note_item: TiebaNote):
 
     Returns:
 
+    """
+    await TieBaStoreFactory.create_store().store_content(_build_note_item(note_item))
+
+
+def _build_note_item(note_item: TiebaNote) -> Dict:
+    """
+    Convert tieba note to the stored fields
+    Args:
+        note_item:
+
+    Returns:
+
     """
     note_item.source_keyword = source_keyword_var.get()
     save_note_item = note_item.model_dump()
     save_note_item.update({"last_modify_ts": utils.get_current_timestamp()})
     utils.logger.info(f"[store.tieba.update_tieba_note] tieba note: {save_note_item}")
-
-    await TieBaStoreFactory.create_store().store_content(save_note_item)
+    return save_note_item
 
 
+@write_behind
 async def batch_update_tieba_note_comments(note_id: str, comments: List[TiebaComment]):
     """
     Batch update tieba note comments
@@ -79,10 +103,11 @@ async def batch_update_tieba_note_comments(note_id: str, comments: List[TiebaCom
     """
     if not comments:
         return
-    for comment_item in comments:
-        await update_tieba_note_comment(note_id, comment_item)
+    save_comment_items = [_build_comment_item(note_id, comment_item) for comment_item in comments]
+    await TieBaStoreFactory.create_store().store_comments(save_comment_items)
 
 
+@write_behind
 async def update_tieba_note_comment(note_id: str, comment_item: TiebaComment):
     """
     Update tieba note comment
@@ -92,13 +117,27 @@ async def update_tieba_note_comment(note_id: str, comment_item: TiebaComment):
 
     Returns:
 
+    """
+    await TieBaStoreFactory.create_store().store_comment(_build_comment_item(note_id, comment_item))
+
+
+def _build_comment_item(note_id: str, comment_item: TiebaComment) -> Dict:
+    """
+    Convert tieba note comment to the stored fields
+    Args:
+        note_id:
+        comment_item:
+
+    Returns:
+
     """
     save_comment_item = comment_item.model_dump()
     save_comment_item.update({"last_modify_ts": utils.get_current_timestamp()})
     utils.logger.info(f"[store.tieba.update_tieba_note_comment] tieba note id: {note_id} comment:{save_comment_item}")
-    await TieBaStoreFactory.create_store().store_comment(save_comment_item)
+    return save_comment_item
 
 
+@write_behind
 async def save_creator(user_info: TiebaCreator):
     """
     Save creator information to local
@@ -18,7 +18,7 @@ import csv
 import json
 import os
 import pathlib
-from typing import Dict
+from typing import AsyncIterator, Dict, List, Optional
 
 import aiofiles
 from sqlalchemy import select
@@ -26,9 +26,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 import config
 from base.base_crawler import AbstractStore
+from model import m_baidu_tieba
 from database.models import TiebaNote, TiebaComment, TiebaCreator
 from tools import utils, words
 from database.db_session import get_session
+from database.db_stream import stream_comments, stream_contents
+from database.db_upsert import upsert_rows
 from var import crawler_type_var
 from tools.async_file_writer import AsyncFileWriter
 
@@ -49,9 +52,16 @@ def calculate_number_of_files(file_store_path: str) -> int:
 
 
 class TieBaCsvStoreImplement(AbstractStore):
+    # csv 列顺序，取 model 中定义的字段，外加存储时补充的 last_modify_ts
+    CSV_SCHEMAS = {
+        "contents": list(m_baidu_tieba.TiebaNote.model_fields) + ["last_modify_ts"],
+        "comments": list(m_baidu_tieba.TiebaComment.model_fields) + ["last_modify_ts"],
+        "creators": list(m_baidu_tieba.TiebaCreator.model_fields) + ["last_modify_ts"],
+    }
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.writer = AsyncFileWriter(platform="tieba", crawler_type=crawler_type_var.get())
+        self.writer = AsyncFileWriter(platform="tieba", crawler_type=crawler_type_var.get(), csv_schemas=self.CSV_SCHEMAS)
 
     async def store_content(self, content_item: Dict):
         """
@@ -94,37 +104,37 @@ class TieBaDbStoreImplement(AbstractStore):
         Args:
             content_item: content item dict
         """
-        note_id = content_item.get("note_id")
+        await self.store_contents([content_item])
+
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        tieba contents DB batch storage implementation, one upsert per page
+        Args:
+            content_items: content item dicts
+        """
+        if not content_items:
+            return
         async with get_session() as session:
-            stmt = select(TiebaNote).where(TiebaNote.note_id == note_id)
-            res = await session.execute(stmt)
-            db_note = res.scalar_one_or_none()
-            if db_note:
-                for key, value in content_item.items():
-                    setattr(db_note, key, value)
-            else:
-                db_note = TiebaNote(**content_item)
-                session.add(db_note)
-            await session.commit()
+            await upsert_rows(session, TiebaNote, content_items, ["note_id"])
 
     async def store_comment(self, comment_item: Dict):
         """
-        tieba content DB storage implementation
+        tieba comment DB storage implementation
         Args:
             comment_item: comment item dict
         """
-        comment_id = comment_item.get("comment_id")
+        await self.store_comments([comment_item])
+
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        tieba comments DB batch storage implementation, one upsert per page
+        Args:
+            comment_items: comment item dicts
+        """
+        if not comment_items:
+            return
         async with get_session() as session:
-            stmt = select(TiebaComment).where(TiebaComment.comment_id == comment_id)
-            res = await session.execute(stmt)
-            db_comment = res.scalar_one_or_none()
-            if db_comment:
-                for key, value in comment_item.items():
-                    setattr(db_comment, key, value)
-            else:
-                db_comment = TiebaComment(**comment_item)
-                session.add(db_comment)
-            await session.commit()
+            await upsert_rows(session, TiebaComment, comment_items, ["comment_id"])
 
     async def store_creator(self, creator: Dict):
         """
@@ -143,7 +153,30 @@ class TieBaDbStoreImplement(AbstractStore):
             else:
                 db_creator = TiebaCreator(**creator)
                 session.add(db_creator)
-            await session.commit()
+
+    def iter_contents(self, note_id: Optional[str] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream notes in batches instead of loading the whole table, e.g. async for rows in store.iter_contents(keyword=...)
+        Args:
+            note_id: only this note
+            keyword: only notes found by this search keyword
+            start_ts: add_ts lower bound in milliseconds, inclusive
+            end_ts: add_ts upper bound in milliseconds, exclusive
+            batch_size: rows per batch, DB_STREAM_BATCH_SIZE by default
+
+        Returns:
+            async iterator of row dict lists
+        """
+        return stream_contents(TiebaNote, "note_id", note_id, keyword, start_ts, end_ts, batch_size)
+
+    def iter_comments(self, note_id: Optional[str] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream comments in batches, the filters are the same as iter_contents,
+        keyword matches the search keyword of the note a comment belongs to
+        """
+        return stream_comments(TiebaComment, TiebaNote, "note_id", note_id, keyword, start_ts, end_ts, batch_size)
 
 
 class TieBaJsonStoreImplement(AbstractStore):
@@ -185,6 +218,87 @@ class TieBaJsonStoreImplement(AbstractStore):
         await self.writer.write_single_item_to_json(item_type="creators", item=creator)
 
 
+class TieBaJsonlStoreImplement(AbstractStore):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="tieba", crawler_type=crawler_type_var.get())
+
+    async def store_content(self, content_item: Dict):
+        """
+        tieba content JSONL storage implementation
+        Args:
+            content_item: note item dict
+
+        Returns:
+
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="contents", item=content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        tieba comment JSONL storage implementation
+        Args:
+            comment_item: comment item dict
+
+        Returns:
+
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="comments", item=comment_item)
+
+    async def store_creator(self, creator: Dict):
+        """
+        tieba content JSONL storage implementation
+        Args:
+            creator: creator dict
+
+        Returns:
+
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="creators", item=creator)
+
+
+class TieBaParquetStoreImplement(AbstractStore):
+    # parquet 列与 csv 相同
+    PARQUET_SCHEMAS = TieBaCsvStoreImplement.CSV_SCHEMAS
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="tieba", crawler_type=crawler_type_var.get(), csv_schemas=self.PARQUET_SCHEMAS)
+
+    async def store_content(self, content_item: Dict):
+        """
+        tieba content Parquet storage implementation
+        Args:
+            content_item: note item dict
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item_type="contents", item=content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        tieba comment Parquet storage implementation
+        Args:
+            comment_item: comment item dict
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item_type="comments", item=comment_item)
+
+    async def store_creator(self, creator: Dict):
+        """
+        tieba content Parquet storage implementation
+        Args:
+            creator: creator dict
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item_type="creators", item=creator)
+
+
 class TieBaSqliteStoreImplement(TieBaDbStoreImplement):
     """
     Tieba sqlite store implement
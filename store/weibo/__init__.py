@@ -14,9 +14,11 @@
 # @Desc    :
 
 import re
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
-from var import source_keyword_var
+from base.base_crawler import MediaDownloadFunc
+from store.write_behind import write_behind
+from var import crawler_type_var, source_keyword_var
 
 from .weibo_store_media import *
 from ._store_impl import *
@@ -27,17 +29,28 @@ class WeibostoreFactory:
         "csv": WeiboCsvStoreImplement,
         "db": WeiboDbStoreImplement,
         "json": WeiboJsonStoreImplement,
+        "jsonl": WeiboJsonlStoreImplement,
+        "parquet": WeiboParquetStoreImplement,
         "sqlite": WeiboSqliteStoreImplement,
     }
 
+    # 按（保存方式, 爬取类型）缓存的 store 实例，整个进程共用一个 store 及其文件写锁
+    _store_instances: Dict[Tuple[str, str], AbstractStore] = {}
+
     @staticmethod
     def create_store() -> AbstractStore:
+        store_key = (config.SAVE_DATA_OPTION, crawler_type_var.get())
+        if store_key in WeibostoreFactory._store_instances:
+            return WeibostoreFactory._store_instances[store_key]
         store_class = WeibostoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[WeibotoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+            raise ValueError("[WeibotoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or sqlite or parquet ...")
+        store = store_class()
+        WeibostoreFactory._store_instances[store_key] = store
+        return store
 
 
+@write_behind
 async def batch_update_weibo_notes(note_list: List[Dict]):
     """
     Batch update weibo notes
@@ -49,10 +62,11 @@ async def batch_update_weibo_notes(note_list: List[Dict]):
     """
     if not note_list:
         return
-    for note_item in note_list:
-        await update_weibo_note(note_item)
+    save_content_items = [_build_note_item(note_item) for note_item in note_list]
+    await WeibostoreFactory.create_store().store_contents([item for item in save_content_items if item])
 
 
+@write_behind
 async def update_weibo_note(note_item: Dict):
     """
     Update weibo note
@@ -62,8 +76,23 @@ async def update_weibo_note(note_item: Dict):
     Returns:
 
     """
-    if not note_item:
+    save_content_item = _build_note_item(note_item)
+    if not save_content_item:
         return
+    await WeibostoreFactory.create_store().store_content(save_content_item)
+
+
+def _build_note_item(note_item: Dict) -> Optional[Dict]:
+    """
+    Convert weibo note to the stored fields
+    Args:
+        note_item:
+
+    Returns:
+
+    """
+    if not note_item:
+        return None
 
     mblog: Dict = note_item.get("mblog")
     user_info: Dict = mblog.get("user")
@@ -76,9 +105,9 @@ async def update_weibo_note(note_item: Dict):
         "content": clean_text,
         "create_time": utils.rfc2822_to_timestamp(mblog.get("created_at")),
         "create_date_time": str(utils.rfc2822_to_china_datetime(mblog.get("created_at"))),
-        "liked_count": str(mblog.get("attitudes_count", 0)),
-        "comments_count": str(mblog.get("comments_count", 0)),
-        "shared_count": str(mblog.get("reposts_count", 0)),
+        "liked_count": utils.interact_count_text(mblog.get("attitudes_count")),
+        "comments_count": utils.interact_count_text(mblog.get("comments_count")),
+        "shared_count": utils.interact_count_text(mblog.get("reposts_count")),
         "last_modify_ts": utils.get_current_timestamp(),
         "note_url": f"https://m.weibo.cn/detail/{note_id}",
         "ip_location": mblog.get("region_name", "").replace("发布于 ", ""),
@@ -92,9 +121,10 @@ async def update_weibo_note(note_item: Dict):
         "source_keyword": source_keyword_var.get(),
     }
     utils.logger.info(f"[store.weibo.update_weibo_note] weibo note id:{note_id}, title:{save_content_item.get('content')[:24]} ...")
-    await WeibostoreFactory.create_store().store_content(content_item=save_content_item)
+    return save_content_item
 
 
+@write_behind
 async def batch_update_weibo_note_comments(note_id: str, comments: List[Dict]):
     """
     Batch update weibo note comments
@@ -107,10 +137,11 @@ async def batch_update_weibo_note_comments(note_id: str, comments: List[Dict]):
     """
     if not comments:
         return
-    for comment_item in comments:
-        await update_weibo_note_comment(note_id, comment_item)
+    save_comment_items = [_build_comment_item(note_id, comment_item) for comment_item in comments]
+    await WeibostoreFactory.create_store().store_comments([item for item in save_comment_items if item])
 
 
+@write_behind
 async def update_weibo_note_comment(note_id: str, comment_item: Dict):
     """
     Update weibo note comment
@@ -121,8 +152,24 @@ async def update_weibo_note_comment(note_id: str, comment_item: Dict):
     Returns:
 
     """
-    if not comment_item or not note_id:
+    save_comment_item = _build_comment_item(note_id, comment_item)
+    if not save_comment_item:
         return
+    await WeibostoreFactory.create_store().store_comment(save_comment_item)
+
+
+def _build_comment_item(note_id: str, comment_item: Dict) -> Optional[Dict]:
+    """
+    Convert weibo note comment to the stored fields
+    Args:
+        note_id:
+        comment_item:
+
+    Returns:
+
+    """
+    if not comment_item or not note_id:
+        return None
     comment_id = str(comment_item.get("id"))
     user_info: Dict = comment_item.get("user")
     content_text = comment_item.get("text")
@@ -133,8 +180,8 @@ async def update_weibo_note_comment(note_id: str, comment_item: Dict):
         "create_date_time": str(utils.rfc2822_to_china_datetime(comment_item.get("created_at"))),
         "note_id": note_id,
         "content": clean_text,
-        "sub_comment_count": str(comment_item.get("total_number", 0)),
-        "comment_like_count": str(comment_item.get("like_count", 0)),
+        "sub_comment_count": utils.interact_count_text(comment_item.get("total_number")),
+        "comment_like_count": utils.interact_count_text(comment_item.get("like_count")),
         "last_modify_ts": utils.get_current_timestamp(),
         "ip_location": comment_item.get("source", "").replace("来自", ""),
         "parent_comment_id": comment_item.get("rootid", ""),
@@ -147,7 +194,7 @@ async def update_weibo_note_comment(note_id: str, comment_item: Dict):
         "avatar": user_info.get("profile_image_url", ""),
     }
     utils.logger.info(f"[store.weibo.update_weibo_note_comment] Weibo note comment: {comment_id}, content: {save_comment_item.get('content', '')[:24]} ...")
-    await WeibostoreFactory.create_store().store_comment(comment_item=save_comment_item)
+    return save_comment_item
 
 
 async def update_weibo_note_image(picid: str, pic_content, extension_file_name):
@@ -164,6 +211,22 @@ async def update_weibo_note_image(picid: str, pic_content, extension_file_name):
     await WeiboStoreImage().store_image({"pic_id": picid, "pic_content": pic_content, "extension_file_name": extension_file_name})
 
 
+async def download_weibo_note_image(picid: str, url: str, extension_file_name: str, download: MediaDownloadFunc) -> bool:
+    """
+    Stream weibo note image to local
+    Args:
+        picid:
+        url: image url
+        extension_file_name:
+        download: streaming download function provided by the client
+
+    Returns:
+        whether the download succeeded
+    """
+    return await WeiboStoreImage().download_image(picid, url, extension_file_name, download)
+
+
+@write_behind
 async def save_creator(user_id: str, user_info: Dict):
     """
     Save creator information to local
@@ -18,7 +18,7 @@ import csv
 import json
 import os
 import pathlib
-from typing import Dict
+from typing import AsyncIterator, Dict, List, Optional
 
 import aiofiles
 from sqlalchemy import select
@@ -30,6 +30,8 @@ from database.models import WeiboCreator, WeiboNote, WeiboNoteComment
 from tools import utils, words
 from tools.async_file_writer import AsyncFileWriter
 from database.db_session import get_session
+from database.db_stream import stream_comments, stream_contents
+from database.db_upsert import upsert_rows
 from var import crawler_type_var
 
 
@@ -49,9 +51,27 @@ def calculate_number_of_files(file_store_path: str) -> int:
 
 
 class WeiboCsvStoreImplement(AbstractStore):
+    # csv 列顺序，与 store/weibo/__init__.py 中组装的字段保持一致
+    CSV_SCHEMAS = {
+        "contents": [
+            "note_id", "content", "create_time", "create_date_time", "liked_count", "comments_count",
+            "shared_count", "last_modify_ts", "note_url", "ip_location", "user_id", "nickname", "gender",
+            "profile_url", "avatar", "source_keyword",
+        ],
+        "comments": [
+            "comment_id", "create_time", "create_date_time", "note_id", "content", "sub_comment_count",
+            "comment_like_count", "last_modify_ts", "ip_location", "parent_comment_id", "user_id",
+            "nickname", "gender", "profile_url", "avatar",
+        ],
+        "creators": [
+            "user_id", "nickname", "gender", "avatar", "desc", "ip_location", "follows", "fans", "tag_list",
+            "last_modify_ts",
+        ],
+    }
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.writer = AsyncFileWriter(platform="weibo", crawler_type=crawler_type_var.get())
+        self.writer = AsyncFileWriter(platform="weibo", crawler_type=crawler_type_var.get(), csv_schemas=self.CSV_SCHEMAS)
 
     async def store_content(self, content_item: Dict):
         """
@@ -94,52 +114,40 @@ class WeiboDbStoreImplement(AbstractStore):
         Weibo content DB storage implementation
         Args:
             content_item: content item dict
+        """
+        await self.store_contents([content_item])
 
-        Returns:
-
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        Weibo contents DB batch storage implementation, one upsert per page
+        Args:
+            content_items: content item dicts
         """
-        note_id = content_item.get("note_id")
+        if not content_items:
+            return
+        content_items = [dict(item, last_modify_ts=utils.get_current_timestamp()) for item in content_items]
         async with get_session() as session:
-            stmt = select(WeiboNote).where(WeiboNote.note_id == note_id)
-            res = await session.execute(stmt)
-            db_note = res.scalar_one_or_none()
-            if db_note:
-                db_note.last_modify_ts = utils.get_current_timestamp()
-                for key, value in content_item.items():
-                    if hasattr(db_note, key):
-                        setattr(db_note, key, value)
-            else:
-                content_item["add_ts"] = utils.get_current_timestamp()
-                content_item["last_modify_ts"] = utils.get_current_timestamp()
-                db_note = WeiboNote(**content_item)
-                session.add(db_note)
-            await session.commit()
+            await upsert_rows(session, WeiboNote, content_items, ["note_id"])
 
     async def store_comment(self, comment_item: Dict):
         """
-        Weibo content DB storage implementation
+        Weibo comment DB storage implementation
         Args:
             comment_item: comment item dict
+        """
+        await self.store_comments([comment_item])
 
-        Returns:
-
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        Weibo comments DB batch storage implementation, one upsert per page
+        Args:
+            comment_items: comment item dicts
         """
-        comment_id = comment_item.get("comment_id")
+        if not comment_items:
+            return
+        comment_items = [dict(item, last_modify_ts=utils.get_current_timestamp()) for item in comment_items]
         async with get_session() as session:
-            stmt = select(WeiboNoteComment).where(WeiboNoteComment.comment_id == comment_id)
-            res = await session.execute(stmt)
-            db_comment = res.scalar_one_or_none()
-            if db_comment:
-                db_comment.last_modify_ts = utils.get_current_timestamp()
-                for key, value in comment_item.items():
-                    if hasattr(db_comment, key):
-                        setattr(db_comment, key, value)
-            else:
-                comment_item["add_ts"] = utils.get_current_timestamp()
-                comment_item["last_modify_ts"] = utils.get_current_timestamp()
-                db_comment = WeiboNoteComment(**comment_item)
-                session.add(db_comment)
-            await session.commit()
+            await upsert_rows(session, WeiboNoteComment, comment_items, ["comment_id"])
 
     async def store_creator(self, creator: Dict):
         """
@@ -165,7 +173,30 @@ class WeiboDbStoreImplement(AbstractStore):
                 creator["last_modify_ts"] = utils.get_current_timestamp()
                 db_creator = WeiboCreator(**creator)
                 session.add(db_creator)
-            await session.commit()
+
+    def iter_contents(self, note_id: Optional[int] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream notes in batches instead of loading the whole table, e.g. async for rows in store.iter_contents(keyword=...)
+        Args:
+            note_id: only this note
+            keyword: only notes found by this search keyword
+            start_ts: add_ts lower bound in milliseconds, inclusive
+            end_ts: add_ts upper bound in milliseconds, exclusive
+            batch_size: rows per batch, DB_STREAM_BATCH_SIZE by default
+
+        Returns:
+            async iterator of row dict lists
+        """
+        return stream_contents(WeiboNote, "note_id", note_id, keyword, start_ts, end_ts, batch_size)
+
+    def iter_comments(self, note_id: Optional[int] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream comments in batches, the filters are the same as iter_contents,
+        keyword matches the search keyword of the note a comment belongs to
+        """
+        return stream_comments(WeiboNoteComment, WeiboNote, "note_id", note_id, keyword, start_ts, end_ts, batch_size)
 
 
 class WeiboJsonStoreImplement(AbstractStore):
@@ -207,6 +238,87 @@ class WeiboJsonStoreImplement(AbstractStore):
         await self.writer.write_single_item_to_json(item_type="creators", item=creator)
 
 
+class WeiboJsonlStoreImplement(AbstractStore):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="weibo", crawler_type=crawler_type_var.get())
+
+    async def store_content(self, content_item: Dict):
+        """
+        content JSONL storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="contents", item=content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment JSONL storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="comments", item=comment_item)
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator JSONL storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="creators", item=creator)
+
+
+class WeiboParquetStoreImplement(AbstractStore):
+    # parquet 列与 csv 相同
+    PARQUET_SCHEMAS = WeiboCsvStoreImplement.CSV_SCHEMAS
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="weibo", crawler_type=crawler_type_var.get(), csv_schemas=self.PARQUET_SCHEMAS)
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item_type="contents", item=content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item_type="comments", item=comment_item)
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator Parquet storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item_type="creators", item=creator)
+
+
 class WeiboSqliteStoreImplement(WeiboDbStoreImplement):
     """
     Weibo content SQLite storage implementation
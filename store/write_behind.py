@@ -0,0 +1,223 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 存储写入队列（write-behind），爬虫把待存储的数据放入有界队列后立即返回，由后台任务批量写入
+import asyncio
+import contextvars
+import functools
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import config
+from database.db_session import bind_session, unit_of_work
+from tools import utils
+
+# 在写入任务中执行的存储函数再调用其他被 write_behind 装饰的函数时直接执行，不再入队
+_in_store_queue: contextvars.ContextVar[bool] = contextvars.ContextVar("in_store_queue", default=False)
+
+
+@dataclass
+class StoreJob:
+    func: Callable
+    args: Tuple
+    kwargs: Dict[str, Any]
+    # 入队时的上下文，保证 source_keyword_var、crawler_type_var 等与直接调用时一致
+    context: contextvars.Context
+    # 入队序号，从 1 开始
+    seq: int = 0
+
+
+class StoreQueue:
+    def __init__(self, max_size: int, workers: int, batch_size: int):
+        self._queue: asyncio.Queue[StoreJob] = asyncio.Queue(maxsize=max_size)
+        self._worker_count = workers
+        self._batch_size = batch_size
+        self._workers: List[asyncio.Task] = []
+        # 已入队的调用数；_stored 之前（含）的调用都已处理完，_finished 为处理完但前面还有调用未完成的序号
+        self._put_count = 0
+        self._stored = 0
+        self._finished: Set[int] = set()
+        # 第一个写入失败的调用序号，之后登记的回调不再执行
+        self._first_failed: Optional[int] = None
+        self._callbacks: Deque[Tuple[int, Callable[[], Any]]] = deque()
+        # 等待此前入队的调用处理完（不论成败）的 future
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+        self.loop = asyncio.get_running_loop()
+
+    def start(self):
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self._worker_count)]
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    async def put(self, func: Callable, args: Tuple, kwargs: Dict[str, Any]):
+        """
+        放入一次存储调用，队列满时等待（背压）
+        """
+        context = contextvars.copy_context()
+        context.run(_in_store_queue.set, True)
+        if self._queue.full():
+            utils.logger.info(f"[StoreQueue.put] store queue is full ({self._queue.maxsize}), waiting for storage to catch up ...")
+        self._put_count += 1
+        await self._queue.put(StoreJob(func, args, kwargs, context, self._put_count))
+
+    def call_when_stored(self, callback: Callable[[], Any]):
+        """
+        此前入队的存储调用全部写入成功后调用 callback，没有未完成的调用时立即调用；
+        其中有调用写入失败时不调用 callback
+        """
+        self._callbacks.append((self._put_count, callback))
+        self._run_callbacks()
+
+    async def wait_stored(self):
+        """
+        等待此前入队的存储调用全部处理完（包括写入失败的调用），用于读取数据库前让队列中的数据可见
+        """
+        if self._put_count <= self._stored:
+            return
+        waiter = self.loop.create_future()
+        self._waiters.append((self._put_count, waiter))
+        await waiter
+
+    def _on_jobs_done(self, jobs: List[StoreJob], failed: Set[int]):
+        if failed and (self._first_failed is None or min(failed) < self._first_failed):
+            self._first_failed = min(failed)
+        self._finished.update(job.seq for job in jobs)
+        while self._stored + 1 in self._finished:
+            self._stored += 1
+            self._finished.discard(self._stored)
+        while self._waiters and self._waiters[0][0] <= self._stored:
+            _, waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+        self._run_callbacks()
+
+    def _run_callbacks(self):
+        while self._callbacks and self._callbacks[0][0] <= self._stored:
+            seq, callback = self._callbacks.popleft()
+            if self._first_failed is not None and self._first_failed <= seq:
+                utils.logger.warning(f"[StoreQueue._run_callbacks] skip callback, store call {self._first_failed} failed")
+                continue
+            try:
+                callback()
+            except Exception as e:
+                utils.logger.error(f"[StoreQueue._run_callbacks] callback failed: {e}")
+
+    async def _worker(self):
+        while True:
+            jobs = [await self._queue.get()]
+            while len(jobs) < self._batch_size and not self._queue.empty():
+                jobs.append(self._queue.get_nowait())
+            failed = {job.seq for job in jobs}
+            try:
+                failed = await self._run_batch(jobs)
+            finally:
+                self._on_jobs_done(jobs, failed)
+                for _ in jobs:
+                    self._queue.task_done()
+
+    async def _run_batch(self, jobs: List[StoreJob]) -> Set[int]:
+        """
+        一批调用共用一个 session，db/sqlite 模式下只提交一次，单个调用失败只回滚自己；
+        返回写入失败的调用序号，提交失败时整批都算失败
+        """
+        failed: Set[int] = set()
+        try:
+            async with unit_of_work() as session:
+                for job in jobs:
+                    if not await self._run_job(job, session):
+                        failed.add(job.seq)
+        except Exception as e:
+            utils.logger.error(f"[StoreQueue._run_batch] commit {len(jobs)} store calls failed: {e}")
+            return {job.seq for job in jobs}
+        return failed
+
+    @staticmethod
+    async def _run_job(job: StoreJob, session) -> bool:
+        try:
+            if session is None:
+                await asyncio.create_task(job.func(*job.args, **job.kwargs), context=job.context)
+                return True
+            bind_session(job.context, session)
+            async with session.begin_nested():
+                await asyncio.create_task(job.func(*job.args, **job.kwargs), context=job.context)
+            return True
+        except Exception as e:
+            utils.logger.error(f"[StoreQueue._run_job] {job.func.__module__}.{job.func.__name__} failed: {e}")
+            return False
+
+    async def drain(self):
+        """
+        等待队列中的数据全部写完，然后停止写入任务
+        """
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+_store_queue: Optional[StoreQueue] = None
+
+
+def get_store_queue() -> Optional[StoreQueue]:
+    """
+    获取当前事件循环的存储写入队列，未开启 ENABLE_STORE_QUEUE 时返回 None
+    """
+    global _store_queue
+    if not config.ENABLE_STORE_QUEUE:
+        return None
+    if _store_queue is None or _store_queue.loop is not asyncio.get_running_loop():
+        _store_queue = StoreQueue(
+            max_size=config.STORE_QUEUE_MAX_SIZE,
+            workers=config.STORE_QUEUE_WORKERS,
+            batch_size=config.STORE_QUEUE_BATCH_SIZE,
+        )
+        _store_queue.start()
+    return _store_queue
+
+
+async def drain_store_queue():
+    """
+    程序退出前调用，保证队列中的数据全部落盘
+    """
+    global _store_queue
+    if _store_queue is not None and _store_queue.loop is asyncio.get_running_loop():
+        await _store_queue.drain()
+    _store_queue = None
+
+
+async def flush_store_queue():
+    """
+    等待队列中已有的数据写完，读取已存储数据（如增量爬取的评论时间水位）前调用，
+    在写入任务中调用或未开启存储写入队列时直接返回
+    """
+    if _in_store_queue.get():
+        return
+    if _store_queue is not None and _store_queue.loop is asyncio.get_running_loop():
+        await _store_queue.wait_stored()
+
+
+def write_behind(func: Callable):
+    """
+    存储函数装饰器：开启存储写入队列时，调用只负责入队，实际写入由后台任务完成
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        store_queue = None if _in_store_queue.get() else get_store_queue()
+        if store_queue is None:
+            return await func(*args, **kwargs)
+        await store_queue.put(func, args, kwargs)
+
+    return wrapper
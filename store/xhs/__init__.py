@@ -12,10 +12,12 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/1/14 17:34
 # @Desc    :
-from typing import List
+from typing import Dict, List, Tuple
 
 import config
-from var import source_keyword_var
+from base.base_crawler import MediaDownloadFunc
+from store.write_behind import write_behind
+from var import crawler_type_var, source_keyword_var
 
 from .xhs_store_media import *
 from ._store_impl import *
@@ -26,15 +28,25 @@ class XhsStoreFactory:
         "csv": XhsCsvStoreImplement,
         "db": XhsDbStoreImplement,
         "json": XhsJsonStoreImplement,
+        "jsonl": XhsJsonlStoreImplement,
+        "parquet": XhsParquetStoreImplement,
         "sqlite": XhsSqliteStoreImplement,
     }
 
+    # 按（保存方式, 爬取类型）缓存的 store 实例，整个进程共用一个 store 及其文件写锁
+    _store_instances: Dict[Tuple[str, str], AbstractStore] = {}
+
     @staticmethod
     def create_store() -> AbstractStore:
+        store_key = (config.SAVE_DATA_OPTION, crawler_type_var.get())
+        if store_key in XhsStoreFactory._store_instances:
+            return XhsStoreFactory._store_instances[store_key]
         store_class = XhsStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[XhsStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+            raise ValueError("[XhsStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or sqlite or parquet ...")
+        store = store_class()
+        XhsStoreFactory._store_instances[store_key] = store
+        return store
 
 
 def get_video_url_arr(note_item: Dict) -> List:
@@ -64,6 +76,7 @@ def get_video_url_arr(note_item: Dict) -> List:
     return videoArr
 
 
+@write_behind
 async def update_xhs_note(note_item: Dict):
     """
     更新小红书笔记
@@ -112,6 +125,7 @@ async def update_xhs_note(note_item: Dict):
     await XhsStoreFactory.create_store().store_content(local_db_item)
 
 
+@write_behind
 async def batch_update_xhs_note_comments(note_id: str, comments: List[Dict]):
     """
     批量更新小红书笔记评论
@@ -124,10 +138,11 @@ async def batch_update_xhs_note_comments(note_id: str, comments: List[Dict]):
     """
     if not comments:
         return
-    for comment_item in comments:
-        await update_xhs_note_comment(note_id, comment_item)
+    local_db_items = [_build_comment_item(note_id, comment_item) for comment_item in comments]
+    await XhsStoreFactory.create_store().store_comments(local_db_items)
 
 
+@write_behind
 async def update_xhs_note_comment(note_id: str, comment_item: Dict):
     """
     更新小红书笔记评论
@@ -137,6 +152,19 @@ async def update_xhs_note_comment(note_id: str, comment_item: Dict):
 
     Returns:
 
+    """
+    await XhsStoreFactory.create_store().store_comment(_build_comment_item(note_id, comment_item))
+
+
+def _build_comment_item(note_id: str, comment_item: Dict) -> Dict:
+    """
+    将小红书评论转换为存储的字段
+    Args:
+        note_id:
+        comment_item:
+
+    Returns:
+
     """
     user_info = comment_item.get("user_info", {})
     comment_id = comment_item.get("id")
@@ -158,9 +186,10 @@ async def update_xhs_note_comment(note_id: str, comment_item: Dict):
         "like_count": comment_item.get("like_count", 0),
     }
     utils.logger.info(f"[store.xhs.update_xhs_note_comment] xhs note comment:{local_db_item}")
-    await XhsStoreFactory.create_store().store_comment(local_db_item)
+    return local_db_item
 
 
+@write_behind
 async def save_creator(user_id: str, creator: Dict):
     """
     保存小红书创作者
@@ -238,3 +267,33 @@ async def update_xhs_note_video(note_id, video_content, extension_file_name):
     """
 
     await XiaoHongShuVideo().store_video({"notice_id": note_id, "video_content": video_content, "extension_file_name": extension_file_name})
+
+
+async def download_xhs_note_image(note_id: str, url: str, extension_file_name: str, download: MediaDownloadFunc) -> bool:
+    """
+    流式下载小红书笔记图片
+    Args:
+        note_id:
+        url: 图片地址
+        extension_file_name:
+        download: client 提供的流式下载函数
+
+    Returns:
+        是否下载成功
+    """
+    return await XiaoHongShuImage().download_image(note_id, url, extension_file_name, download)
+
+
+async def download_xhs_note_video(note_id: str, url: str, extension_file_name: str, download: MediaDownloadFunc) -> bool:
+    """
+    流式下载小红书笔记视频
+    Args:
+        note_id:
+        url: 视频地址
+        extension_file_name:
+        download: client 提供的流式下载函数
+
+    Returns:
+        是否下载成功
+    """
+    return await XiaoHongShuVideo().download_video(note_id, url, extension_file_name, download)
@@ -5,7 +5,7 @@
 import json
 import os
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from sqlalchemy import select, update, delete
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -13,16 +13,33 @@ from sqlalchemy.orm import Session
 
 from base.base_crawler import AbstractStore
 from database.db_session import get_session
+from database.db_stream import stream_comments, stream_contents
+from database.db_upsert import upsert_rows
 from database.models import XhsNote, XhsNoteComment, XhsCreator
 
+from tools import utils
 from tools.async_file_writer import AsyncFileWriter
 from tools.time_util import get_current_timestamp
 from var import crawler_type_var
 
 class XhsCsvStoreImplement(AbstractStore):
+    # csv 列顺序，与 store/xhs/__init__.py 中组装的字段保持一致
+    CSV_SCHEMAS = {
+        "contents": [
+            "note_id", "type", "title", "desc", "video_url", "time", "last_update_time", "user_id",
+            "nickname", "avatar", "liked_count", "collected_count", "comment_count", "share_count",
+            "ip_location", "image_list", "tag_list", "last_modify_ts", "note_url", "source_keyword",
+            "xsec_token",
+        ],
+        "comments": [
+            "comment_id", "create_time", "ip_location", "note_id", "content", "user_id", "nickname",
+            "avatar", "sub_comment_count", "pictures", "parent_comment_id", "last_modify_ts", "like_count",
+        ],
+    }
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.writer = AsyncFileWriter(platform="xhs", crawler_type=crawler_type_var.get())
+        self.writer = AsyncFileWriter(platform="xhs", crawler_type=crawler_type_var.get(), csv_schemas=self.CSV_SCHEMAS)
 
     async def store_content(self, content_item: Dict):
         """
@@ -80,117 +97,148 @@ class XhsJsonStoreImplement(AbstractStore):
         pass
 
 
+class XhsJsonlStoreImplement(AbstractStore):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="xhs", crawler_type=crawler_type_var.get())
+
+    async def store_content(self, content_item: Dict):
+        """
+        store content data to jsonl file
+        :param content_item:
+        :return:
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="contents", item=content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        store comment data to jsonl file
+        :param comment_item:
+        :return:
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="comments", item=comment_item)
+
+    async def store_creator(self, creator_item: Dict):
+        pass
+
+    def flush(self):
+        """
+        flush data to jsonl file
+        :return:
+        """
+        pass
+
+
+class XhsParquetStoreImplement(AbstractStore):
+    # parquet 列与 csv 相同
+    PARQUET_SCHEMAS = XhsCsvStoreImplement.CSV_SCHEMAS
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="xhs", crawler_type=crawler_type_var.get(), csv_schemas=self.PARQUET_SCHEMAS)
+
+    async def store_content(self, content_item: Dict):
+        """
+        store content data to parquet file
+        :param content_item:
+        :return:
+        """
+        await self.writer.write_to_parquet(item_type="contents", item=content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        store comment data to parquet file
+        :param comment_item:
+        :return:
+        """
+        await self.writer.write_to_parquet(item_type="comments", item=comment_item)
+
+    async def store_creator(self, creator_item: Dict):
+        pass
+
+    def flush(self):
+        """
+        flush data to parquet file
+        :return:
+        """
+        pass
+
 
 class XhsDbStoreImplement(AbstractStore):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+    # 已存在的笔记 / 评论只刷新互动数据
+    CONTENT_UPDATE_COLUMNS = ["last_modify_ts", "liked_count", "collected_count", "comment_count", "share_count", "last_update_time"]
+    COMMENT_UPDATE_COLUMNS = ["last_modify_ts", "like_count", "sub_comment_count"]
+
     async def store_content(self, content_item: Dict):
-        note_id = content_item.get("note_id")
-        if not note_id:
+        await self.store_contents([content_item])
+
+    async def store_contents(self, content_items: List[Dict]):
+        rows = [self._content_row(item) for item in content_items if item.get("note_id")]
+        if not rows:
             return
         async with get_session() as session:
-            if await self.content_is_exist(session, note_id):
-                await self.update_content(session, content_item)
-            else:
-                await self.add_content(session, content_item)
-
-    async def add_content(self, session: AsyncSession, content_item: Dict):
-        add_ts = int(get_current_timestamp())
-        last_modify_ts = int(get_current_timestamp())
-        note = XhsNote(
-            user_id=content_item.get("user_id"),
-            nickname=content_item.get("nickname"),
-            avatar=content_item.get("avatar"),
-            ip_location=content_item.get("ip_location"),
-            add_ts=add_ts,
-            last_modify_ts=last_modify_ts,
-            note_id=content_item.get("note_id"),
-            type=content_item.get("type"),
-            title=content_item.get("title"),
-            desc=content_item.get("desc"),
-            video_url=content_item.get("video_url"),
-            time=content_item.get("time"),
-            last_update_time=content_item.get("last_update_time"),
-            liked_count=str(content_item.get("liked_count")),
-            collected_count=str(content_item.get("collected_count")),
-            comment_count=str(content_item.get("comment_count")),
-            share_count=str(content_item.get("share_count")),
-            image_list=json.dumps(content_item.get("image_list")),
-            tag_list=json.dumps(content_item.get("tag_list")),
-            note_url=content_item.get("note_url"),
-            source_keyword=content_item.get("source_keyword", ""),
-            xsec_token=content_item.get("xsec_token", "")
-        )
-        session.add(note)
-
-    async def update_content(self, session: AsyncSession, content_item: Dict):
-        note_id = content_item.get("note_id")
-        last_modify_ts = int(get_current_timestamp())
-        update_data = {
-            "last_modify_ts": last_modify_ts,
-            "liked_count": str(content_item.get("liked_count")),
-            "collected_count": str(content_item.get("collected_count")),
-            "comment_count": str(content_item.get("comment_count")),
-            "share_count": str(content_item.get("share_count")),
+            await upsert_rows(session, XhsNote, rows, ["note_id"], self.CONTENT_UPDATE_COLUMNS)
+
+    @staticmethod
+    def _content_row(content_item: Dict) -> Dict:
+        return {
+            "user_id": content_item.get("user_id"),
+            "nickname": content_item.get("nickname"),
+            "avatar": content_item.get("avatar"),
+            "ip_location": content_item.get("ip_location"),
+            "add_ts": int(get_current_timestamp()),
+            "last_modify_ts": int(get_current_timestamp()),
+            "note_id": content_item.get("note_id"),
+            "type": content_item.get("type"),
+            "title": content_item.get("title"),
+            "desc": content_item.get("desc"),
+            "video_url": content_item.get("video_url"),
+            "time": content_item.get("time"),
             "last_update_time": content_item.get("last_update_time"),
+            "liked_count": utils.interact_count_text(content_item.get("liked_count")),
+            "collected_count": utils.interact_count_text(content_item.get("collected_count")),
+            "comment_count": utils.interact_count_text(content_item.get("comment_count")),
+            "share_count": utils.interact_count_text(content_item.get("share_count")),
+            "image_list": json.dumps(content_item.get("image_list")),
+            "tag_list": json.dumps(content_item.get("tag_list")),
+            "note_url": content_item.get("note_url"),
+            "source_keyword": content_item.get("source_keyword", ""),
+            "xsec_token": content_item.get("xsec_token", ""),
         }
-        stmt = update(XhsNote).where(XhsNote.note_id == note_id).values(**update_data)
-        await session.execute(stmt)
-
-    async def content_is_exist(self, session: AsyncSession, note_id: str) -> bool:
-        stmt = select(XhsNote).where(XhsNote.note_id == note_id)
-        result = await session.execute(stmt)
-        return result.first() is not None
 
     async def store_comment(self, comment_item: Dict):
         if not comment_item:
             return
-        async with get_session() as session:
-            comment_id = comment_item.get("comment_id")
-            if not comment_id:
-                return
-            if await self.comment_is_exist(session, comment_id):
-                await self.update_comment(session, comment_item)
-            else:
-                await self.add_comment(session, comment_item)
-
-    async def add_comment(self, session: AsyncSession, comment_item: Dict):
-        add_ts = int(get_current_timestamp())
-        last_modify_ts = int(get_current_timestamp())
-        comment = XhsNoteComment(
-            user_id=comment_item.get("user_id"),
-            nickname=comment_item.get("nickname"),
-            avatar=comment_item.get("avatar"),
-            ip_location=comment_item.get("ip_location"),
-            add_ts=add_ts,
-            last_modify_ts=last_modify_ts,
-            comment_id=comment_item.get("comment_id"),
-            create_time=comment_item.get("create_time"),
-            note_id=comment_item.get("note_id"),
-            content=comment_item.get("content"),
-            sub_comment_count=comment_item.get("sub_comment_count"),
-            pictures=json.dumps(comment_item.get("pictures")),
-            parent_comment_id=comment_item.get("parent_comment_id"),
-            like_count=str(comment_item.get("like_count"))
-        )
-        session.add(comment)
+        await self.store_comments([comment_item])
 
-    async def update_comment(self, session: AsyncSession, comment_item: Dict):
-        comment_id = comment_item.get("comment_id")
-        last_modify_ts = int(get_current_timestamp())
-        update_data = {
-            "last_modify_ts": last_modify_ts,
-            "like_count": str(comment_item.get("like_count")),
+    async def store_comments(self, comment_items: List[Dict]):
+        rows = [self._comment_row(item) for item in comment_items if item.get("comment_id")]
+        if not rows:
+            return
+        async with get_session() as session:
+            await upsert_rows(session, XhsNoteComment, rows, ["comment_id"], self.COMMENT_UPDATE_COLUMNS)
+
+    @staticmethod
+    def _comment_row(comment_item: Dict) -> Dict:
+        return {
+            "user_id": comment_item.get("user_id"),
+            "nickname": comment_item.get("nickname"),
+            "avatar": comment_item.get("avatar"),
+            "ip_location": comment_item.get("ip_location"),
+            "add_ts": int(get_current_timestamp()),
+            "last_modify_ts": int(get_current_timestamp()),
+            "comment_id": comment_item.get("comment_id"),
+            "create_time": comment_item.get("create_time"),
+            "note_id": comment_item.get("note_id"),
+            "content": comment_item.get("content"),
             "sub_comment_count": comment_item.get("sub_comment_count"),
+            "pictures": json.dumps(comment_item.get("pictures")),
+            "parent_comment_id": comment_item.get("parent_comment_id"),
+            "like_count": utils.interact_count_text(comment_item.get("like_count")),
         }
-        stmt = update(XhsNoteComment).where(XhsNoteComment.comment_id == comment_id).values(**update_data)
-        await session.execute(stmt)
-
-    async def comment_is_exist(self, session: AsyncSession, comment_id: str) -> bool:
-        stmt = select(XhsNoteComment).where(XhsNoteComment.comment_id == comment_id)
-        result = await session.execute(stmt)
-        return result.first() is not None
 
     async def store_creator(self, creator_item: Dict):
         user_id = creator_item.get("user_id")
@@ -214,9 +262,9 @@ class XhsDbStoreImplement(AbstractStore):
             last_modify_ts=last_modify_ts,
             desc=creator_item.get("desc"),
             gender=creator_item.get("gender"),
-            follows=str(creator_item.get("follows")),
-            fans=str(creator_item.get("fans")),
-            interaction=str(creator_item.get("interaction")),
+            follows=utils.interact_count_text(creator_item.get("follows")),
+            fans=utils.interact_count_text(creator_item.get("fans")),
+            interaction=utils.interact_count_text(creator_item.get("interaction")),
             tag_list=json.dumps(creator_item.get("tag_list"))
         )
         session.add(creator)
@@ -229,9 +277,9 @@ class XhsDbStoreImplement(AbstractStore):
             "nickname": creator_item.get("nickname"),
             "avatar": creator_item.get("avatar"),
             "desc": creator_item.get("desc"),
-            "follows": str(creator_item.get("follows")),
-            "fans": str(creator_item.get("fans")),
-            "interaction": str(creator_item.get("interaction")),
+            "follows": utils.interact_count_text(creator_item.get("follows")),
+            "fans": utils.interact_count_text(creator_item.get("fans")),
+            "interaction": utils.interact_count_text(creator_item.get("interaction")),
             "tag_list": json.dumps(creator_item.get("tag_list"))
         }
         stmt = update(XhsCreator).where(XhsCreator.user_id == user_id).values(**update_data)
@@ -242,17 +290,29 @@ class XhsDbStoreImplement(AbstractStore):
         result = await session.execute(stmt)
         return result.first() is not None
 
-    async def get_all_content(self) -> List[Dict]:
-        async with get_session() as session:
-            stmt = select(XhsNote)
-            result = await session.execute(stmt)
-            return [item.__dict__ for item in result.scalars().all()]
+    def iter_contents(self, note_id: Optional[str] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream notes in batches instead of loading the whole table, e.g. async for rows in store.iter_contents(keyword=...)
+        Args:
+            note_id: only this note
+            keyword: only notes found by this search keyword
+            start_ts: add_ts lower bound in milliseconds, inclusive
+            end_ts: add_ts upper bound in milliseconds, exclusive
+            batch_size: rows per batch, DB_STREAM_BATCH_SIZE by default
+
+        Returns:
+            async iterator of row dict lists
+        """
+        return stream_contents(XhsNote, "note_id", note_id, keyword, start_ts, end_ts, batch_size)
 
-    async def get_all_comments(self) -> List[Dict]:
-        async with get_session() as session:
-            stmt = select(XhsNoteComment)
-            result = await session.execute(stmt)
-            return [item.__dict__ for item in result.scalars().all()]
+    def iter_comments(self, note_id: Optional[str] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream comments in batches, the filters are the same as iter_contents,
+        keyword matches the search keyword of the note a comment belongs to
+        """
+        return stream_comments(XhsNoteComment, XhsNote, "note_id", note_id, keyword, start_ts, end_ts, batch_size)
 
 
 class XhsSqliteStoreImplement(XhsDbStoreImplement):
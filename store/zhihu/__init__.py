@@ -10,7 +10,7 @@
 
 
 # -*- coding: utf-8 -*-
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 import config
 from base.base_crawler import AbstractStore
@@ -18,9 +18,12 @@ from model.m_zhihu import ZhihuComment, ZhihuContent, ZhihuCreator
 from ._store_impl import (ZhihuCsvStoreImplement,
                                           ZhihuDbStoreImplement,
                                           ZhihuJsonStoreImplement,
+                                          ZhihuJsonlStoreImplement,
+                                          ZhihuParquetStoreImplement,
                                           ZhihuSqliteStoreImplement)
 from tools import utils
-from var import source_keyword_var
+from store.write_behind import flush_store_queue, write_behind
+from var import crawler_type_var, source_keyword_var
 
 
 class ZhihuStoreFactory:
@@ -28,16 +31,27 @@ class ZhihuStoreFactory:
         "csv": ZhihuCsvStoreImplement,
         "db": ZhihuDbStoreImplement,
         "json": ZhihuJsonStoreImplement,
+        "jsonl": ZhihuJsonlStoreImplement,
+        "parquet": ZhihuParquetStoreImplement,
         "sqlite": ZhihuSqliteStoreImplement
     }
 
+    # 按（保存方式, 爬取类型）缓存的 store 实例，整个进程共用一个 store 及其文件写锁
+    _store_instances: Dict[Tuple[str, str], AbstractStore] = {}
+
     @staticmethod
     def create_store() -> AbstractStore:
+        store_key = (config.SAVE_DATA_OPTION, crawler_type_var.get())
+        if store_key in ZhihuStoreFactory._store_instances:
+            return ZhihuStoreFactory._store_instances[store_key]
         store_class = ZhihuStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[ZhihuStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+            raise ValueError("[ZhihuStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or sqlite or parquet ...")
+        store = store_class()
+        ZhihuStoreFactory._store_instances[store_key] = store
+        return store
 
+@write_behind
 async def batch_update_zhihu_contents(contents: List[ZhihuContent]):
     """
     批量更新知乎内容
@@ -50,9 +64,9 @@ async def batch_update_zhihu_contents(contents: List[ZhihuContent]):
     if not contents:
         return
 
-    for content_item in contents:
-        await update_zhihu_content(content_item)
+    await ZhihuStoreFactory.create_store().store_contents([_build_content_item(content_item) for content_item in contents])
 
+@write_behind
 async def update_zhihu_content(content_item: ZhihuContent):
     """
     更新知乎内容
@@ -61,15 +75,28 @@ async def update_zhihu_content(content_item: ZhihuContent):
 
     Returns:
 
+    """
+    await ZhihuStoreFactory.create_store().store_content(_build_content_item(content_item))
+
+
+def _build_content_item(content_item: ZhihuContent) -> Dict:
+    """
+    将知乎内容转换为存储的字段
+    Args:
+        content_item:
+
+    Returns:
+
     """
     content_item.source_keyword = source_keyword_var.get()
     local_db_item = content_item.model_dump()
     local_db_item.update({"last_modify_ts": utils.get_current_timestamp()})
     utils.logger.info(f"[store.zhihu.update_zhihu_content] zhihu content: {local_db_item}")
-    await ZhihuStoreFactory.create_store().store_content(local_db_item)
+    return local_db_item
 
 
 
+@write_behind
 async def batch_update_zhihu_note_comments(comments: List[ZhihuComment]):
     """
     批量更新知乎内容评论
@@ -81,11 +108,11 @@ async def batch_update_zhihu_note_comments(comments: List[ZhihuComment]):
     """
     if not comments:
         return
-    
-    for comment_item in comments:
-        await update_zhihu_content_comment(comment_item)
+
+    await ZhihuStoreFactory.create_store().store_comments([_build_comment_item(comment_item) for comment_item in comments])
 
 
+@write_behind
 async def update_zhihu_content_comment(comment_item: ZhihuComment):
     """
     更新知乎内容评论
@@ -94,13 +121,43 @@ async def update_zhihu_content_comment(comment_item: ZhihuComment):
 
     Returns:
 
+    """
+    await ZhihuStoreFactory.create_store().store_comment(_build_comment_item(comment_item))
+
+
+async def get_latest_comment_time(content_id: str) -> Optional[int]:
+    """
+    获取内容下已存储评论的最新发布时间，用于增量爬取评论，只有 db / sqlite 存储支持，其他存储返回 None
+    Args:
+        content_id:
+
+    Returns:
+
+    """
+    store = ZhihuStoreFactory.create_store()
+    if not isinstance(store, ZhihuDbStoreImplement):
+        return None
+    # 写入队列中尚未落库的评论也要计入水位，否则会重复爬取
+    await flush_store_queue()
+    return await store.get_latest_comment_time(content_id)
+
+
+def _build_comment_item(comment_item: ZhihuComment) -> Dict:
+    """
+    将知乎评论转换为存储的字段
+    Args:
+        comment_item:
+
+    Returns:
+
     """
     local_db_item = comment_item.model_dump()
     local_db_item.update({"last_modify_ts": utils.get_current_timestamp()})
     utils.logger.info(f"[store.zhihu.update_zhihu_note_comment] zhihu content comment:{local_db_item}")
-    await ZhihuStoreFactory.create_store().store_comment(local_db_item)
+    return local_db_item
 
 
+@write_behind
 async def save_creator(creator: ZhihuCreator):
     """
     保存知乎创作者信息
@@ -18,7 +18,7 @@ import csv
 import json
 import os
 import pathlib
-from typing import Dict
+from typing import AsyncIterator, Dict, List, Optional
 
 import aiofiles
 from sqlalchemy import select
@@ -26,7 +26,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 import config
 from base.base_crawler import AbstractStore
+from model import m_zhihu
 from database.db_session import get_session
+from database.db_stream import get_latest_comment_time, stream_comments, stream_contents
+from database.db_upsert import upsert_rows
 from database.models import ZhihuContent, ZhihuComment, ZhihuCreator
 from tools import utils, words
 from var import crawler_type_var
@@ -48,9 +51,16 @@ def calculate_number_of_files(file_store_path: str) -> int:
 
 
 class ZhihuCsvStoreImplement(AbstractStore):
+    # csv 列顺序，取 model 中定义的字段，外加存储时补充的 last_modify_ts
+    CSV_SCHEMAS = {
+        "contents": list(m_zhihu.ZhihuContent.model_fields) + ["last_modify_ts"],
+        "comments": list(m_zhihu.ZhihuComment.model_fields) + ["last_modify_ts"],
+        "creators": list(m_zhihu.ZhihuCreator.model_fields) + ["last_modify_ts"],
+    }
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.writer = AsyncFileWriter(platform="zhihu", crawler_type=crawler_type_var.get())
+        self.writer = AsyncFileWriter(platform="zhihu", crawler_type=crawler_type_var.get(), csv_schemas=self.CSV_SCHEMAS)
 
     async def store_content(self, content_item: Dict):
         """
@@ -93,37 +103,37 @@ class ZhihuDbStoreImplement(AbstractStore):
         Args:
             content_item: content item dict
         """
-        content_id = content_item.get("content_id")
+        await self.store_contents([content_item])
+
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        Zhihu contents DB batch storage implementation, one upsert per page
+        Args:
+            content_items: content item dicts
+        """
+        if not content_items:
+            return
         async with get_session() as session:
-            stmt = select(ZhihuContent).where(ZhihuContent.content_id == content_id)
-            result = await session.execute(stmt)
-            existing_content = result.scalars().first()
-            if existing_content:
-                for key, value in content_item.items():
-                    setattr(existing_content, key, value)
-            else:
-                new_content = ZhihuContent(**content_item)
-                session.add(new_content)
-            await session.commit()
+            await upsert_rows(session, ZhihuContent, content_items, ["content_id"])
 
     async def store_comment(self, comment_item: Dict):
         """
-        Zhihu content DB storage implementation
+        Zhihu comment DB storage implementation
         Args:
             comment_item: comment item dict
         """
-        comment_id = comment_item.get("comment_id")
+        await self.store_comments([comment_item])
+
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        Zhihu comments DB batch storage implementation, one upsert per page
+        Args:
+            comment_items: comment item dicts
+        """
+        if not comment_items:
+            return
         async with get_session() as session:
-            stmt = select(ZhihuComment).where(ZhihuComment.comment_id == comment_id)
-            result = await session.execute(stmt)
-            existing_comment = result.scalars().first()
-            if existing_comment:
-                for key, value in comment_item.items():
-                    setattr(existing_comment, key, value)
-            else:
-                new_comment = ZhihuComment(**comment_item)
-                session.add(new_comment)
-            await session.commit()
+            await upsert_rows(session, ZhihuComment, comment_items, ["comment_id"])
 
     async def store_creator(self, creator: Dict):
         """
@@ -142,7 +152,36 @@ class ZhihuDbStoreImplement(AbstractStore):
             else:
                 new_creator = ZhihuCreator(**creator)
                 session.add(new_creator)
-            await session.commit()
+
+    def iter_contents(self, content_id: Optional[str] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream contents in batches instead of loading the whole table, e.g. async for rows in store.iter_contents(keyword=...)
+        Args:
+            content_id: only this content
+            keyword: only contents found by this search keyword
+            start_ts: add_ts lower bound in milliseconds, inclusive
+            end_ts: add_ts upper bound in milliseconds, exclusive
+            batch_size: rows per batch, DB_STREAM_BATCH_SIZE by default
+
+        Returns:
+            async iterator of row dict lists
+        """
+        return stream_contents(ZhihuContent, "content_id", content_id, keyword, start_ts, end_ts, batch_size)
+
+    def iter_comments(self, content_id: Optional[str] = None, keyword: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Stream comments in batches, the filters are the same as iter_contents,
+        keyword matches the search keyword of the content a comment belongs to
+        """
+        return stream_comments(ZhihuComment, ZhihuContent, "content_id", content_id, keyword, start_ts, end_ts, batch_size)
+
+    async def get_latest_comment_time(self, content_id: str) -> Optional[int]:
+        """
+        Newest stored comment publish_time of a content, None if it has no stored comments
+        """
+        return await get_latest_comment_time(ZhihuComment, "content_id", content_id, time_column="publish_time")
 
 
 class ZhihuJsonStoreImplement(AbstractStore):
@@ -184,6 +223,87 @@ class ZhihuJsonStoreImplement(AbstractStore):
         await self.writer.write_single_item_to_json(item_type="creators", item=creator)
 
 
+class ZhihuJsonlStoreImplement(AbstractStore):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="zhihu", crawler_type=crawler_type_var.get())
+
+    async def store_content(self, content_item: Dict):
+        """
+        content JSONL storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="contents", item=content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment JSONL storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="comments", item=comment_item)
+
+    async def store_creator(self, creator: Dict):
+        """
+        Zhihu content JSONL storage implementation
+        Args:
+            creator: creator dict
+
+        Returns:
+
+        """
+        await self.writer.write_single_item_to_jsonl(item_type="creators", item=creator)
+
+
+class ZhihuParquetStoreImplement(AbstractStore):
+    # parquet 列与 csv 相同
+    PARQUET_SCHEMAS = ZhihuCsvStoreImplement.CSV_SCHEMAS
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="zhihu", crawler_type=crawler_type_var.get(), csv_schemas=self.PARQUET_SCHEMAS)
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item_type="contents", item=content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item_type="comments", item=comment_item)
+
+    async def store_creator(self, creator: Dict):
+        """
+        Zhihu content Parquet storage implementation
+        Args:
+            creator: creator dict
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item_type="creators", item=creator)
+
+
 class ZhihuSqliteStoreImplement(ZhihuDbStoreImplement):
     """
     Zhihu content SQLite storage implementation
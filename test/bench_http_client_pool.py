@@ -0,0 +1,119 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 对比每次请求新建 httpx.AsyncClient 和长连接客户端池的请求耗时，服务端是本机的 HTTPS 桩服务
+#            python -m test.bench_http_client_pool [请求数]
+import asyncio
+import datetime
+import os
+import ssl
+import statistics
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, List
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from tools.http_client_pool import HttpClientPool
+
+RESPONSE = b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 16\r\n\r\n{"success":true}'
+
+
+def _write_self_signed_cert(cert_path: str, key_path: str):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    只回复固定 JSON 的 keep-alive HTTP/1.1 服务端
+    """
+    try:
+        while True:
+            headers = await reader.readuntil(b"\r\n\r\n")
+            for line in headers.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    await reader.readexactly(int(line.split(b":")[1]))
+            writer.write(RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _measure(request: Callable[[], Awaitable[httpx.Response]], count: int) -> List[float]:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await request()
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _report(name: str, latencies: List[float]):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<28} mean {statistics.mean(latencies):7.2f}ms  p50 {statistics.median(latencies):7.2f}ms  p95 {p95:7.2f}ms")
+
+
+async def main(count: int):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cert_path, key_path = os.path.join(temp_dir, "cert.pem"), os.path.join(temp_dir, "key.pem")
+        _write_self_signed_cert(cert_path, key_path)
+        server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_context.load_cert_chain(cert_path, key_path)
+        client_context = ssl.create_default_context(cafile=cert_path)
+
+        server = await asyncio.start_server(_handle, "127.0.0.1", 0, ssl=server_context)
+        url = f"https://localhost:{server.sockets[0].getsockname()[1]}/api/sns/web/v1/search/notes"
+        async with server:
+            async def new_client_per_request():
+                async with httpx.AsyncClient(verify=client_context) as client:
+                    return await client.request("POST", url, json={"keyword": "bench"})
+
+            pool = HttpClientPool(verify=client_context)
+            try:
+                async def pooled_client():
+                    return await pool.get().request("POST", url, json={"keyword": "bench"})
+
+                _report("new AsyncClient per request", await _measure(new_client_per_request, count))
+                _report("pooled AsyncClient", await _measure(pooled_client, count))
+            finally:
+                await pool.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
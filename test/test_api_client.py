@@ -0,0 +1,187 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest import IsolatedAsyncioTestCase, mock
+
+import httpx
+
+import config
+from base.base_crawler import AbstractApiClient, add_request_timing_hook, remove_request_timing_hook
+from media_platform.xhs.client import XiaoHongShuClient
+from tools.http_client_pool import HttpClientPool
+from tools.rate_limiter import get_rate_limiter, get_retry_after
+
+
+class ApiError(Exception):
+    pass
+
+
+class DemoClient(AbstractApiClient):
+
+    def __init__(self, handler):
+        self._http_client_pool = HttpClientPool(transport=httpx.MockTransport(handler))
+
+    def parse_response(self, response: httpx.Response, return_response: bool = False):
+        if return_response:
+            return response.text
+        data = response.json()
+        if not data.get("ok"):
+            raise ApiError(data.get("msg"))
+        return data["data"]
+
+    async def update_cookies(self, browser_context):
+        pass
+
+
+class FlakyServer:
+    """前 fail_count 次请求连接失败，之后返回 ok"""
+
+    def __init__(self, fail_count: int):
+        self.fail_count = fail_count
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if len(self.requests) <= self.fail_count:
+            raise httpx.ConnectError("connection refused", request=request)
+        if request.url.path == "/error":
+            return httpx.Response(200, json={"ok": False, "msg": "sign error"})
+        return httpx.Response(200, json={"ok": True, "data": {"path": request.url.path}})
+
+
+class TestApiClient(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.patcher = mock.patch.multiple(config, API_RETRY_TIMES=2, API_RETRY_WAIT_SEC=0, ENABLE_RATE_LIMIT=False)
+        self.patcher.start()
+        self.timings = []
+        self.hook = lambda *args: self.timings.append(args)
+        add_request_timing_hook(self.hook)
+
+    def tearDown(self):
+        remove_request_timing_hook(self.hook)
+        self.patcher.stop()
+
+    async def test_retry_transport_errors(self):
+        server = FlakyServer(fail_count=2)
+        client = DemoClient(server)
+        self.assertEqual(await client.request("GET", "https://api.test/v1/feed?page=1"), {"path": "/v1/feed"})
+        self.assertEqual(len(server.requests), 3)
+        # 每次请求都回调耗时，接口路径不含查询参数
+        self.assertEqual([(name, method, endpoint) for name, method, endpoint, _, _ in self.timings], [("DemoClient", "GET", "/v1/feed")] * 3)
+        self.assertEqual([type(error) for *_, error in self.timings], [httpx.ConnectError, httpx.ConnectError, type(None)])
+
+        with self.assertRaises(httpx.ConnectError):
+            await DemoClient(FlakyServer(fail_count=3)).request("GET", "https://api.test/v1/feed")
+        await client.close()
+
+    async def test_retry_exceptions_by_platform(self):
+        server = FlakyServer(fail_count=0)
+        client = DemoClient(server)
+        # 默认不重试平台的接口错误
+        with self.assertRaises(ApiError):
+            await client.request("GET", "https://api.test/error")
+        self.assertEqual(len(server.requests), 1)
+
+        client.retry_exceptions = (Exception,)
+        with self.assertRaises(ApiError):
+            await client.request("GET", "https://api.test/error")
+        self.assertEqual(len(server.requests), 4)
+        self.assertEqual(await client.request("GET", "https://api.test/raw", return_response=True), '{"ok":true,"data":{"path":"/raw"}}')
+        await client.close()
+
+    async def test_note_html_retried_only_by_request(self):
+        server = FlakyServer(fail_count=10)
+        client = XiaoHongShuClient(headers={"Cookie": "a1=1"}, playwright_page=None, cookie_dict={})
+        client._http_client_pool = HttpClientPool(transport=httpx.MockTransport(server))
+        with self.assertRaises(httpx.ConnectError):
+            await client.get_note_by_id_from_html("n1", "pc_search", "token")
+        # 只有 request 的重试，不再叠加外层重试
+        self.assertEqual(len(server.requests), config.API_RETRY_TIMES + 1)
+        await client.close()
+
+    async def test_rate_limit_by_endpoint_class(self):
+        client = DemoClient(FlakyServer(fail_count=0))
+        self.assertEqual(client.get_endpoint_class("/api/sns/web/v1/search/notes"), "search")
+        self.assertEqual(client.get_endpoint_class("/x/v2/reply/wbi/main"), "comment")
+        self.assertEqual(client.get_endpoint_class("/api/sns/web/v1/feed"), "default")
+
+        with mock.patch.multiple(config, ENABLE_RATE_LIMIT=True, RATE_LIMIT_PER_SEC={"default": 20, "search": 0}, RATE_LIMIT_BURST=1):
+            start = asyncio.get_running_loop().time()
+            for _ in range(3):
+                await client.request("GET", "https://api.test/v1/feed")
+            # 第一次请求用桶里的令牌，之后每 0.05 秒发放一个
+            self.assertGreaterEqual(asyncio.get_running_loop().time() - start, 0.09)
+
+            start = asyncio.get_running_loop().time()
+            for _ in range(3):
+                await client.request("GET", "https://api.test/v1/search")
+            self.assertLess(asyncio.get_running_loop().time() - start, 0.05)
+        await client.close()
+
+    async def test_unconfigured_endpoint_classes_share_one_bucket(self):
+        client = DemoClient(FlakyServer(fail_count=0))
+        with mock.patch.multiple(config, ENABLE_RATE_LIMIT=True, RATE_LIMIT_PER_SEC={}, RATE_LIMIT_BURST=1,
+                                 MAX_CONCURRENCY_NUM=1, CRAWLER_MAX_SLEEP_SEC=0.05):
+            start = asyncio.get_running_loop().time()
+            for path in ("/v1/search", "/v1/comment", "/v1/feed", "/v1/search"):
+                await client.request("GET", f"https://api.test{path}")
+            # 各类接口加起来仍是每 0.05 秒一个请求
+            self.assertGreaterEqual(asyncio.get_running_loop().time() - start, 0.14)
+
+            # 并发等待的请求各自 sleep 到预约的时间
+            limiter = get_rate_limiter("DemoClient", "default")
+            await asyncio.sleep(0.05)
+            start = asyncio.get_running_loop().time()
+            finished = []
+
+            async def acquire():
+                await limiter.acquire()
+                finished.append(asyncio.get_running_loop().time() - start)
+
+            await asyncio.gather(*(acquire() for _ in range(3)))
+            self.assertLess(finished[0], 0.03)
+            self.assertAlmostEqual(finished[2], 0.1, delta=0.03)
+        await client.close()
+
+    async def test_retry_after_pauses_endpoint_class(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/busy":
+                return httpx.Response(429, headers={"Retry-After": "1"}, json={"ok": False, "msg": "too many requests"})
+            return httpx.Response(200, json={"ok": True, "data": {}})
+
+        client = DemoClient(handler)
+        with mock.patch.multiple(config, ENABLE_RATE_LIMIT=True, RATE_LIMIT_PER_SEC={"default": 0}):
+            with self.assertRaises(ApiError):
+                await client.request("GET", "https://api.test/busy")
+            start = asyncio.get_running_loop().time()
+            await client.request("GET", "https://api.test/feed")
+            self.assertGreaterEqual(asyncio.get_running_loop().time() - start, 0.9)
+        await client.close()
+
+    def test_get_retry_after(self):
+        self.assertIsNone(get_retry_after(httpx.Response(200, headers={"Retry-After": "5"})))
+        self.assertEqual(get_retry_after(httpx.Response(503, headers={"Retry-After": "5"})), 5)
+        self.assertIsNone(get_retry_after(httpx.Response(503)))
+        with mock.patch.object(config, "RATE_LIMIT_BACKOFF_SEC", 30):
+            self.assertEqual(get_retry_after(httpx.Response(429)), 30)
+        retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+        self.assertAlmostEqual(get_retry_after(httpx.Response(429, headers={"Retry-After": retry_at})), 60, delta=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import asyncio
+import csv
+import json
+import os
+import tempfile
+from unittest import mock
+from unittest import IsolatedAsyncioTestCase
+
+import config
+from tools.async_file_writer import (AsyncFileWriter, close_csv_files, close_jsonl_files, close_parquet_files,
+                                     compact_jsonl_to_json, flush_csv_files)
+from tools.output_file import RotatingOutputFile, get_output_files, open_output_file
+from tools.utils import utils
+
+
+class TestAsyncFileWriter(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.origin_cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+
+    def tearDown(self):
+        close_csv_files()
+        close_jsonl_files()
+        close_parquet_files()
+        os.chdir(self.origin_cwd)
+        self.tmp_dir.cleanup()
+
+    async def test_jsonl_append_and_compact(self):
+        items = [{"comment_id": str(i), "content": f"评论{i}"} for i in range(20)]
+        # two writers for the same file must not interleave lines
+        writers = [AsyncFileWriter(platform="xhs", crawler_type="search") for _ in range(2)]
+        await asyncio.gather(*[
+            writers[i % 2].write_single_item_to_jsonl(item, "comments") for i, item in enumerate(items)
+        ])
+
+        jsonl_file_path = writers[0]._get_file_path("jsonl", "comments")
+        with open(jsonl_file_path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), len(items))
+        self.assertEqual(json.loads(lines[0]), items[0])
+
+        json_file_path = await compact_jsonl_to_json(jsonl_file_path)
+        self.assertEqual(json_file_path, writers[0]._get_file_path("json", "comments"))
+        with open(json_file_path, encoding="utf-8") as f:
+            content = f.read()
+        # compacted file is byte-identical to the legacy json writer output
+        self.assertEqual(content, json.dumps(items, ensure_ascii=False, indent=4))
+
+    async def test_compact_empty_jsonl(self):
+        writer = AsyncFileWriter(platform="xhs", crawler_type="search")
+        jsonl_file_path = writer._get_file_path("jsonl", "contents")
+        open(jsonl_file_path, "w").close()
+        json_file_path = await compact_jsonl_to_json(jsonl_file_path)
+        with open(json_file_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), [])
+
+    async def test_csv_buffered_with_schema(self):
+        writer = AsyncFileWriter(platform="xhs", crawler_type="search",
+                                 csv_schemas={"comments": ["comment_id", "content", "like_count"]})
+        await writer.write_to_csv({"content": "a", "comment_id": "1"}, "comments")
+        await writer.write_to_csv({"like_count": 3, "comment_id": "2", "content": "b"}, "comments")
+        await flush_csv_files()
+        # a reopened handle appends without writing the header again
+        close_csv_files()
+        await writer.write_to_csv({"comment_id": "3", "content": "c", "like_count": 1}, "comments")
+        close_csv_files()
+
+        with open(writer._get_file_path("csv", "comments"), encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows, [
+            ["comment_id", "content", "like_count"],
+            ["1", "a", ""],
+            ["2", "b", "3"],
+            ["3", "c", "1"],
+        ])
+
+    async def test_parquet_row_groups_and_int_columns(self):
+        import pyarrow.parquet as pq
+
+        origin_row_group_size = config.PARQUET_ROW_GROUP_SIZE
+        config.PARQUET_ROW_GROUP_SIZE = 2
+        try:
+            writer = AsyncFileWriter(platform="xhs", crawler_type="search",
+                                     csv_schemas={"comments": ["comment_id", "like_count", "create_time", "pictures"]})
+            items = [
+                {"comment_id": "1", "like_count": "1.13万", "create_time": 1700000000000, "pictures": ["a"]},
+                {"comment_id": "2", "like_count": 3, "create_time": "1700000000001", "pictures": []},
+                {"comment_id": "3", "like_count": "", "create_time": 1700000000002, "pictures": None},
+            ]
+            for item in items:
+                await writer.write_to_parquet(item, "comments")
+            file_path = writer._get_file_path("parquet", "comments")
+            # a full row group is written before shutdown, the rest is buffered
+            self.assertTrue(os.path.exists(file_path))
+            close_parquet_files()
+        finally:
+            config.PARQUET_ROW_GROUP_SIZE = origin_row_group_size
+
+        parquet_file = pq.ParquetFile(file_path)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 2)
+        self.assertEqual([str(field.type) for field in parquet_file.schema_arrow], ["string", "int64", "int64", "string"])
+        self.assertEqual(parquet_file.read().to_pylist(), [
+            {"comment_id": "1", "like_count": 11300, "create_time": 1700000000000, "pictures": '["a"]'},
+            {"comment_id": "2", "like_count": 3, "create_time": 1700000000001, "pictures": "[]"},
+            {"comment_id": "3", "like_count": None, "create_time": 1700000000002, "pictures": None},
+        ])
+
+        # a value that does not fit the int64 column inferred from the first row group is logged
+        config.PARQUET_ROW_GROUP_SIZE = 1
+        try:
+            await writer.write_to_parquet({"comment_id": "4", "like_count": "3", "create_time": 1, "pictures": None}, "comments")
+            with self.assertLogs(utils.logger, "WARNING") as logs:
+                await writer.write_to_parquet({"comment_id": "5", "like_count": "很多", "create_time": 2, "pictures": None}, "comments")
+            self.assertIn("like_count", logs.output[0])
+            close_parquet_files()
+        finally:
+            config.PARQUET_ROW_GROUP_SIZE = origin_row_group_size
+        self.assertEqual([row["like_count"] for row in pq.read_table(file_path.replace(".parquet", "_1.parquet")).to_pylist()], [3, None])
+
+        # parquet files can not be appended, a second run of the same day writes a new file
+        await writer.write_to_parquet(items[0], "comments")
+        close_parquet_files()
+        self.assertTrue(os.path.exists(file_path.replace(".parquet", "_2.parquet")))
+
+    @mock.patch.multiple(config, FILE_COMPRESSION="gzip", FILE_ROTATE_MAX_ITEMS=3)
+    async def test_jsonl_gzip_rotation(self):
+        writer = AsyncFileWriter(platform="xhs", crawler_type="search")
+        items = [{"comment_id": str(i), "content": f"评论{i}"} for i in range(7)]
+        for item in items[:4]:
+            await writer.write_single_item_to_jsonl(item, "comments")
+        base_path = writer._get_file_path("jsonl", "comments")
+        # the segment being written is not visible to readers yet
+        self.assertEqual(get_output_files(base_path), [base_path.replace(".jsonl", ".0001.jsonl.gz")])
+        self.assertTrue(os.path.exists(base_path.replace(".jsonl", ".0002.jsonl.gz.part")))
+        close_jsonl_files()
+
+        # the next run continues with the next segment
+        for item in items[4:]:
+            await writer.write_single_item_to_jsonl(item, "comments")
+        close_jsonl_files()
+        self.assertEqual([os.path.basename(path) for path in get_output_files(base_path)], [
+            os.path.basename(base_path).replace(".jsonl", f".000{i}.jsonl.gz") for i in range(1, 4)
+        ])
+        self.assertEqual(await writer._read_items("jsonl", "comments"), items)
+
+        json_file_path = await compact_jsonl_to_json(base_path)
+        with open(json_file_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), items)
+
+    @mock.patch.multiple(config, FILE_ROTATE_MAX_ITEMS=3)
+    async def test_finalize_segment_left_by_crash(self):
+        for compression in ("", "gzip"):
+            with self.subTest(compression=compression), mock.patch.object(config, "FILE_COMPRESSION", compression):
+                base_path = f"{compression or 'plain'}_comments.jsonl"
+                stale = RotatingOutputFile(base_path)
+                stale.write('{"comment_id": "1"}\n', 1)
+                # 进程在写入过程中被杀：分片留着 .part 后缀，最后一行没写完，压缩流没有结尾
+                stale._text.write('{"comment_id": "2"}\n{"comment_')
+                stale._text.flush()
+                part_path = stale.path + ".part"
+                with open(part_path, "rb") as f:
+                    crashed = f.read()
+                stale.close()
+                os.remove(stale.path)
+                with open(part_path, "wb") as f:
+                    f.write(crashed)
+
+                file = RotatingOutputFile(base_path)
+                file.write('{"comment_id": "3"}\n', 1)
+                file.close()
+                self.assertFalse(os.path.exists(part_path))
+                items = []
+                for file_path in get_output_files(base_path):
+                    with open_output_file(file_path) as f:
+                        items.extend(json.loads(line)["comment_id"] for line in f)
+                self.assertEqual(items, ["1", "2", "3"])
+
+    @mock.patch.multiple(config, FILE_COMPRESSION="zstd")
+    async def test_csv_zstd_append(self):
+        writer = AsyncFileWriter(platform="xhs", crawler_type="search", csv_schemas={"comments": ["comment_id", "content"]})
+        await writer.write_to_csv({"comment_id": "1", "content": "a"}, "comments")
+        close_csv_files()
+        await writer.write_to_csv({"comment_id": "2", "content": "b"}, "comments")
+        close_csv_files()
+
+        [file_path] = get_output_files(writer._get_file_path("csv", "comments"))
+        self.assertTrue(file_path.endswith(".csv.zst"))
+        with open_output_file(file_path, encoding="utf-8-sig") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows, [["comment_id", "content"], ["1", "a"], ["2", "b"]])
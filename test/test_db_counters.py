@@ -0,0 +1,86 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from sqlalchemy import create_engine, inspect, text
+
+from database.db_counters import backfill_counter_columns, fill_counter_columns, get_counter_columns
+from database.db_migrate import add_missing_columns
+from database.models import Base, XhsNote
+from store.xhs._store_impl import XhsDbStoreImplement
+from tools import utils
+from tools.crawler_util import match_interact_info_count
+
+
+class TestDbCounters(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        # simulate a database created before the counter columns existed
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE xhs_note (id INTEGER PRIMARY KEY, note_id VARCHAR(255), liked_count TEXT, "
+                              "collected_count TEXT, comment_count TEXT, share_count TEXT)"))
+            for note_id, liked_count in (("a", "1.2万"), ("b", "35"), ("c", None), ("d", "10w+")):
+                conn.execute(text("INSERT INTO xhs_note (note_id, liked_count, comment_count) VALUES (:note_id, :liked_count, '3')"),
+                             {"note_id": note_id, "liked_count": liked_count})
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_counter_columns(self):
+        self.assertEqual(get_counter_columns(XhsNote.__table__), {
+            "liked_count_num": "liked_count", "collected_count_num": "collected_count",
+            "comment_count_num": "comment_count", "share_count_num": "share_count",
+        })
+        # integer columns without a text source are not counters
+        self.assertEqual(get_counter_columns(Base.metadata.tables["tieba_note"]), {})
+
+    def test_add_columns_and_backfill(self):
+        with self.engine.begin() as conn:
+            added = add_missing_columns(conn)
+        self.assertIn("liked_count_num", added["xhs_note"])
+        indexes = {index["name"] for index in inspect(self.engine).get_indexes("xhs_note")}
+        self.assertIn("ix_xhs_note_liked_count_num", indexes)
+
+        with self.engine.connect() as conn:
+            self.assertEqual(backfill_counter_columns(conn, batch_size=3)["xhs_note"], 4)
+            rows = conn.execute(text("SELECT note_id, liked_count_num, comment_count_num, share_count_num FROM xhs_note "
+                                     "ORDER BY liked_count_num DESC")).all()
+            self.assertEqual([tuple(row) for row in rows],
+                             [("d", 100000, 3, None), ("a", 12000, 3, None), ("b", 35, 3, None), ("c", None, 3, None)])
+            # rows already filled are skipped on a second run
+            self.assertEqual(backfill_counter_columns(conn)["xhs_note"], 0)
+
+    def test_parse_count_without_float_error(self):
+        for count_str, expected in (("1.13万", 11300), ("0.57w", 5700), ("2.3千", 2300), ("1,234", 1234), ("10w+", 100000),
+                                    ("3.5亿", 350000000), (58, 58), ("", 0), (None, 0)):
+            self.assertEqual(match_interact_info_count(count_str), expected, count_str)
+
+    def test_missing_counter_stays_null(self):
+        self.assertIsNone(utils.interact_count_text(None))
+        self.assertEqual(utils.interact_count_text(0), "0")
+        row = XhsDbStoreImplement._content_row({"note_id": "e", "liked_count": 12, "comment_count": None})
+        self.assertEqual(row["liked_count"], "12")
+        self.assertIsNone(row["comment_count"])
+        self.assertIsNone(row["share_count"])
+
+        row.update(collected_count="None", share_count="")
+        fill_counter_columns(XhsNote.__table__, row)
+        self.assertEqual(row["liked_count_num"], 12)
+        for counter in ("comment_count_num", "collected_count_num", "share_count_num"):
+            self.assertIsNone(row[counter], counter)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from sqlalchemy import create_engine, inspect, text
+
+from database.db_migrate import compare_unique_keys, get_db_unique_keys, get_orm_unique_keys, migrate_unique_keys
+from database.models import Base
+
+
+class TestDbMigrate(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        # simulate a database created before the natural keys became unique
+        with self.engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_xhs_note_note_id"))
+            conn.execute(text("CREATE INDEX ix_xhs_note_note_id ON xhs_note (note_id)"))
+            for note_id, title in (("a", "old"), ("b", "b"), ("a", "new"), (None, "x"), (None, "y")):
+                conn.execute(text("INSERT INTO xhs_note (note_id, title) VALUES (:note_id, :title)"),
+                             {"note_id": note_id, "title": title})
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_fresh_schema_has_all_unique_keys(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.assertEqual(compare_unique_keys(get_db_unique_keys(engine), get_orm_unique_keys()), {})
+        engine.dispose()
+
+    def test_migrate_dedupes_and_adds_unique_index(self):
+        self.assertEqual(compare_unique_keys(get_db_unique_keys(self.engine), get_orm_unique_keys()),
+                         {"xhs_note": [("note_id",)]})
+
+        with self.engine.begin() as conn:
+            self.assertEqual(migrate_unique_keys(conn), {"xhs_note": [("note_id",)]})
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("SELECT note_id, title FROM xhs_note ORDER BY id")).all()
+        # the last written duplicate wins, rows without a key are left alone
+        self.assertEqual([tuple(row) for row in rows], [("b", "b"), ("a", "new"), (None, "x"), (None, "y")])
+        indexes = {index["name"]: index["unique"] for index in inspect(self.engine).get_indexes("xhs_note")}
+        self.assertTrue(indexes["ix_xhs_note_note_id"])
+
+        with self.engine.begin() as conn:
+            self.assertEqual(migrate_unique_keys(conn), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+from unittest import IsolatedAsyncioTestCase
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import asyncio
+import os
+import tempfile
+
+import config
+from database import db_session
+from database.models import Base, XhsNoteComment
+from store.xhs import XhsDbStoreImplement
+
+
+class TestDbSession(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.origin_save_option = config.SAVE_DATA_OPTION
+        config.SAVE_DATA_OPTION = "sqlite"
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        self.commit_count = 0
+        event.listen(self.engine.sync_engine, "commit", self._on_commit)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.commit_count = 0
+        db_session._engines["sqlite"] = self.engine
+
+    async def asyncTearDown(self):
+        await db_session.close_sqlite_writer()
+        db_session._engines.pop("sqlite", None)
+        db_session._session_factories.pop(self.engine, None)
+        config.SAVE_DATA_OPTION = self.origin_save_option
+        await self.engine.dispose()
+
+    def _on_commit(self, conn):
+        self.commit_count += 1
+
+    async def test_session_factory_cached_per_engine(self):
+        self.assertIs(db_session.get_session_factory("sqlite"), db_session.get_session_factory("sqlite"))
+        self.assertIsNone(db_session.get_session_factory("json"))
+
+    async def test_unit_of_work_shares_one_commit(self):
+        store = XhsDbStoreImplement()
+        async with db_session.unit_of_work() as session:
+            for i in range(5):
+                await store.store_comment({"comment_id": str(i), "note_id": "n"})
+                async with db_session.get_session() as inner_session:
+                    self.assertIs(inner_session, session)
+            self.assertEqual(self.commit_count, 0)
+        self.assertEqual(self.commit_count, 1)
+
+        async with db_session.get_session() as session:
+            self.assertEqual(await session.scalar(select(func.count()).select_from(XhsNoteComment)), 5)
+
+    async def test_unit_of_work_rolls_back_on_error(self):
+        store = XhsDbStoreImplement()
+        with self.assertRaises(RuntimeError):
+            async with db_session.unit_of_work():
+                await store.store_comment({"comment_id": "1", "note_id": "n"})
+                raise RuntimeError("page failed")
+        async with db_session.get_session() as session:
+            self.assertEqual(await session.scalar(select(func.count()).select_from(XhsNoteComment)), 0)
+
+
+class TestSqliteWriter(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.origin_save_option = (config.SAVE_DATA_OPTION, config.SQLITE_SINGLE_WRITER)
+        config.SAVE_DATA_OPTION, config.SQLITE_SINGLE_WRITER = "sqlite", True
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(self.tmp_dir.name, 'test.db')}")
+        db_session._setup_sqlite_engine(self.engine)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        db_session._engines["sqlite"] = self.engine
+
+    async def asyncTearDown(self):
+        await db_session.close_sqlite_writer()
+        db_session._engines.pop("sqlite", None)
+        db_session._session_factories.pop(self.engine, None)
+        config.SAVE_DATA_OPTION, config.SQLITE_SINGLE_WRITER = self.origin_save_option
+        await self.engine.dispose()
+        self.tmp_dir.cleanup()
+
+    async def test_wal_pragmas(self):
+        async with self.engine.connect() as conn:
+            self.assertEqual((await conn.exec_driver_sql("PRAGMA journal_mode")).scalar(), "wal")
+            self.assertEqual((await conn.exec_driver_sql("PRAGMA synchronous")).scalar(), 1)
+            self.assertEqual((await conn.exec_driver_sql("PRAGMA busy_timeout")).scalar(), config.SQLITE_BUSY_TIMEOUT_MS)
+
+    async def test_concurrent_writes_grouped_into_few_commits(self):
+        store = XhsDbStoreImplement()
+
+        async def failing_write():
+            async with db_session.get_session() as session:
+                await store.store_comment({"comment_id": "bad", "note_id": "n"})
+                raise ValueError("bad row")
+
+        results = await asyncio.gather(
+            *[store.store_comment({"comment_id": str(i), "note_id": "n"}) for i in range(50)],
+            failing_write(),
+            return_exceptions=True,
+        )
+        self.assertIsInstance(results[-1], ValueError)
+        writer = db_session.get_sqlite_writer()
+        self.assertEqual(writer.write_count, 50)
+        self.assertLess(writer.commit_count, 50)
+
+        async with self.engine.connect() as conn:
+            comment_ids = set((await conn.exec_driver_sql("SELECT comment_id FROM xhs_note_comment")).scalars())
+        self.assertEqual(comment_ids, {str(i) for i in range(50)})
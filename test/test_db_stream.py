@@ -0,0 +1,96 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+from unittest import IsolatedAsyncioTestCase, mock
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import config
+from database import db_session
+from database.models import Base, BilibiliVideoComment, XhsNote, XhsNoteComment, ZhihuComment
+from store import bilibili as bilibili_store
+from store import zhihu as zhihu_store
+from store.write_behind import drain_store_queue
+from store.xhs import XhsDbStoreImplement
+
+
+class TestDbStream(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.origin_save_option = config.SAVE_DATA_OPTION
+        config.SAVE_DATA_OPTION = "sqlite"
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(XhsNote), [
+                {"note_id": f"n{i}", "source_keyword": "a" if i < 3 else "b", "add_ts": i} for i in range(5)
+            ])
+            await conn.execute(insert(XhsNoteComment), [
+                {"comment_id": f"c{i}", "note_id": f"n{i % 5}", "add_ts": i} for i in range(12)
+            ])
+        db_session._engines["sqlite"] = self.engine
+        self.store = XhsDbStoreImplement()
+
+    async def asyncTearDown(self):
+        db_session._engines.pop("sqlite", None)
+        db_session._session_factories.pop(self.engine, None)
+        config.SAVE_DATA_OPTION = self.origin_save_option
+        await self.engine.dispose()
+
+    async def test_stream_in_batches(self):
+        batches = [batch async for batch in self.store.iter_comments(batch_size=5)]
+        self.assertEqual([len(batch) for batch in batches], [5, 5, 2])
+        self.assertEqual(batches[0][0]["comment_id"], "c0")
+        self.assertNotIn("_sa_instance_state", batches[0][0])
+
+    async def test_filters(self):
+        async def note_ids(**kwargs):
+            return [row["note_id"] async for batch in self.store.iter_contents(**kwargs) for row in batch]
+
+        async def comment_ids(**kwargs):
+            return [row["comment_id"] async for batch in self.store.iter_comments(**kwargs) for row in batch]
+
+        self.assertEqual(await note_ids(keyword="b"), ["n3", "n4"])
+        self.assertEqual(await note_ids(start_ts=1, end_ts=3), ["n1", "n2"])
+        self.assertEqual(await comment_ids(note_id="n1"), ["c1", "c6", "c11"])
+        self.assertEqual(await comment_ids(keyword="b", start_ts=4), ["c4", "c8", "c9"])
+
+    async def test_latest_comment_time(self):
+        async with self.engine.begin() as conn:
+            await conn.execute(insert(BilibiliVideoComment), [
+                {"comment_id": 1, "video_id": 10, "create_time": 100},
+                {"comment_id": 2, "video_id": 10, "create_time": 300},
+                {"comment_id": 3, "video_id": 11, "create_time": 500},
+            ])
+            # zhihu 的发布时间是文本列，按整数比较
+            await conn.execute(insert(ZhihuComment), [
+                {"comment_id": "1", "content_id": "z", "publish_time": "999"},
+                {"comment_id": "2", "content_id": "z", "publish_time": "1000"},
+            ])
+        self.assertEqual(await bilibili_store.get_latest_comment_time("10"), 300)
+        self.assertIsNone(await bilibili_store.get_latest_comment_time("12"))
+        self.assertEqual(await zhihu_store.get_latest_comment_time("z"), 1000)
+
+        config.SAVE_DATA_OPTION = "json"
+        self.assertIsNone(await bilibili_store.get_latest_comment_time("10"))
+
+    async def test_latest_comment_time_includes_queued_comments(self):
+        comment = {"rpid": 4, "ctime": 400, "content": {"message": "hi"}, "member": {"mid": "1", "uname": "u"}}
+        with mock.patch.object(config, "ENABLE_STORE_QUEUE", True):
+            try:
+                await bilibili_store.batch_update_bilibili_video_comments("10", [comment])
+                # 评论还在写入队列中，读取水位前先等它落库
+                self.assertEqual(await bilibili_store.get_latest_comment_time("10"), 400)
+            finally:
+                await drain_store_queue()
@@ -14,6 +14,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.db_config import mysql_db_config, sqlite_db_config
 from database.models import Base
+from database.db_migrate import compare_unique_keys, get_db_unique_keys, get_orm_unique_keys, migrate_unique_keys
 
 def get_mysql_engine():
     """创建并返回一个MySQL数据库引擎"""
@@ -113,6 +114,23 @@ def print_diff(db_name, diff):
     print("--- 报告结束 ---")
 
 
+def print_unique_key_diff(db_name, unique_diff):
+    """打印缺失的自然键唯一约束"""
+    if not unique_diff:
+        return
+    print(f"--- {db_name} 缺失的唯一约束 ---")
+    for table, keys in unique_diff.items():
+        print(f"  - {table}: " + ", ".join("(" + ", ".join(key) + ")" for key in keys))
+    print("--- 报告结束 ---")
+
+
+def sync_unique_keys(engine):
+    """去重并补齐自然键唯一约束"""
+    with engine.begin() as conn:
+        for table, keys in migrate_unique_keys(conn).items():
+            print(f"在表 {table} 中已去重并新增唯一约束: " + ", ".join("(" + ", ".join(key) + ")" for key in keys))
+
+
 def sync_database(engine, diff):
     """将ORM模型同步到数据库"""
     metadata = Base.metadata
@@ -171,10 +189,13 @@ def main():
         mysql_schema = get_db_schema(mysql_engine)
         mysql_diff = compare_schemas(mysql_schema, orm_schema)
         print_diff("MySQL", mysql_diff)
-        if any(mysql_diff.values()):
+        mysql_unique_diff = compare_unique_keys(get_db_unique_keys(mysql_engine), get_orm_unique_keys())
+        print_unique_key_diff("MySQL", mysql_unique_diff)
+        if any(mysql_diff.values()) or mysql_unique_diff:
             choice = input(">>> 需要人工确认：是否要将ORM模型同步到MySQL数据库? (y/N): ")
             if choice.lower() == 'y':
                 sync_database(mysql_engine, mysql_diff)
+                sync_unique_keys(mysql_engine)
                 print("MySQL数据库同步完成。")
     except Exception as e:
         print(f"处理MySQL时出错: {e}")
@@ -186,12 +207,15 @@ def main():
         sqlite_schema = get_db_schema(sqlite_engine)
         sqlite_diff = compare_schemas(sqlite_schema, orm_schema)
         print_diff("SQLite", sqlite_diff)
-        if any(sqlite_diff.values()):
+        sqlite_unique_diff = compare_unique_keys(get_db_unique_keys(sqlite_engine), get_orm_unique_keys())
+        print_unique_key_diff("SQLite", sqlite_unique_diff)
+        if any(sqlite_diff.values()) or sqlite_unique_diff:
             choice = input(">>> 需要人工确认：是否要将ORM模型同步到SQLite数据库? (y/N): ")
             if choice.lower() == 'y':
                 # 注意：SQLite不支持ALTER COLUMN来修改字段类型，这里简化处理
                 print("警告：SQLite的字段修改支持有限，此脚本不会执行修改字段类型的操作。")
                 sync_database(sqlite_engine, sqlite_diff)
+                sync_unique_keys(sqlite_engine)
                 print("SQLite数据库同步完成。")
     except Exception as e:
         print(f"处理SQLite时出错: {e}")
@@ -0,0 +1,101 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+from unittest import IsolatedAsyncioTestCase
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database.db_upsert import has_unique_key, update_existing_rows, upsert_rows
+from database.models import Base, BilibiliVideo, XhsNoteComment
+
+
+class TestDbUpsert(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        self.statements = []
+        event.listen(self.engine.sync_engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: self.statements.append(statement))
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def _upsert(self, *args, **kwargs):
+        self.statements.clear()
+        async with self.session_factory() as session:
+            await upsert_rows(session, *args, **kwargs)
+            await session.commit()
+
+    async def test_native_upsert_one_statement_per_page(self):
+        self.assertTrue(has_unique_key(BilibiliVideo, ["video_id"]))
+        rows = [{"video_id": i, "video_url": f"u{i}", "title": f"t{i}", "liked_count": "1", "video_play_count": "1.5万",
+                 "unknown_field": "x"} for i in range(3)]
+        await self._upsert(BilibiliVideo, rows, ["video_id"])
+        self.assertEqual(len([s for s in self.statements if s.startswith("INSERT")]), 1)
+
+        await self._upsert(BilibiliVideo, [{"video_id": 1, "video_url": "u1", "title": "new", "liked_count": "9"}], ["video_id"])
+        self.assertIn("ON CONFLICT", self.statements[0])
+        async with self.session_factory() as session:
+            count = await session.scalar(select(func.count()).select_from(BilibiliVideo))
+            video = await session.scalar(select(BilibiliVideo).where(BilibiliVideo.video_id == 1))
+        self.assertEqual(count, 3)
+        self.assertEqual((video.title, video.liked_count), ("new", 9))
+        self.assertIsNotNone(video.add_ts)
+        self.assertEqual((video.video_play_count, video.video_play_count_num), ("1.5万", 15000))
+
+    async def test_rows_with_different_fields_keep_stored_values(self):
+        await self._upsert(BilibiliVideo, [{"video_id": i, "video_url": f"u{i}", "title": f"t{i}", "desc": f"d{i}"} for i in range(2)],
+                           ["video_id"])
+        # 同一批中只有部分行带 desc，缺少的字段不能被写成 NULL
+        await self._upsert(BilibiliVideo, [
+            {"video_id": 0, "video_url": "u0", "title": "new0"},
+            {"video_id": 1, "video_url": "u1", "title": "new1", "desc": "new desc"},
+        ], ["video_id"])
+        async with self.session_factory() as session:
+            videos = (await session.scalars(select(BilibiliVideo).order_by(BilibiliVideo.video_id))).all()
+        self.assertEqual([(v.title, v.desc) for v in videos], [("new0", "d0"), ("new1", "new desc")])
+
+    async def test_merge_without_unique_key(self):
+        key_columns = ["note_id", "comment_id"]
+        self.assertFalse(has_unique_key(XhsNoteComment, key_columns))
+        await self._upsert(XhsNoteComment, [{"note_id": "n", "comment_id": "1", "content": "a", "like_count": "1"}], key_columns)
+        rows = [
+            {"note_id": "n", "comment_id": "1", "content": "changed", "like_count": "5"},
+            {"note_id": "n", "comment_id": "2", "content": "b", "like_count": "0"},
+            {"note_id": "n", "comment_id": "2", "content": "b2", "like_count": "1"},
+        ]
+        await self._upsert(XhsNoteComment, rows, key_columns, update_columns=["like_count"])
+        async with self.session_factory() as session:
+            result = await session.execute(select(XhsNoteComment).order_by(XhsNoteComment.comment_id))
+            comments = [(c.comment_id, c.content, c.like_count) for c in result.scalars().all()]
+        self.assertEqual(comments, [("1", "a", "5"), ("2", "b2", "1")])
+        async with self.session_factory() as session:
+            like_counts = (await session.scalars(select(XhsNoteComment.like_count_num).order_by(XhsNoteComment.comment_id))).all()
+        # the integer counter follows its text column in update_columns
+        self.assertEqual(like_counts, [5, 1])
+
+    async def test_update_existing_rows_skips_missing(self):
+        await self._upsert(XhsNoteComment, [{"comment_id": "1", "content": "a"}], ["comment_id"])
+        self.assertIn("ON CONFLICT", self.statements[0])
+        async with self.session_factory() as session:
+            await update_existing_rows(session, XhsNoteComment,
+                                       [{"comment_id": "1", "content": "b"}, {"comment_id": "2", "content": "c"}],
+                                       ["comment_id"])
+            await session.commit()
+            result = await session.execute(select(XhsNoteComment))
+            comments = [(c.comment_id, c.content) for c in result.scalars().all()]
+        self.assertEqual(comments, [("1", "b")])
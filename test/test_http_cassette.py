@@ -0,0 +1,171 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest import IsolatedAsyncioTestCase, mock
+
+import httpx
+
+import config
+from tools import http_cassette
+from tools.http_cassette import (RECORD, REPLAY, Cassette, CassetteMissError, CassettePage, CassetteTransport,
+                                 request_key)
+from tools.http_client_pool import HttpClientPool
+
+
+class VideoStream(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        for _ in range(4):
+            yield b"v" * 1024
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/binary":
+        return httpx.Response(200, content=b"\xff\xd8\xff")
+    if request.url.path == "/video.mp4":
+        return httpx.Response(200, headers={"Content-Type": "video/mp4"}, stream=VideoStream())
+    return httpx.Response(
+        200,
+        headers={"Set-Cookie": "web_session=secret", "Content-Encoding": "gzip", "X-Page": request.url.params["page"]},
+        content=gzip.compress(f'{{"page": {request.url.params["page"]}}}'.encode()),
+    )
+
+
+class FakePage:
+    url = "about:blank"
+
+    def __init__(self):
+        self.visited = []
+
+    async def goto(self, url, **kwargs):
+        self.visited.append(url)
+
+    async def content(self):
+        return f"<html>{self.visited[-1]}</html>"
+
+    async def evaluate(self, expression, arg=None):
+        return {"b1": "fingerprint", "xmst": "token"}
+
+    async def wait_for_timeout(self, timeout):
+        return timeout
+
+
+class TestHttpCassette(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "cassettes", "xhs.jsonl")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_request_key_ignores_volatile_and_secret_fields(self):
+        key = request_key("get", "https://api.test/feed?page=1&w_rid=abc&wts=1700000000")
+        self.assertEqual(key, request_key("GET", "https://api.test/feed?wts=1800000000&page=1&w_rid=def"))
+        self.assertNotEqual(key, request_key("GET", "https://api.test/feed?page=2"))
+        self.assertEqual(
+            request_key("POST", "https://api.test/search", b'{"keyword": "a", "search_id": "1"}'),
+            request_key("POST", "https://api.test/search", b'{"search_id": "2", "keyword": "a"}'),
+        )
+
+    async def test_record_then_replay(self):
+        cassette = Cassette(self.path, RECORD)
+        pool = HttpClientPool(transport=CassetteTransport(cassette, httpx.MockTransport(handler)))
+        for page in (1, 2):
+            response = await pool.get().get(f"https://api.test/feed?page={page}&wts=1", headers={"Cookie": "a1=secret"})
+            self.assertEqual(response.json(), {"page": page})
+        self.assertEqual((await pool.get().get("https://api.test/binary")).content, b"\xff\xd8\xff")
+        await pool.aclose()
+        cassette.close()
+        with open(self.path, encoding="utf-8") as f:
+            self.assertNotIn("secret", f.read())
+
+        cassette = Cassette(self.path, REPLAY)
+        pool = HttpClientPool(transport=CassetteTransport(cassette, latency_ms=0))
+        response = await pool.get().get("https://api.test/feed?page=2&wts=2")
+        self.assertEqual((response.json(), response.headers["X-Page"]), ({"page": 2}, "2"))
+        self.assertNotIn("set-cookie", response.headers)
+        self.assertEqual((await pool.get().get("https://api.test/binary")).content, b"\xff\xd8\xff")
+        with self.assertRaises(CassetteMissError):
+            await pool.get().get("https://api.test/feed?page=3")
+        await pool.aclose()
+
+    async def test_media_body_streamed_to_file(self):
+        cassette = Cassette(self.path, RECORD)
+        pool = HttpClientPool(transport=CassetteTransport(cassette, httpx.MockTransport(handler)))
+        async with pool.get().stream("GET", "https://cdn.test/video.mp4") as response:
+            chunks = [chunk async for chunk in response.aiter_bytes()]
+        self.assertEqual(b"".join(chunks), b"v" * 4096)
+        await pool.aclose()
+        cassette.close()
+        # cassette 中只记录文件名，响应体不以 base64 写入
+        with open(self.path, encoding="utf-8") as f:
+            entry = json.loads(f.read())
+        self.assertNotIn("content", entry)
+        with open(os.path.join(cassette.body_dir, entry["body_file"]), "rb") as f:
+            self.assertEqual(f.read(), b"v" * 4096)
+
+        cassette = Cassette(self.path, REPLAY)
+        pool = HttpClientPool(transport=CassetteTransport(cassette, latency_ms=0))
+        async with pool.get().stream("GET", "https://cdn.test/video.mp4") as response:
+            self.assertEqual(response.headers["content-type"], "video/mp4")
+            self.assertEqual(b"".join([chunk async for chunk in response.aiter_bytes()]), b"v" * 4096)
+        os.remove(os.path.join(cassette.body_dir, entry["body_file"]))
+        with self.assertRaises(CassetteMissError):
+            await pool.get().get("https://cdn.test/video.mp4")
+        await pool.aclose()
+
+    async def test_page_record_then_replay(self):
+        cassette = Cassette(self.path, RECORD)
+        page = CassettePage(FakePage(), cassette)
+        await page.goto("https://tieba.test/p/1?pn=1")
+        self.assertEqual(await page.content(), "<html>https://tieba.test/p/1?pn=1</html>")
+        self.assertEqual(await page.evaluate("() => window.localStorage"), {"b1": "fingerprint", "xmst": "token"})
+        cassette.close()
+
+        fake_page = FakePage()
+        page = CassettePage(fake_page, Cassette(self.path, REPLAY))
+        await page.goto("https://tieba.test/p/1?pn=1")
+        self.assertEqual(fake_page.visited, [])
+        self.assertEqual(page.url, "https://tieba.test/p/1?pn=1")
+        self.assertEqual(await page.content(), "<html>https://tieba.test/p/1?pn=1</html>")
+        # localStorage 中的登录态不写入 cassette
+        self.assertEqual(await page.evaluate("() => window.localStorage"), {"b1": "fingerprint"})
+        # 没有录制的方法转发给原 Page
+        self.assertEqual(await page.wait_for_timeout(10), 10)
+
+    async def test_transport_from_config(self):
+        with mock.patch.multiple(config, CASSETTE_MODE=RECORD, CASSETTE_PATH=self.path.replace("xhs", "{platform}"), PLATFORM="xhs"):
+            try:
+                transport = http_cassette.create_cassette_transport("http://127.0.0.1:8080", httpx.Limits())
+                # 录制时经代理发出实际请求
+                self.assertIsInstance(transport._transport, httpx.AsyncHTTPTransport)
+                self.assertIsInstance(http_cassette.wrap_page(FakePage()), CassettePage)
+                await transport.aclose()
+            finally:
+                http_cassette.close_cassette()
+        self.assertTrue(os.path.exists(self.path))
+
+    async def test_disabled_by_default(self):
+        with mock.patch.object(config, "CASSETTE_MODE", ""):
+            page = FakePage()
+            self.assertIs(http_cassette.wrap_page(page), page)
+            self.assertIsNone(http_cassette.create_cassette_transport(None, httpx.Limits()))
+
+
+if __name__ == '__main__':
+    unittest.main()
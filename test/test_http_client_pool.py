@@ -0,0 +1,65 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import unittest
+from unittest import IsolatedAsyncioTestCase, mock
+
+import httpx
+
+import config
+from media_platform.tieba.client import BaiduTieBaClient
+from tools.http_client_pool import HttpClientPool, close_http_client_pools
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, headers={"Set-Cookie": "session=server"}, json={"cookie": request.headers.get("Cookie")})
+
+
+class TestHttpClientPool(IsolatedAsyncioTestCase):
+
+    async def test_one_client_per_proxy(self):
+        pool = HttpClientPool(transport=httpx.MockTransport(handler))
+        client = pool.get()
+        self.assertIs(pool.get(), client)
+        self.assertIsNot(pool.get("http://127.0.0.1:8080"), client)
+
+        await close_http_client_pools()
+        self.assertTrue(client.is_closed)
+        # 关闭后再次使用时重新创建
+        self.assertFalse(pool.get().is_closed)
+        await pool.aclose()
+
+    async def test_response_cookies_not_kept(self):
+        pool = HttpClientPool(transport=httpx.MockTransport(handler))
+        await pool.get().get("https://api.test/a")
+        response = await pool.get().get("https://api.test/b", headers={"Cookie": "a1=client"})
+        self.assertEqual(response.json(), {"cookie": "a1=client"})
+        await pool.aclose()
+
+    @mock.patch.object(config, "ENABLE_RATE_LIMIT", False)
+    async def test_tieba_client_requests(self):
+        def tieba_handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/f":
+                return httpx.Response(302, headers={"Location": "/f/search/res"})
+            return httpx.Response(200, text=f"{request.method} {request.url.path} {request.headers['User-Agent']} {request.content.decode()}")
+
+        client = BaiduTieBaClient(headers={"User-Agent": "test-agent", "Cookie": ""})
+        client._http_client_pool = HttpClientPool(transport=httpx.MockTransport(tieba_handler))
+        # 和 requests 一样跟随重定向，带上客户端的请求头
+        self.assertEqual(await client.get("/f", return_ori_content=True), "GET /f/search/res test-agent ")
+        self.assertEqual(await client.request("POST", "https://tieba.baidu.com/p", return_response=True, headers=client.headers, content="{}"), "POST /p test-agent {}")
+        await client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
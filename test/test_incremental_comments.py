@@ -0,0 +1,50 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+from unittest import IsolatedAsyncioTestCase, mock
+
+from media_platform.bilibili.client import BilibiliClient
+from media_platform.bilibili.field import CommentOrderType
+
+
+class TestIncrementalComments(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.client = BilibiliClient(headers={}, playwright_page=None, cookie_dict={})
+        # 按时间倒序的三页评论，每页两条
+        self.pages = {
+            0: {"cursor": {"is_end": False, "next": 1}, "replies": [{"rpid": 6, "ctime": 600}, {"rpid": 5, "ctime": 500}]},
+            1: {"cursor": {"is_end": False, "next": 2}, "replies": [{"rpid": 4, "ctime": 400}, {"rpid": 3, "ctime": 300}]},
+            2: {"cursor": {"is_end": True, "next": 3}, "replies": [{"rpid": 2, "ctime": 200}, {"rpid": 1, "ctime": 100}]},
+        }
+        self.requests = []
+
+        async def get_video_comments(video_id, order_mode, next_page):
+            self.requests.append((order_mode, next_page))
+            return self.pages[next_page]
+
+        self.patcher = mock.patch.object(self.client, "get_video_comments", side_effect=get_video_comments)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    async def test_stop_at_stored_comments(self):
+        comments = await self.client.get_video_all_comments("1", crawl_interval=0, max_count=100, latest_comment_time=400)
+        self.assertEqual([comment["rpid"] for comment in comments], [6, 5])
+        self.assertEqual(self.requests, [(CommentOrderType.TIME, 0), (CommentOrderType.TIME, 1)])
+
+    async def test_full_crawl_without_high_water_mark(self):
+        comments = await self.client.get_video_all_comments("1", crawl_interval=0, max_count=100)
+        self.assertEqual(len(comments), 6)
+        self.assertEqual([order_mode for order_mode, _ in self.requests], [CommentOrderType.DEFAULT] * 3)
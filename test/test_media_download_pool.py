@@ -0,0 +1,135 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import tempfile
+import unittest
+from collections import Counter
+from unittest import IsolatedAsyncioTestCase, mock
+
+import httpx
+
+import config
+from tools.media_download_pool import drain_media_download_pool, get_media_download_pool, submit_media_download
+from tools.media_downloader import download_to_file
+
+
+class TestMediaDownloadPool(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.patcher = mock.patch.multiple(
+            config,
+            ENABLE_MEDIA_DOWNLOAD_POOL=True,
+            MEDIA_DOWNLOAD_CONCURRENCY=6,
+            MEDIA_DOWNLOAD_PER_HOST=2,
+            MEDIA_DOWNLOAD_QUEUE_SIZE=3,
+            MEDIA_DOWNLOAD_STATS_INTERVAL=0,
+        )
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    async def test_per_host_limit_and_drain(self):
+        running = Counter()
+        max_running = Counter()
+        finished = []
+
+        def make_job(host: str, index: int):
+            async def job():
+                running[host] += 1
+                max_running[host] = max(max_running[host], running[host])
+                await asyncio.sleep(0.01)
+                running[host] -= 1
+                finished.append((host, index))
+                return index != 0
+            return job
+
+        for index in range(5):
+            for host in ("a.cdn.test", "b.cdn.test"):
+                await submit_media_download(f"https://{host}/{index}.jpg", make_job(host, index))
+        pool = get_media_download_pool()
+        # 提交后立即返回，不等下载完成
+        self.assertLess(len(finished), 10)
+
+        await drain_media_download_pool()
+        self.assertEqual(len(finished), 10)
+        self.assertEqual(max_running, Counter({"a.cdn.test": 2, "b.cdn.test": 2}))
+        self.assertEqual((pool.done_count, pool.failed_count), (8, 2))
+        self.assertEqual(pool.qsize(), 0)
+
+    async def test_busy_host_does_not_block_other_hosts(self):
+        started = []
+
+        def make_job(name: str):
+            async def job():
+                started.append(name)
+                await asyncio.sleep(0.05)
+                return True
+            return job
+
+        with mock.patch.multiple(config, MEDIA_DOWNLOAD_CONCURRENCY=4, MEDIA_DOWNLOAD_PER_HOST=1, MEDIA_DOWNLOAD_QUEUE_SIZE=10):
+            for index in range(4):
+                await submit_media_download(f"https://a.cdn.test/{index}.jpg", make_job(f"a{index}"))
+            await submit_media_download("https://b.cdn.test/0.jpg", make_job("b0"))
+            await asyncio.sleep(0.01)
+            # a 域名下载满时 b 域名的任务不用等 a 的下载完成
+            self.assertEqual(started, ["a0", "b0"])
+            await drain_media_download_pool()
+        self.assertEqual(sorted(started), ["a0", "a1", "a2", "a3", "b0"])
+
+    async def test_segments_count_against_host_limit(self):
+        data = bytes(range(256)) * 64
+        running = Counter()
+        max_running = Counter()
+
+        async def server(request: httpx.Request) -> httpx.Response:
+            running["requests"] += 1
+            max_running["requests"] = max(max_running["requests"], running["requests"])
+            await asyncio.sleep(0.01)
+            running["requests"] -= 1
+            first, _, last = request.headers["Range"].removeprefix("bytes=").partition("-")
+            start, end = int(first), int(last)
+            headers = {"Content-Range": f"bytes {start}-{end}/{len(data)}", "ETag": '"v1"'}
+            return httpx.Response(206, headers=headers, content=data[start:end + 1])
+
+        with tempfile.TemporaryDirectory() as temp_dir, mock.patch.object(config, "MEDIA_DOWNLOAD_SEGMENT_MIN_SIZE", 1024):
+            async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+                for index in range(2):
+                    save_path = os.path.join(temp_dir, f"{index}.mp4")
+                    await submit_media_download(
+                        "https://a.cdn.test/video.mp4",
+                        lambda save_path=save_path: download_to_file(client, "https://a.cdn.test/video.mp4", save_path, segments=4),
+                    )
+                await drain_media_download_pool()
+            for index in range(2):
+                with open(os.path.join(temp_dir, f"{index}.mp4"), "rb") as f:
+                    self.assertEqual(f.read(), data)
+        # 两个分段下载加起来也不超过域名并发上限
+        self.assertEqual(max_running["requests"], config.MEDIA_DOWNLOAD_PER_HOST)
+
+    async def test_download_inline_when_disabled(self):
+        finished = []
+
+        async def job():
+            finished.append(1)
+            return True
+
+        with mock.patch.object(config, "ENABLE_MEDIA_DOWNLOAD_POOL", False):
+            await submit_media_download("https://a.cdn.test/0.jpg", job)
+        self.assertEqual(finished, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
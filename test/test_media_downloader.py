@@ -0,0 +1,235 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase, mock
+
+import httpx
+
+import config
+from store.xhs import XiaoHongShuImage
+from tools.media_blob_store import MediaBlobStore
+from tools.media_downloader import PART_SUFFIX, download_to_file
+
+MEDIA = bytes(range(256)) * 1000
+
+
+class BrokenStream(httpx.AsyncByteStream):
+    """发送一部分数据后连接断开"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def __aiter__(self):
+        yield self.data
+        raise httpx.ReadError("connection reset")
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/missing.jpg":
+        return httpx.Response(404)
+    return httpx.Response(200, content=MEDIA)
+
+
+class RangeHandler:
+    """支持 Range / If-Range 的服务端，前 broken_count 个响应只发送一半数据就断开"""
+
+    def __init__(self, broken_count: int = 0, data: bytes = MEDIA, etag: str = '"v1"', honor_if_range: bool = True):
+        self.broken_count = broken_count
+        self.data = data
+        self.etag = etag
+        self.honor_if_range = honor_if_range
+        self.ranges = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        range_header = request.headers.get("Range")
+        self.ranges.append(range_header)
+        if_range = request.headers.get("If-Range")
+        if range_header is None or (self.honor_if_range and if_range and if_range != self.etag):
+            start, end, status = 0, len(self.data) - 1, 200
+        else:
+            first, _, last = range_header.removeprefix("bytes=").partition("-")
+            start, end, status = int(first), int(last) if last else len(self.data) - 1, 206
+        body = self.data[start:end + 1]
+        headers = {"Content-Length": str(len(body)), "ETag": self.etag}
+        if status == 206:
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(self.data)}"
+        if self.broken_count and len(body) > 1:
+            self.broken_count -= 1
+            return httpx.Response(status, headers=headers, stream=BrokenStream(body[:len(body) // 2]))
+        return httpx.Response(status, headers=headers, content=body)
+
+
+class TestMediaDownloader(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        self.temp_dir.cleanup()
+
+    async def test_download_in_chunks(self):
+        save_path = os.path.join(self.temp_dir.name, "0.jpg")
+        self.assertTrue(await download_to_file(self.client, "https://cdn.test/0.jpg", save_path, chunk_size=4096))
+        with open(save_path, "rb") as f:
+            self.assertEqual(f.read(), MEDIA)
+        self.assertFalse(os.path.exists(save_path + PART_SUFFIX))
+
+    async def test_failed_download_leaves_no_file(self):
+        save_path = os.path.join(self.temp_dir.name, "missing.jpg")
+        self.assertFalse(await download_to_file(self.client, "https://cdn.test/missing.jpg", save_path))
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    async def test_resume_after_connection_reset(self):
+        server = RangeHandler(broken_count=2)
+        save_path = os.path.join(self.temp_dir.name, "video.mp4")
+        async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+            self.assertTrue(await download_to_file(client, "https://cdn.test/video.mp4", save_path, retries=2))
+        with open(save_path, "rb") as f:
+            self.assertEqual(f.read(), MEDIA)
+        # 每次重试从已下载的位置继续
+        self.assertEqual(server.ranges, [None, f"bytes={len(MEDIA) // 2}-", f"bytes={len(MEDIA) * 3 // 4}-"])
+
+    async def test_keep_part_file_until_next_run(self):
+        server = RangeHandler(broken_count=1)
+        save_path = os.path.join(self.temp_dir.name, "video.mp4")
+        async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+            self.assertFalse(await download_to_file(client, "https://cdn.test/video.mp4", save_path, retries=0))
+            self.assertEqual(os.path.getsize(save_path + PART_SUFFIX), len(MEDIA) // 2)
+            self.assertTrue(await download_to_file(client, "https://cdn.test/video.mp4", save_path, retries=0))
+        self.assertEqual(os.path.getsize(save_path), len(MEDIA))
+        self.assertEqual(server.ranges[-1], f"bytes={len(MEDIA) // 2}-")
+
+    async def test_restart_when_file_changed_between_runs(self):
+        new_media = MEDIA[::-1]
+        for honor_if_range in (True, False):
+            with self.subTest(honor_if_range=honor_if_range):
+                server = RangeHandler(broken_count=1, honor_if_range=honor_if_range)
+                save_path = os.path.join(self.temp_dir.name, f"video_{honor_if_range}.mp4")
+                async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+                    self.assertFalse(await download_to_file(client, "https://cdn.test/video.mp4", save_path, retries=0))
+                    # 两次运行之间服务端的文件变了
+                    server.data, server.etag = new_media, '"v2"'
+                    self.assertTrue(await download_to_file(client, "https://cdn.test/video.mp4", save_path, retries=1))
+                with open(save_path, "rb") as f:
+                    self.assertEqual(f.read(), new_media)
+                self.assertEqual(os.listdir(self.temp_dir.name).count(os.path.basename(save_path)), 1)
+        self.assertEqual(len(os.listdir(self.temp_dir.name)), 2)
+
+    async def test_segmented_download(self):
+        server = RangeHandler(broken_count=1)
+        save_path = os.path.join(self.temp_dir.name, "video.mp4")
+        with mock.patch.object(config, "MEDIA_DOWNLOAD_SEGMENT_MIN_SIZE", 1024):
+            async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+                self.assertTrue(await download_to_file(client, "https://cdn.test/video.mp4", save_path, segments=4))
+        with open(save_path, "rb") as f:
+            self.assertEqual(f.read(), MEDIA)
+        self.assertEqual(os.listdir(self.temp_dir.name), ["video.mp4"])
+        # 探测请求 + 4 段 + 1 次断点续传
+        self.assertEqual(len(server.ranges), 6)
+
+    async def test_failed_segment_cancels_other_segments(self):
+        class SlowStream(httpx.AsyncByteStream):
+            def __init__(self, data: bytes):
+                self.data = data
+
+            async def __aiter__(self):
+                for i in range(0, len(self.data), 1024):
+                    await asyncio.sleep(0.01)
+                    yield self.data[i:i + 1024]
+
+        async def server(request: httpx.Request) -> httpx.Response:
+            first, _, last = request.headers["Range"].removeprefix("bytes=").partition("-")
+            start, end = int(first), int(last)
+            if start == 0 and end > 0:
+                raise httpx.ConnectError("connection refused", request=request)
+            headers = {"Content-Range": f"bytes {start}-{end}/{len(MEDIA)}", "Content-Length": str(end - start + 1)}
+            return httpx.Response(206, headers=headers, stream=SlowStream(MEDIA[start:end + 1]))
+
+        def part_sizes():
+            return {name: os.path.getsize(os.path.join(self.temp_dir.name, name)) for name in os.listdir(self.temp_dir.name)}
+
+        save_path = os.path.join(self.temp_dir.name, "video.mp4")
+        with mock.patch.object(config, "MEDIA_DOWNLOAD_SEGMENT_MIN_SIZE", 1024):
+            async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+                self.assertFalse(await download_to_file(client, "https://cdn.test/video.mp4", save_path, segments=4, retries=0, chunk_size=1024))
+                await asyncio.sleep(0.3)
+                # 返回后其他段不再继续写入，分段文件全部删除
+                self.assertEqual(part_sizes(), {})
+
+    async def test_segment_http_error_removes_segments(self):
+        range_handler = RangeHandler()
+
+        def server(request: httpx.Request) -> httpx.Response:
+            if request.headers["Range"].startswith(f"bytes={len(MEDIA) // 2}"):
+                return httpx.Response(500)
+            return range_handler(request)
+
+        save_path = os.path.join(self.temp_dir.name, "video.mp4")
+        with mock.patch.object(config, "MEDIA_DOWNLOAD_SEGMENT_MIN_SIZE", 1024):
+            async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+                self.assertFalse(await download_to_file(client, "https://cdn.test/video.mp4", save_path, segments=4))
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    async def test_remove_stale_segments(self):
+        save_path = os.path.join(self.temp_dir.name, "video.mp4")
+        # 上次按其他段数 / 文件大小下载留下的分段
+        for suffix in (".0", ".0-99", ".100-199"):
+            with open(save_path + PART_SUFFIX + suffix, "wb") as f:
+                f.write(b"x" * 10)
+        with mock.patch.object(config, "MEDIA_DOWNLOAD_SEGMENT_MIN_SIZE", 1024):
+            async with httpx.AsyncClient(transport=httpx.MockTransport(RangeHandler())) as client:
+                self.assertTrue(await download_to_file(client, "https://cdn.test/video.mp4", save_path, segments=4))
+        with open(save_path, "rb") as f:
+            self.assertEqual(f.read(), MEDIA)
+        self.assertEqual(os.listdir(self.temp_dir.name), ["video.mp4"])
+
+    async def test_store_download_image(self):
+        store = XiaoHongShuImage()
+        store.image_store_path = self.temp_dir.name
+
+        async def download(url, save_path):
+            return await download_to_file(self.client, url, save_path)
+
+        with mock.patch("base.base_crawler.get_media_manifest", return_value=None):
+            self.assertTrue(await store.download_image("note", "https://cdn.test/0.jpg", "0.jpg", download))
+        self.assertEqual(os.path.getsize(os.path.join(self.temp_dir.name, "note", "0.jpg")), len(MEDIA))
+
+    async def test_blob_store_dedupe(self):
+        blob_store = MediaBlobStore(os.path.join(self.temp_dir.name, "media"))
+        requests = []
+
+        async def download(url, save_path):
+            requests.append(url)
+            return await download_to_file(self.client, url, save_path)
+
+        note_a = os.path.join(self.temp_dir.name, "a.jpg")
+        note_b = os.path.join(self.temp_dir.name, "b.jpg")
+        note_c = os.path.join(self.temp_dir.name, "c.jpg")
+        self.assertTrue(await blob_store.fetch("https://cdn.test/0.jpg", note_a, download))
+        # 已下载过的 url 不再请求
+        self.assertTrue(await blob_store.fetch("https://cdn.test/0.jpg", note_b, download))
+        # 不同 url 相同内容只保存一份
+        self.assertTrue(await blob_store.fetch("https://cdn2.test/0.jpg", note_c, download))
+        self.assertFalse(await blob_store.fetch("https://cdn.test/missing.jpg", note_c + ".x", download))
+
+        self.assertEqual(requests, ["https://cdn.test/0.jpg", "https://cdn2.test/0.jpg", "https://cdn.test/missing.jpg"])
+        blob_path = blob_store.get_blob("https://cdn.test/0.jpg")
+        self.assertEqual(blob_store.get_blob("https://cdn2.test/0.jpg"), blob_path)
+        self.assertTrue(all(os.path.samefile(path, blob_path) for path in (note_a, note_b, note_c)))
+        self.assertEqual(os.listdir(os.path.join(blob_store.blob_dir, "tmp")), [])
+        blob_store.close()
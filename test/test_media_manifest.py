@@ -0,0 +1,91 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest import IsolatedAsyncioTestCase, mock
+
+import config
+from store.xhs import XiaoHongShuImage, XiaoHongShuVideo
+from tools.media_manifest import STATUS_DONE, STATUS_FAILED, MediaManifest
+
+MEDIA = b"media" * 1000
+
+
+class TestMediaManifest(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.manifest = MediaManifest(os.path.join(self.temp_dir.name, "media"))
+        self.patchers = [
+            mock.patch("base.base_crawler.get_media_manifest", return_value=self.manifest),
+            mock.patch("base.base_crawler.get_media_blob_store", return_value=None),
+            mock.patch.multiple(config, PLATFORM="xhs", MEDIA_SKIP_DOWNLOADED=True),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.image_store = XiaoHongShuImage()
+        self.image_store.image_store_path = os.path.join(self.temp_dir.name, "images")
+        self.video_store = XiaoHongShuVideo()
+        self.video_store.video_store_path = os.path.join(self.temp_dir.name, "videos")
+        self.requests = []
+
+    async def asyncTearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.manifest.close()
+        self.temp_dir.cleanup()
+
+    async def download(self, url, save_path):
+        self.requests.append(url)
+        if url.endswith("missing.jpg"):
+            return False
+        with open(save_path, "wb") as f:
+            f.write(MEDIA)
+        return True
+
+    async def test_record_downloads(self):
+        self.assertTrue(await self.image_store.download_image("note", "https://cdn.test/0.jpg", "0.jpg", self.download))
+        self.assertFalse(await self.image_store.download_image("note", "https://cdn.test/missing.jpg", "1.jpg", self.download))
+        self.assertTrue(await self.video_store.download_video("note", "https://cdn.test/0.mp4", "0.mp4", self.download))
+
+        usage = {(row["media_type"], row["status"]): (row["files"], row["bytes"]) for row in self.manifest.get_usage()}
+        self.assertEqual(usage, {("image", STATUS_DONE): (1, len(MEDIA)), ("image", STATUS_FAILED): (1, 0), ("video", STATUS_DONE): (1, len(MEDIA))})
+        missing = self.manifest.get_missing("xhs")
+        self.assertEqual([(row["content_id"], row["url"], row["attempts"]) for row in missing], [("note", "https://cdn.test/missing.jpg", 1)])
+
+        save_path = self.image_store.make_save_file_name("note", "0.jpg")
+        row = self.manifest._conn.execute("SELECT sha256, size FROM media_manifest WHERE path = ?", (save_path,)).fetchone()
+        self.assertEqual(row, (hashlib.sha256(MEDIA).hexdigest(), len(MEDIA)))
+
+    async def test_only_retry_missing(self):
+        await self.image_store.download_image("note", "https://cdn.test/0.jpg", "0.jpg", self.download)
+        await self.image_store.download_image("note", "https://cdn.test/missing.jpg", "1.jpg", self.download)
+        self.requests.clear()
+
+        # 再次运行时已下载的文件不再请求
+        await self.image_store.download_image("note", "https://cdn.test/0.jpg", "0.jpg", self.download)
+        await self.image_store.download_image("note", "https://cdn.test/missing.jpg", "1.jpg", self.download)
+        self.assertEqual(self.requests, ["https://cdn.test/missing.jpg"])
+        self.assertEqual(self.manifest.get_missing()[0]["attempts"], 2)
+
+        # 文件被删除后重新下载
+        os.remove(self.image_store.make_save_file_name("note", "0.jpg"))
+        await self.image_store.download_image("note", "https://cdn.test/0.jpg", "0.jpg", self.download)
+        self.assertEqual(self.requests[-1], "https://cdn.test/0.jpg")
+
+
+if __name__ == '__main__':
+    unittest.main()
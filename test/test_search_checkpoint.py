@@ -0,0 +1,78 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import config
+from tools.search_checkpoint import SearchCheckpoint
+
+
+class TestSearchCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        self.patcher = mock.patch.multiple(config, ENABLE_SEARCH_CHECKPOINT=True, RESUME_SEARCH=True)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def _crawl(self, checkpoint: SearchCheckpoint, stop_at=None):
+        """模拟搜索循环：每个关键词爬 3 页，在 stop_at=(关键词, 页码) 处中断"""
+        requests = []
+        for keyword in checkpoint.iter_keywords():
+            page = checkpoint.get(keyword, "page", 1)
+            search_id = checkpoint.get(keyword, "search_id") or f"id-{keyword}"
+            while page <= 3:
+                if (keyword, page) == stop_at:
+                    return requests
+                requests.append((keyword, page, search_id))
+                page += 1
+                checkpoint.save(keyword, page=page, search_id=search_id)
+        return requests
+
+    def test_resume_where_it_stopped(self):
+        keywords = ["a", "b", "c"]
+        first = self._crawl(SearchCheckpoint("xhs", keywords), stop_at=("b", 2))
+        self.assertEqual(first, [("a", 1, "id-a"), ("a", 2, "id-a"), ("a", 3, "id-a"), ("b", 1, "id-b")])
+
+        resumed = self._crawl(SearchCheckpoint("xhs", keywords))
+        # 已经请求过的页不再请求，搜索 id 沿用中断前的
+        self.assertEqual(resumed[:2], [("b", 2, "id-b"), ("b", 3, "id-b")])
+        self.assertEqual(len(first) + len(resumed), 9)
+        self.assertFalse(os.path.exists(SearchCheckpoint("xhs", keywords).path))
+
+    def test_resume_after_keyword_finished(self):
+        keywords = ["a", "b"]
+        self._crawl(SearchCheckpoint("xhs", keywords), stop_at=("b", 1))
+        resumed = self._crawl(SearchCheckpoint("xhs", keywords))
+        self.assertEqual(resumed[0], ("b", 1, "id-b"))
+        self.assertEqual(len(resumed), 3)
+
+    def test_ignore_checkpoint_of_other_keywords(self):
+        self._crawl(SearchCheckpoint("xhs", ["a", "b"]), stop_at=("b", 2))
+        self.assertEqual(SearchCheckpoint("xhs", ["a", "c"]).state, {})
+        self.assertEqual(SearchCheckpoint("xhs", ["a", "b"], scope="video").state, {})
+        with mock.patch.object(config, "RESUME_SEARCH", False):
+            self.assertEqual(SearchCheckpoint("xhs", ["a", "b"]).state, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from cache.cache_factory import CacheFactory
+from cache.seen_index import SeenIndex
+
+
+class TestSeenIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "cache.db")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_sqlite_cache_persists_across_instances(self):
+        cache = CacheFactory.create_cache("sqlite", self.db_path)
+        cache.set("seen:xhs:1", 1, 10)
+        cache.set("seen:dy:1", [1, 2], 10)
+        cache.set("expired", "x", -1)
+        cache.close()
+
+        cache = CacheFactory.create_cache("sqlite", self.db_path)
+        self.assertEqual(cache.get("seen:dy:1"), [1, 2])
+        self.assertIsNone(cache.get("expired"))
+        self.assertEqual(cache.keys("seen:xhs:*"), ["seen:xhs:1"])
+        cache.close()
+
+    def test_filter_unseen_and_recrawl_age(self):
+        cache = CacheFactory.create_cache("sqlite", self.db_path)
+        seen_index = SeenIndex(cache, recrawl_age=60)
+        seen_index.mark_seen("xhs", "a")
+        items = [{"id": "a"}, {"id": "b"}, {}]
+        self.assertEqual(seen_index.filter_unseen("xhs", items, lambda item: item.get("id")), [{"id": "b"}, {}])
+        # 同一个 id 在其他平台不算已爬取
+        self.assertFalse(seen_index.is_seen("dy", "a"))
+
+        with mock.patch("cache.seen_index.time.time", return_value=time.time() + 61):
+            self.assertFalse(seen_index.is_seen("xhs", "a"))
+
+        never_recrawl = SeenIndex(cache, recrawl_age=0)
+        never_recrawl.mark_seen("xhs", "a")
+        with mock.patch("cache.seen_index.time.time", return_value=time.time() + 3600):
+            self.assertTrue(never_recrawl.is_seen("xhs", "a"))
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
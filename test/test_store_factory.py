@@ -0,0 +1,69 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import config
+from store.bilibili import BiliStoreFactory
+from store.douyin import DouyinStoreFactory
+from store.hot_topics import HotTopicsStoreFactory
+from store.kuaishou import KuaishouStoreFactory
+from store.tieba import TieBaStoreFactory
+from store.weibo import WeibostoreFactory
+from store.xhs import XhsStoreFactory
+from store.zhihu import ZhihuStoreFactory
+from var import crawler_type_var
+
+STORE_FACTORIES = [
+    XhsStoreFactory, DouyinStoreFactory, KuaishouStoreFactory, BiliStoreFactory,
+    WeibostoreFactory, TieBaStoreFactory, ZhihuStoreFactory, HotTopicsStoreFactory,
+]
+
+
+class TestStoreFactory(unittest.TestCase):
+
+    def setUp(self):
+        self.origin_save_data_option = config.SAVE_DATA_OPTION
+        self.crawler_type_token = crawler_type_var.set("search")
+
+    def tearDown(self):
+        config.SAVE_DATA_OPTION = self.origin_save_data_option
+        crawler_type_var.reset(self.crawler_type_token)
+
+    def test_store_instance_reused_per_save_option(self):
+        for factory in STORE_FACTORIES:
+            for save_option in factory.STORES:
+                config.SAVE_DATA_OPTION = save_option
+                store = factory.create_store()
+                self.assertIsInstance(store, factory.STORES[save_option])
+                self.assertIs(store, factory.create_store())
+
+    def test_store_instance_per_crawler_type(self):
+        config.SAVE_DATA_OPTION = "json"
+        search_store = XhsStoreFactory.create_store()
+        token = crawler_type_var.set("detail")
+        try:
+            self.assertIsNot(search_store, XhsStoreFactory.create_store())
+        finally:
+            crawler_type_var.reset(token)
+        self.assertIs(search_store, XhsStoreFactory.create_store())
+
+    def test_invalid_save_option(self):
+        config.SAVE_DATA_OPTION = "unknown"
+        for factory in STORE_FACTORIES:
+            with self.assertRaises(ValueError):
+                factory.create_store()
+
+
+if __name__ == '__main__':
+    unittest.main()
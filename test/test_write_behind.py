@@ -0,0 +1,116 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase, mock
+
+import config
+from cache import seen_index
+from cache.cache_factory import CacheFactory
+from cache.seen_index import SeenIndex, mark_seen
+from store.write_behind import drain_store_queue, flush_store_queue, get_store_queue, write_behind
+from var import source_keyword_var
+
+stored = []
+
+
+@write_behind
+async def slow_store(item):
+    await asyncio.sleep(0.01)
+    if item == "bad":
+        raise ValueError("bad item")
+    stored.append((item, source_keyword_var.get()))
+
+
+@write_behind
+async def batch_store(items):
+    for item in items:
+        await slow_store(item)
+
+
+class TestWriteBehind(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.origin_config = (config.SAVE_DATA_OPTION, config.ENABLE_STORE_QUEUE, config.STORE_QUEUE_MAX_SIZE)
+        config.SAVE_DATA_OPTION = "json"
+        config.ENABLE_STORE_QUEUE = True
+        config.STORE_QUEUE_MAX_SIZE = 2
+        stored.clear()
+
+    def tearDown(self):
+        config.SAVE_DATA_OPTION, config.ENABLE_STORE_QUEUE, config.STORE_QUEUE_MAX_SIZE = self.origin_config
+
+    async def test_calls_return_before_storage_and_drain_writes_all(self):
+        source_keyword_var.set("keyword")
+        await slow_store("a")
+        self.assertEqual(stored, [])
+
+        for item in ["b", "bad", "c", "d"]:
+            await slow_store(item)
+            # bounded queue: producers wait instead of piling up items
+            self.assertLessEqual(get_store_queue().qsize(), config.STORE_QUEUE_MAX_SIZE)
+        await batch_store(["e", "f"])
+        await drain_store_queue()
+
+        self.assertCountEqual(stored, [(item, "keyword") for item in "abcdef"])
+
+    async def test_callback_runs_after_earlier_calls_are_stored(self):
+        snapshots = []
+        await slow_store("a")
+        await batch_store(["b", "c"])
+        get_store_queue().call_when_stored(lambda: snapshots.append(sorted(item for item, _ in stored)))
+        self.assertEqual(snapshots, [])
+        await slow_store("d")
+        await drain_store_queue()
+        self.assertEqual(snapshots[0][:3], ["a", "b", "c"])
+
+        # 没有未完成的调用时立即执行
+        get_store_queue().call_when_stored(lambda: snapshots.append("now"))
+        self.assertEqual(snapshots[-1], "now")
+        await drain_store_queue()
+
+    async def test_failed_store_is_not_marked_seen(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = CacheFactory.create_cache("sqlite", os.path.join(temp_dir, "cache.db"))
+            index = SeenIndex(cache, recrawl_age=0)
+            with mock.patch.object(config, "ENABLE_SEEN_INDEX", True), mock.patch.object(seen_index, "_seen_index", index):
+                await slow_store("a")
+                mark_seen("xhs", ["a"])
+                await batch_store(["b", "bad"])
+                mark_seen("xhs", ["b"])
+                await drain_store_queue()
+                self.assertTrue(index.is_seen("xhs", "a"))
+                # 之前入队的调用写入失败，内容下次运行重新爬取
+                self.assertFalse(index.is_seen("xhs", "b"))
+                await slow_store("c")
+                mark_seen("xhs", ["c"])
+                await drain_store_queue()
+                self.assertTrue(index.is_seen("xhs", "c"))
+            cache.close()
+
+    async def test_flush_waits_for_queued_calls(self):
+        await flush_store_queue()
+        for item in ["a", "bad", "b"]:
+            await slow_store(item)
+        await flush_store_queue()
+        # 写入失败的调用也算处理完，不会一直等待
+        self.assertCountEqual(stored, [("a", ""), ("b", "")])
+        self.assertEqual(get_store_queue().qsize(), 0)
+        await drain_store_queue()
+
+    async def test_disabled_queue_stores_inline(self):
+        config.ENABLE_STORE_QUEUE = False
+        await slow_store("a")
+        self.assertEqual(stored, [("a", "")])
@@ -1,40 +1,233 @@
 import asyncio
 import csv
+import io
 import json
 import os
 import pathlib
-from typing import Dict, List
+import re
+import textwrap
+import time
+from typing import Any, Dict, List, Optional, Set
 import aiofiles
 import config
+from tools.output_file import RotatingOutputFile, get_output_files, open_output_file
 from tools.utils import utils
+from tools.crawler_util import parse_interact_info_count
 from tools.words import AsyncWordCloudGenerator
 
-class AsyncFileWriter:
-    def __init__(self, platform: str, crawler_type: str):
+# 按文件路径共享的写锁，保证不同 writer 实例写同一个文件时也是串行的
+_file_locks: Dict[str, asyncio.Lock] = {}
+# 本次运行中写过的 jsonl 文件，运行结束时用于合并为 json 数组文件
+_written_jsonl_files: Set[str] = set()
+# 按文件路径缓存的 jsonl 输出文件，每个文件只打开一次
+_jsonl_outputs: Dict[str, RotatingOutputFile] = {}
+# 已经创建过的数据目录，避免每写一条数据都去创建目录
+_created_dirs: Set[str] = set()
+# 按文件路径缓存的 csv 写入器，每个文件只打开一次
+_csv_sinks: Dict[str, "CsvFileSink"] = {}
+# 按文件路径缓存的 parquet 写入器，每个文件只打开一次
+_parquet_sinks: Dict[str, "ParquetFileSink"] = {}
+
+# 计数、时间戳类字段在 parquet 中写成 int64 列
+_PARQUET_INT_FIELD_PATTERN = re.compile(r"(_count|_ts|_time|^time|fans|follows|interaction|liked|comments?|forwards|danmaku)$")
+
+
+def _get_file_lock(file_path: str) -> asyncio.Lock:
+    lock = _file_locks.get(file_path)
+    if lock is None:
+        lock = asyncio.Lock()
+        _file_locks[file_path] = lock
+    return lock
+
+
+class CsvFileSink:
+    """
+    Keeps one open output file per csv file and buffers rows, the buffer is written when it reaches
+    CSV_FLUSH_ROW_COUNT rows, when CSV_FLUSH_INTERVAL_SEC has passed since the last write, or on shutdown
+    """
+
+    def __init__(self, file_path: str, fieldnames: List[str]):
+        self.file_path = file_path
+        self.fieldnames = list(fieldnames)
+        self.lock = asyncio.Lock()
+        self.rows: List[Dict] = []
+        self.last_flush_time = time.monotonic()
+        self.output = RotatingOutputFile(file_path)
+        # every new file or segment starts with the BOM (for Excel) and the header
+        header = io.StringIO()
+        csv.DictWriter(header, fieldnames=self.fieldnames).writeheader()
+        self._header = "\ufeff" + header.getvalue()
+        self._unknown_fields_warned = False
+
+    def _write_rows(self, rows: List[Dict]):
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, fieldnames=self.fieldnames, restval='', extrasaction='ignore').writerows(rows)
+        self.output.write(buffer.getvalue(), len(rows), header=self._header)
+
+    async def write(self, item: Dict):
+        if not self._unknown_fields_warned and not item.keys() <= set(self.fieldnames):
+            self._unknown_fields_warned = True
+            utils.logger.warning(f"[CsvFileSink.write] fields {sorted(item.keys() - set(self.fieldnames))} are not in the csv schema of {self.file_path}, they will be dropped")
+        async with self.lock:
+            self.rows.append(item)
+            if len(self.rows) >= config.CSV_FLUSH_ROW_COUNT or \
+                    time.monotonic() - self.last_flush_time >= config.CSV_FLUSH_INTERVAL_SEC:
+                await self._flush()
+
+    async def _flush(self):
+        if not self.rows:
+            return
+        rows, self.rows = self.rows, []
+        await asyncio.to_thread(self._write_rows, rows)
+        self.last_flush_time = time.monotonic()
+
+    async def flush(self):
+        async with self.lock:
+            await self._flush()
+
+    def close(self):
+        """
+        Write the remaining rows and close the file, safe to call without a running event loop
+        """
+        if self.rows:
+            rows, self.rows = self.rows, []
+            self._write_rows(rows)
+        self.output.close()
+
+
+def _to_str(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class ParquetFileSink:
+    """
+    Buffers rows of one item type and writes them as one parquet row group every PARQUET_ROW_GROUP_SIZE rows,
+    so memory is bounded by the row group size. Column types are decided by the first row group: counter and
+    timestamp fields whose values are all numbers become int64 columns, everything else is stored as string.
+    Later values of an int64 column that are not numbers are written as null with a warning
+    """
+
+    def __init__(self, file_path: str, fieldnames: List[str]):
+        self.file_path = file_path
+        self.fieldnames = list(fieldnames)
         self.lock = asyncio.Lock()
+        self.rows: List[Dict] = []
+        self.schema = None
+        self._writer = None
+        self._unknown_fields_warned = False
+
+    def _build_schema(self, rows: List[Dict]):
+        import pyarrow as pa
+
+        fields = []
+        for name in self.fieldnames:
+            values = [row.get(name) for row in rows if row.get(name) not in (None, "")]
+            is_int = bool(values) and bool(_PARQUET_INT_FIELD_PATTERN.search(name)) and \
+                all(parse_interact_info_count(value) is not None for value in values)
+            fields.append(pa.field(name, pa.int64() if is_int else pa.string()))
+        return pa.schema(fields)
+
+    def _write_rows(self, rows: List[Dict]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            self.schema = self._build_schema(rows)
+            self._writer = pq.ParquetWriter(self.file_path, self.schema, compression=config.PARQUET_COMPRESSION)
+        columns = {}
+        for field in self.schema:
+            if not pa.types.is_integer(field.type):
+                columns[field.name] = [_to_str(row.get(field.name)) for row in rows]
+                continue
+            values = [row.get(field.name) for row in rows]
+            columns[field.name] = [parse_interact_info_count(value) for value in values]
+            dropped = [value for value, parsed in zip(values, columns[field.name]) if parsed is None and value not in (None, "")]
+            if dropped:
+                utils.logger.warning(f"[ParquetFileSink._write_rows] {len(dropped)} values of int64 column {field.name} in {self.file_path} are not numbers and are written as null, e.g. {dropped[0]!r}")
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=self.schema), row_group_size=len(rows))
+
+    async def write(self, item: Dict):
+        if not self._unknown_fields_warned and not item.keys() <= set(self.fieldnames):
+            self._unknown_fields_warned = True
+            utils.logger.warning(f"[ParquetFileSink.write] fields {sorted(item.keys() - set(self.fieldnames))} are not in the parquet schema of {self.file_path}, they will be dropped")
+        async with self.lock:
+            self.rows.append(item)
+            if len(self.rows) >= config.PARQUET_ROW_GROUP_SIZE:
+                rows, self.rows = self.rows, []
+                await asyncio.to_thread(self._write_rows, rows)
+
+    def close(self):
+        """
+        Write the remaining rows and the parquet footer, the file is only readable after it is closed
+        """
+        if self.rows:
+            rows, self.rows = self.rows, []
+            self._write_rows(rows)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class AsyncFileWriter:
+    def __init__(self, platform: str, crawler_type: str, csv_schemas: Optional[Dict[str, List[str]]] = None):
+        """
+        Args:
+            platform: platform name, used as the data directory name
+            crawler_type: search | detail | creator
+            csv_schemas: csv / parquet column names of each item type, e.g. {"comments": ["comment_id", ...]},
+                item types without a schema use the keys of their first item
+        """
         self.platform = platform
         self.crawler_type = crawler_type
+        self.csv_schemas = csv_schemas or {}
         self.wordcloud_generator = AsyncWordCloudGenerator() if config.ENABLE_GET_WORDCLOUD else None
 
     def _get_file_path(self, file_type: str, item_type: str) -> str:
         base_path = f"data/{self.platform}/{file_type}"
-        pathlib.Path(base_path).mkdir(parents=True, exist_ok=True)
+        abs_base_path = os.path.abspath(base_path)
+        if abs_base_path not in _created_dirs:
+            pathlib.Path(base_path).mkdir(parents=True, exist_ok=True)
+            _created_dirs.add(abs_base_path)
         file_name = f"{self.crawler_type}_{item_type}_{utils.get_current_date()}.{file_type}"
         return f"{base_path}/{file_name}"
 
     async def write_to_csv(self, item: Dict, item_type: str):
         file_path = self._get_file_path('csv', item_type)
-        async with self.lock:
-            file_exists = os.path.exists(file_path)
-            async with aiofiles.open(file_path, 'a', newline='', encoding='utf-8-sig') as f:
-                writer = csv.DictWriter(f, fieldnames=item.keys())
-                if not file_exists or await f.tell() == 0:
-                    await writer.writeheader()
-                await writer.writerow(item)
+        sink = _csv_sinks.get(file_path)
+        if sink is None:
+            sink = CsvFileSink(file_path, self.csv_schemas.get(item_type) or list(item.keys()))
+            _csv_sinks[file_path] = sink
+        await sink.write(item)
+
+    async def write_to_parquet(self, item: Dict, item_type: str):
+        """
+        Buffer one item, rows are written to data/<platform>/parquet/ one row group at a time
+        Args:
+            item: item dict
+            item_type: contents | comments | creators ...
+
+        Returns:
+
+        """
+        file_path = self._get_file_path('parquet', item_type)
+        sink = _parquet_sinks.get(file_path)
+        if sink is None:
+            # parquet 文件不能追加，同一天再次运行时写到新的文件中
+            sink_file_path, index = file_path, 1
+            while os.path.exists(sink_file_path):
+                sink_file_path = file_path.replace(".parquet", f"_{index}.parquet")
+                index += 1
+            sink = ParquetFileSink(sink_file_path, self.csv_schemas.get(item_type) or list(item.keys()))
+            _parquet_sinks[file_path] = sink
+        await sink.write(item)
 
     async def write_single_item_to_json(self, item: Dict, item_type: str):
         file_path = self._get_file_path('json', item_type)
-        async with self.lock:
+        async with _get_file_lock(file_path):
             existing_data = []
             if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
                 async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
@@ -52,6 +245,52 @@ class AsyncFileWriter:
             async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
                 await f.write(json.dumps(existing_data, ensure_ascii=False, indent=4))
 
+    async def write_single_item_to_jsonl(self, item: Dict, item_type: str):
+        """
+        Append one item as a compact JSON line, the file is never re-read
+        Args:
+            item: item dict
+            item_type: contents | comments | creators ...
+
+        Returns:
+
+        """
+        file_path = self._get_file_path('jsonl', item_type)
+        line = json.dumps(item, ensure_ascii=False) + "\n"
+        async with _get_file_lock(file_path):
+            output = _jsonl_outputs.get(file_path)
+            if output is None:
+                output = RotatingOutputFile(file_path)
+                _jsonl_outputs[file_path] = output
+            await asyncio.to_thread(output.write, line, 1)
+        _written_jsonl_files.add(file_path)
+
+    async def _read_items(self, file_type: str, item_type: str) -> List[Dict]:
+        """
+        Read all items of the current day from a json file, or from every jsonl file / segment of the day
+        Args:
+            file_type: json | jsonl
+            item_type: contents | comments | creators ...
+
+        Returns:
+
+        """
+        file_path = self._get_file_path(file_type, item_type)
+        if file_type == 'jsonl':
+            return await asyncio.to_thread(_read_jsonl_items, get_output_files(file_path))
+        if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+            return []
+
+        async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
+            content = await f.read()
+
+        if not content:
+            return []
+        items = json.loads(content)
+        if not isinstance(items, list):
+            items = [items]
+        return items
+
     async def generate_wordcloud_from_comments(self):
         """
         Generate wordcloud from comments data
@@ -64,22 +303,13 @@ class AsyncFileWriter:
             return
 
         try:
-            # Read comments from JSON file
-            comments_file_path = self._get_file_path('json', 'comments')
-            if not os.path.exists(comments_file_path) or os.path.getsize(comments_file_path) == 0:
-                utils.logger.info(f"[AsyncFileWriter.generate_wordcloud_from_comments] No comments file found at {comments_file_path}")
+            # Read comments from JSON / JSON Lines file
+            file_type = 'jsonl' if config.SAVE_DATA_OPTION == 'jsonl' else 'json'
+            comments_data = await self._read_items(file_type, 'comments')
+            if not comments_data:
+                utils.logger.info(f"[AsyncFileWriter.generate_wordcloud_from_comments] No comments found at {self._get_file_path(file_type, 'comments')}")
                 return
 
-            async with aiofiles.open(comments_file_path, 'r', encoding='utf-8') as f:
-                content = await f.read()
-                if not content:
-                    utils.logger.info(f"[AsyncFileWriter.generate_wordcloud_from_comments] Comments file is empty")
-                    return
-
-                comments_data = json.loads(content)
-                if not isinstance(comments_data, list):
-                    comments_data = [comments_data]
-
             # Filter comments data to only include 'content' field
             # Handle different comment data structures across platforms
             filtered_data = []
@@ -104,4 +334,114 @@ class AsyncFileWriter:
             utils.logger.info(f"[AsyncFileWriter.generate_wordcloud_from_comments] Wordcloud generated successfully at {words_file_prefix}")
 
         except Exception as e:
-            utils.logger.error(f"[AsyncFileWriter.generate_wordcloud_from_comments] Error generating wordcloud: {e}")
\ No newline at end of file
+            utils.logger.error(f"[AsyncFileWriter.generate_wordcloud_from_comments] Error generating wordcloud: {e}")
+
+
+async def flush_csv_files():
+    """
+    Write the buffered rows of every open csv file
+    Returns:
+
+    """
+    for sink in list(_csv_sinks.values()):
+        await sink.flush()
+
+
+def close_csv_files():
+    """
+    Flush and close every open csv file, called on shutdown
+    Returns:
+
+    """
+    while _csv_sinks:
+        _, sink = _csv_sinks.popitem()
+        try:
+            sink.close()
+        except Exception as e:
+            utils.logger.error(f"[close_csv_files] close {sink.file_path} error: {e}")
+
+
+def close_parquet_files():
+    """
+    Write the buffered rows and footer of every open parquet file, called on shutdown
+    Returns:
+
+    """
+    while _parquet_sinks:
+        _, sink = _parquet_sinks.popitem()
+        try:
+            sink.close()
+        except Exception as e:
+            utils.logger.error(f"[close_parquet_files] close {sink.file_path} error: {e}")
+
+
+def _read_jsonl_items(file_paths: List[str]) -> List[Dict]:
+    items = []
+    for file_path in file_paths:
+        with open_output_file(file_path) as f:
+            items.extend(json.loads(line) for line in f if line.strip())
+    return items
+
+
+def _compact_jsonl_files(jsonl_file_paths: List[str], json_file_path: str):
+    with open(json_file_path, 'w', encoding='utf-8') as dst:
+        first = True
+        dst.write("[")
+        for jsonl_file_path in jsonl_file_paths:
+            with open_output_file(jsonl_file_path) as src:
+                for line in src:
+                    if not line.strip():
+                        continue
+                    item_text = json.dumps(json.loads(line), ensure_ascii=False, indent=4)
+                    dst.write(("\n" if first else ",\n") + textwrap.indent(item_text, "    "))
+                    first = False
+        dst.write("]" if first else "\n]")
+
+
+async def compact_jsonl_to_json(jsonl_file_path: str) -> str:
+    """
+    Convert a jsonl file (all of its compressed files / segments) to the legacy indented JSON array file under
+    the sibling json directory, the output is identical to what write_single_item_to_json produces,
+    lines are streamed so memory stays flat
+    Args:
+        jsonl_file_path: data/<platform>/jsonl/<crawler_type>_<item_type>_<date>.jsonl
+
+    Returns:
+        json file path
+    """
+    jsonl_path = pathlib.Path(jsonl_file_path)
+    json_dir = jsonl_path.parent.parent / "json"
+    json_dir.mkdir(parents=True, exist_ok=True)
+    json_file_path = str(json_dir / f"{jsonl_path.stem}.json")
+
+    async with _get_file_lock(jsonl_file_path):
+        await asyncio.to_thread(_compact_jsonl_files, get_output_files(jsonl_file_path), json_file_path)
+    return json_file_path
+
+
+def close_jsonl_files():
+    """
+    Close every open jsonl file, compressed files and rotated segments are only complete after they are closed
+    Returns:
+
+    """
+    while _jsonl_outputs:
+        _, output = _jsonl_outputs.popitem()
+        try:
+            output.close()
+        except Exception as e:
+            utils.logger.error(f"[close_jsonl_files] close {output.base_path} error: {e}")
+
+
+async def compact_written_jsonl_files():
+    """
+    Compact every jsonl file written in this run into legacy JSON array files
+    Returns:
+
+    """
+    for jsonl_file_path in sorted(_written_jsonl_files):
+        try:
+            json_file_path = await compact_jsonl_to_json(jsonl_file_path)
+            utils.logger.info(f"[compact_written_jsonl_files] {jsonl_file_path} compacted to {json_file_path}")
+        except Exception as e:
+            utils.logger.error(f"[compact_written_jsonl_files] compact {jsonl_file_path} error: {e}")
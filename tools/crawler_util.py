@@ -20,8 +20,9 @@ import random
 import re
 import urllib
 import urllib.parse
+from decimal import Decimal
 from io import BytesIO
-from typing import Dict, List, Optional, Tuple, cast
+from typing import Any, Dict, List, Optional, Tuple, Union, cast
 
 import httpx
 from PIL import Image, ImageDraw, ImageShow
@@ -160,18 +161,50 @@ def convert_str_cookie_to_dict(cookie_str: str) -> Dict:
     return cookie_dict
 
 
-def match_interact_info_count(count_str: str) -> int:
-    if not count_str:
+# 互动数中的数量单位
+_INTERACT_COUNT_UNITS = {"k": 1_000, "K": 1_000, "千": 1_000, "w": 10_000, "W": 10_000, "万": 10_000, "亿": 100_000_000}
+
+
+def _to_count(number: str, unit: str) -> int:
+    # 用 Decimal 计算，避免 float 误差把 "1.13万" 截断成 11299
+    return int(Decimal(number) * _INTERACT_COUNT_UNITS.get(unit, 1))
+
+
+def match_interact_info_count(count_str: Union[str, int, float, None]) -> int:
+    """
+    解析互动数，如 12 / "12" / "1,234" / "1.2万" / "10w+" / "3.5亿"，无法解析时返回 0
+    """
+    if not count_str or isinstance(count_str, bool):
         return 0
+    if isinstance(count_str, (int, float)):
+        return int(count_str)
 
-    match = re.search(r'\d+', count_str)
+    match = re.search(r'(\d+(?:\.\d+)?)\s*([kKwW千万亿]?)', str(count_str).replace(",", ""))
     if match:
-        number = match.group()
-        return int(number)
+        return _to_count(*match.groups())
     else:
         return 0
 
 
+def interact_count_text(count: Any) -> Optional[str]:
+    """
+    互动数转为文本计数列的值，缺失（None）时保持 None，对应的整数列为 NULL，与 0 区分
+    """
+    return None if count is None else str(count)
+
+
+def parse_interact_info_count(count_str: Union[str, int, float, None]) -> Optional[int]:
+    """
+    严格解析互动数：整个值是一个数量（可带单位和 +）时返回整数，否则返回 None，用于判断字段是否为数值列
+    """
+    if count_str is None or isinstance(count_str, bool):
+        return None
+    if isinstance(count_str, (int, float)):
+        return int(count_str)
+    match = re.fullmatch(r'\s*(-?\d+(?:\.\d+)?)\s*([kKwW千万亿]?)\+?\s*', str(count_str).replace(",", ""))
+    return _to_count(*match.groups()) if match else None
+
+
 def format_proxy_info(ip_proxy_info) -> Tuple[Optional[Dict], Optional[str]]:
     """format proxy info for playwright and httpx"""
     # fix circular import issue
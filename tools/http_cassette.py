@@ -0,0 +1,341 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 请求录制 / 回放：录制时把平台客户端的请求和响应（去掉 Cookie、签名等敏感字段）写入 cassette 文件，
+#            回放时由 cassette 返回响应，不访问网络，可以离线、可重复地对完整的 main.py 运行做性能分析
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode
+
+import aiofiles
+import httpx
+
+import config
+
+RECORD = "record"
+REPLAY = "replay"
+
+_HOP_BY_HOP_HEADERS = {"transfer-encoding", "connection", "keep-alive"}
+# 响应内容已经解压保存，回放时不能再带这些头
+_DROPPED_RESPONSE_HEADERS = _HOP_BY_HOP_HEADERS | {"content-encoding", "content-length"}
+_MEDIA_CONTENT_TYPES = ("image/", "video/", "audio/", "application/octet-stream")
+_BODY_CHUNK_SIZE = 64 * 1024
+
+
+class CassetteMissError(httpx.TransportError):
+    """
+    回放时 cassette 中没有对应的请求，按连接失败处理
+    """
+
+
+def _is_secret(name: str) -> bool:
+    return name.lower() in config.CASSETTE_SECRET_NAMES
+
+
+def _strip_keys(data: Dict, ignored: bool = True) -> Dict:
+    """
+    去掉敏感字段，ignored 为 True 时同时去掉时间戳等每次请求都不同的字段
+    """
+    return {
+        key: value for key, value in data.items()
+        if not _is_secret(key) and not (ignored and key.lower() in config.CASSETTE_IGNORE_PARAMS)
+    }
+
+
+def sanitize_url(url: Any, ignored: bool = False) -> str:
+    """
+    去掉查询参数中的敏感字段，ignored 为 True 时同时去掉每次请求都不同的参数并排序，用于匹配请求
+    """
+    url = httpx.URL(str(url))
+    params = [
+        (key, value) for key, value in url.params.multi_items()
+        if not _is_secret(key) and not (ignored and key.lower() in config.CASSETTE_IGNORE_PARAMS)
+    ]
+    if ignored:
+        params.sort()
+    return str(url.copy_with(query=urlencode(params).encode() if params else None))
+
+
+def request_key(method: str, url: Any, body: bytes = b"") -> str:
+    """
+    匹配录制和回放请求的键：请求方法、去掉易变参数的 url 和请求体摘要
+    """
+    if body:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            body = json.dumps(_strip_keys(data), sort_keys=True, ensure_ascii=False).encode()
+        body = hashlib.sha256(body).hexdigest()[:16].encode()
+    return f"{method.upper()} {sanitize_url(url, ignored=True)} {body.decode()}".rstrip()
+
+
+def _is_streamed_body(response: httpx.Response) -> bool:
+    """
+    响应体是否写入单独的文件：媒体类型或 Content-Length 超过 CASSETTE_INLINE_MAX_SIZE
+    """
+    if response.headers.get("content-type", "").lower().startswith(_MEDIA_CONTENT_TYPES):
+        return True
+    content_length = response.headers.get("content-length", "")
+    return content_length.isdigit() and int(content_length) > config.CASSETTE_INLINE_MAX_SIZE
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """
+    边读边把原始响应体写入 body 文件，读完后调用 on_recorded；没读完就关闭的响应不记录
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, path: str, on_recorded: Callable[[], None]):
+        self._stream = stream
+        self._path = path
+        self._temp_path = f"{path}.part"
+        self._on_recorded = on_recorded
+
+    async def __aiter__(self):
+        async with aiofiles.open(self._temp_path, "wb") as f:
+            async for chunk in self._stream:
+                await f.write(chunk)
+                yield chunk
+        os.replace(self._temp_path, self._path)
+        self._on_recorded()
+
+    async def aclose(self):
+        await self._stream.aclose()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+
+class _FileStream(httpx.AsyncByteStream):
+    """
+    回放时分块读取 body 文件
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+
+    async def __aiter__(self):
+        async with aiofiles.open(self._path, "rb") as f:
+            while chunk := await f.read(_BODY_CHUNK_SIZE):
+                yield chunk
+
+
+class Cassette:
+    """
+    一行一个 JSON 记录的 cassette 文件，同一请求录制多次时按顺序回放，用完后重复最后一次；
+    写入单独文件的响应体放在 cassette 文件旁的 <文件名>_bodies 目录
+    """
+
+    def __init__(self, path: str, mode: str):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.body_dir = f"{os.path.splitext(path)[0]}_bodies"
+        self._entries: Dict[str, List[Dict]] = defaultdict(list)
+        self._cursors: Dict[str, int] = defaultdict(int)
+        self._body_counts: Dict[str, int] = defaultdict(int)
+        self._file = None
+        if mode == REPLAY:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "w", encoding="utf-8")
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def record(self, key: str, entry: Dict):
+        self._file.write(json.dumps({"key": key, **entry}, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def new_body_file(self, key: str) -> str:
+        """
+        为一次录制的响应体分配 body 目录下的文件名
+        """
+        os.makedirs(self.body_dir, exist_ok=True)
+        self._body_counts[key] += 1
+        return f"{hashlib.sha256(key.encode()).hexdigest()[:16]}_{self._body_counts[key]}.bin"
+
+    def play(self, key: str) -> Dict:
+        entries = self._entries.get(key)
+        if not entries:
+            raise CassetteMissError(f"no recorded response for {key}")
+        index = self._cursors[key]
+        self._cursors[key] += 1
+        return entries[min(index, len(entries) - 1)]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette, transport: Optional[httpx.AsyncBaseTransport] = None, latency_ms: Optional[float] = None):
+        """
+        Args:
+            cassette: 录制或回放用的 cassette
+            transport: 录制时实际发送请求的 transport
+            latency_ms: 回放时每个请求的耗时（毫秒），None 表示按录制时的实际耗时
+        """
+        self._cassette = cassette
+        self._transport = transport
+        self._latency_ms = latency_ms
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request.method, request.url, await request.aread())
+        if self._cassette.replaying:
+            entry = self._cassette.play(key)
+            latency_ms = entry.get("elapsed_ms", 0) if self._latency_ms is None else self._latency_ms
+            if latency_ms:
+                await asyncio.sleep(latency_ms / 1000)
+            if entry.get("body_file"):
+                body_path = os.path.join(self._cassette.body_dir, entry["body_file"])
+                if not os.path.exists(body_path):
+                    raise CassetteMissError(f"recorded body file {body_path} of {key} is missing")
+                return httpx.Response(entry["status"], headers=entry["headers"], stream=_FileStream(body_path), request=request)
+            content = base64.b64decode(entry["content"]) if entry.get("base64") else entry["content"].encode()
+            return httpx.Response(entry["status"], headers=entry["headers"], content=content, request=request)
+
+        start = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        streamed = _is_streamed_body(response)
+        # body 文件保存未解压的原始内容，保留 Content-Encoding 等头
+        dropped_headers = _HOP_BY_HOP_HEADERS if streamed else _DROPPED_RESPONSE_HEADERS
+        entry = {
+            "url": sanitize_url(request.url),
+            "status": response.status_code,
+            "headers": [
+                (name, value) for name, value in response.headers.multi_items()
+                if name.lower() not in dropped_headers and not _is_secret(name)
+            ],
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        if streamed:
+            # 媒体等大响应不读入内存，由调用方读取时写入 body 文件，读完后再记录
+            body_file = self._cassette.new_body_file(key)
+            response.stream = _RecordingStream(
+                response.stream,
+                os.path.join(self._cassette.body_dir, body_file),
+                lambda: self._cassette.record(key, {**entry, "body_file": body_file}),
+            )
+            return response
+
+        content = await response.aread()
+        entry["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        try:
+            entry["content"] = content.decode()
+        except UnicodeDecodeError:
+            entry.update(content=base64.b64encode(content).decode(), base64=True)
+        self._cassette.record(key, entry)
+        return response
+
+    async def aclose(self):
+        if self._transport is not None:
+            await self._transport.aclose()
+
+
+class CassettePage:
+    """
+    包装平台客户端使用的 Playwright Page：录制时记录 evaluate（签名、localStorage 等）和页面内容的结果，
+    回放时直接返回录制的结果，goto 不访问网络；其他属性和方法转发给原 Page
+    """
+
+    def __init__(self, page, cassette: Cassette):
+        self._page = page
+        self._cassette = cassette
+        self._url = ""
+
+    def __getattr__(self, name: str):
+        return getattr(self._page, name)
+
+    @property
+    def url(self) -> str:
+        return self._url if self._cassette.replaying and self._url else self._page.url
+
+    async def goto(self, url: str, **kwargs):
+        self._url = url
+        if self._cassette.replaying:
+            return None
+        return await self._page.goto(url, **kwargs)
+
+    async def content(self) -> str:
+        key = f"content {sanitize_url(self._url, ignored=True)}"
+        if self._cassette.replaying:
+            return self._cassette.play(key)["result"]
+        result = await self._page.content()
+        self._cassette.record(key, {"result": result})
+        return result
+
+    async def evaluate(self, expression: str, *args, **kwargs) -> Any:
+        key = f"evaluate {expression}"
+        if self._cassette.replaying:
+            return self._cassette.play(key)["result"]
+        result = await self._page.evaluate(expression, *args, **kwargs)
+        self._cassette.record(key, {"result": _strip_keys(result, ignored=False) if isinstance(result, dict) else result})
+        return result
+
+
+_cassette: Optional[Cassette] = None
+
+
+def get_cassette() -> Optional[Cassette]:
+    """
+    获取当前平台的 cassette，未设置 CASSETTE_MODE 时返回 None
+    """
+    global _cassette
+    if not config.CASSETTE_MODE:
+        return None
+    if _cassette is None:
+        _cassette = Cassette(config.CASSETTE_PATH.format(platform=config.PLATFORM), config.CASSETTE_MODE)
+    return _cassette
+
+
+def close_cassette():
+    """
+    程序退出前调用，录制模式下关闭 cassette 文件
+    """
+    global _cassette
+    if _cassette is not None:
+        _cassette.close()
+        _cassette = None
+
+
+def create_cassette_transport(proxy: Optional[str], limits: httpx.Limits) -> Optional[CassetteTransport]:
+    """
+    录制 / 回放模式下创建 httpx 客户端使用的 transport，录制时实际请求经 proxy 发出；未开启时返回 None
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return None
+    transport = None if cassette.replaying else httpx.AsyncHTTPTransport(proxy=proxy, limits=limits)
+    return CassetteTransport(cassette, transport, config.CASSETTE_REPLAY_LATENCY_MS)
+
+
+def wrap_page(page):
+    """
+    录制 / 回放模式下包装平台客户端使用的 Playwright Page，未开启时原样返回
+    """
+    cassette = get_cassette()
+    return page if cassette is None else CassettePage(page, cassette)
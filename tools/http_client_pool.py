@@ -0,0 +1,87 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 长连接 httpx 客户端池：每个代理一个 AsyncClient，请求复用 TCP / TLS 连接，不再每次请求都重新握手
+import asyncio
+import weakref
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Dict, Optional
+
+import httpx
+
+import config
+from tools.http_cassette import create_cassette_transport
+
+
+class _NoCookiePolicy(DefaultCookiePolicy):
+    """
+    不保存响应中的 Cookie：各平台客户端在请求头中自己维护 Cookie，长连接客户端不能把上一次响应的 Cookie 带到下一次请求
+    """
+
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+
+def create_http_client(proxy: Optional[str] = None, **kwargs) -> httpx.AsyncClient:
+    """
+    创建一个按 HTTP_* 配置限制连接数的长连接客户端，kwargs 传给 httpx.AsyncClient
+    """
+    limits = httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+    if "transport" not in kwargs:
+        transport = create_cassette_transport(proxy, limits)
+        if transport is not None:
+            # 录制时由 cassette 内部的 transport 经代理发出请求，回放时不访问网络
+            kwargs["transport"], proxy = transport, None
+    return httpx.AsyncClient(
+        proxy=proxy,
+        cookies=CookieJar(policy=_NoCookiePolicy()),
+        limits=limits,
+        **kwargs,
+    )
+
+
+# 所有未关闭的客户端池，程序退出前统一关闭
+_pools: "weakref.WeakSet[HttpClientPool]" = weakref.WeakSet()
+
+
+class HttpClientPool:
+    def __init__(self, **client_kwargs):
+        self._client_kwargs = client_kwargs
+        self._clients: Dict[Optional[str], httpx.AsyncClient] = {}
+        _pools.add(self)
+
+    def get(self, proxy: Optional[str] = None) -> httpx.AsyncClient:
+        """
+        获取代理对应的客户端，第一次使用或已关闭时创建
+        """
+        client = self._clients.get(proxy)
+        if client is None or client.is_closed:
+            client = self._clients[proxy] = create_http_client(proxy, **self._client_kwargs)
+        return client
+
+    async def aclose(self):
+        clients, self._clients = list(self._clients.values()), {}
+        await asyncio.gather(*[client.aclose() for client in clients])
+
+
+async def close_http_client_pools():
+    """
+    程序退出前调用，关闭所有长连接
+    """
+    await asyncio.gather(*[pool.aclose() for pool in list(_pools)])
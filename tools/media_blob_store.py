@@ -0,0 +1,150 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 按内容寻址的媒体存储：文件按 sha256 命名只存一份，url -> blob 索引避免重复下载，
+#            各内容目录下的文件是指向 blob 的硬链接（不支持硬链接时复制）
+import asyncio
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import config
+from tools import utils
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: str) -> Tuple[str, int]:
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(file_path, "rb") as f:
+        while chunk := f.read(_HASH_CHUNK_SIZE):
+            sha256.update(chunk)
+            size += len(chunk)
+    return sha256.hexdigest(), size
+
+
+def _link_file(blob_path: str, save_path: str):
+    """
+    把 blob 链接到保存路径，已存在的文件被原子替换
+    """
+    temp_path = f"{save_path}.{uuid.uuid4().hex}.part"
+    try:
+        os.link(blob_path, temp_path)
+    except OSError:
+        # 跨文件系统或文件系统不支持硬链接
+        shutil.copyfile(blob_path, temp_path)
+    os.replace(temp_path, save_path)
+
+
+class MediaBlobStore:
+    """
+    <root>/blobs/ab/cd/abcd....<ext>    按内容 sha256 命名的媒体文件
+    <root>/media_index.db               media_blob 表：url -> sha256、大小、blob 路径
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        os.makedirs(os.path.join(self.blob_dir, "tmp"), exist_ok=True)
+        # 正在下载的 url，同一 url 同时只下载一次
+        self._downloading: Dict[str, asyncio.Future] = {}
+        self._conn = sqlite3.connect(os.path.join(root, "media_index.db"), isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS media_blob ("
+            "url TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER NOT NULL, blob_path TEXT NOT NULL, add_ts INTEGER NOT NULL)"
+        )
+
+    def close(self):
+        self._conn.close()
+
+    def get_blob_hash(self, url: str) -> Optional[Tuple[str, int]]:
+        """
+        已下载过的 url 对应的 (sha256, 大小)
+        """
+        return self._conn.execute("SELECT sha256, size FROM media_blob WHERE url = ?", (url,)).fetchone()
+
+    def get_blob(self, url: str) -> Optional[str]:
+        """
+        已下载过的 url 对应的 blob 路径，没有下载过或 blob 已被删除时返回 None
+        """
+        row = self._conn.execute("SELECT blob_path FROM media_blob WHERE url = ?", (url,)).fetchone()
+        if row is None or not os.path.exists(row[0]):
+            return None
+        return row[0]
+
+    async def fetch(self, url: str, save_path: str, download: Callable[[str, str], Awaitable[bool]]) -> bool:
+        """
+        保存 url 对应的媒体到 save_path：已知的 url 不再下载，内容相同的文件只保存一份 blob
+        Args:
+            url: 媒体地址
+            save_path: 保存路径，所在目录需已存在
+            download: 流式下载函数 download(url, path) -> 是否成功
+
+        Returns:
+            是否保存成功
+        """
+        blob_path = self.get_blob(url)
+        if blob_path is not None:
+            utils.logger.info(f"[MediaBlobStore.fetch] {url} already downloaded, link {blob_path} to {save_path}")
+        elif url in self._downloading:
+            blob_path = await asyncio.shield(self._downloading[url])
+        else:
+            future = self._downloading[url] = asyncio.get_running_loop().create_future()
+            try:
+                blob_path = await self._download_blob(url, os.path.splitext(save_path)[1], download)
+            finally:
+                future.set_result(blob_path)
+                del self._downloading[url]
+        if blob_path is None:
+            return False
+        await asyncio.to_thread(_link_file, blob_path, save_path)
+        return True
+
+    async def _download_blob(self, url: str, ext: str, download: Callable[[str, str], Awaitable[bool]]) -> Optional[str]:
+        # 临时文件名由 url 决定，中断后再次下载同一 url 时可以续传
+        temp_path = os.path.join(self.blob_dir, "tmp", hashlib.sha256(url.encode()).hexdigest()[:32] + ext)
+        if not await download(url, temp_path):
+            return None
+        sha256, size = await asyncio.to_thread(hash_file, temp_path)
+        blob_path = os.path.join(self.blob_dir, sha256[:2], sha256[2:4], sha256 + ext)
+        if os.path.exists(blob_path):
+            # 其他 url 已经下载过相同内容
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(temp_path, blob_path)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO media_blob (url, sha256, size, blob_path, add_ts) VALUES (?, ?, ?, ?, ?)",
+            (url, sha256, size, blob_path, int(time.time())),
+        )
+        return blob_path
+
+
+_media_blob_store: Optional[MediaBlobStore] = None
+
+
+def get_media_blob_store() -> Optional[MediaBlobStore]:
+    """
+    获取媒体 blob 存储，未开启 ENABLE_MEDIA_DEDUPE 时返回 None
+    """
+    global _media_blob_store
+    if not config.ENABLE_MEDIA_DEDUPE:
+        return None
+    if _media_blob_store is None:
+        _media_blob_store = MediaBlobStore(config.MEDIA_BLOB_DIR)
+    return _media_blob_store
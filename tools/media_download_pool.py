@@ -0,0 +1,205 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 媒体下载池：爬虫只把下载任务放进有界队列，由后台任务并发下载，每个 CDN 域名单独限制并发
+import asyncio
+import functools
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set
+from urllib.parse import urlparse
+
+import config
+from tools import utils
+from tools.media_downloader import HostSlots, download_counter, host_slots_var
+
+# 下载任务：调用后完成一次下载并返回是否成功，如 functools.partial(xhs_store.download_xhs_note_image, ...)
+MediaDownloadJob = Callable[[], Awaitable[bool]]
+
+
+@dataclass
+class _PoolJob:
+    host: str
+    job: MediaDownloadJob
+
+
+class MediaDownloadPool:
+    """
+    每个域名一个等待队列，只把域名未达到并发上限的任务交给空闲的下载名额，
+    某个域名下载满时其他域名的任务不会排在它后面等待
+    """
+
+    def __init__(self, max_size: int, workers: int, per_host: int, stats_interval: float):
+        self._worker_count = workers
+        self._per_host = per_host
+        # 等待中的任务数上限，满时 put 等待（背压）
+        self._slots = asyncio.Semaphore(max_size)
+        self._pending: Dict[str, Deque[_PoolJob]] = {}
+        self._active: Dict[str, int] = defaultdict(int)
+        self._running: Set[asyncio.Task] = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._stats_interval = stats_interval
+        self._report_task: Optional[asyncio.Task] = None
+        self.loop = asyncio.get_running_loop()
+
+        # 下载统计
+        self.done_count = 0
+        self.failed_count = 0
+        self._start_time = time.monotonic()
+        self._start_bytes = download_counter.bytes
+        self._last_report_time = self._start_time
+        self._last_report_bytes = self._start_bytes
+
+    def start(self):
+        if self._stats_interval:
+            self._report_task = asyncio.create_task(self._report_periodically())
+
+    def qsize(self) -> int:
+        return sum(len(jobs) for jobs in self._pending.values())
+
+    async def put(self, url: str, job: MediaDownloadJob):
+        """
+        放入一个下载任务，等待中的任务已满时等待（背压）
+        """
+        await self._slots.acquire()
+        pool_job = _PoolJob(urlparse(url).netloc, job)
+        self._pending.setdefault(pool_job.host, deque()).append(pool_job)
+        self._idle.clear()
+        self._dispatch()
+
+    def _dispatch(self):
+        """
+        把等待中的任务交给空闲的下载名额，各域名轮流，跳过已达到并发上限的域名
+        """
+        while len(self._running) < self._worker_count:
+            host = next((host for host in self._pending if self._active[host] < self._per_host), None)
+            if host is None:
+                return
+            jobs = self._pending.pop(host)
+            pool_job = jobs.popleft()
+            if jobs:
+                # 放回末尾，下一个名额先给其他域名
+                self._pending[host] = jobs
+            self._active[host] += 1
+            self._slots.release()
+            task = asyncio.create_task(self._run(pool_job))
+            self._running.add(task)
+            task.add_done_callback(self._on_job_done)
+
+    def _try_acquire_host(self, host: str, count: int) -> int:
+        """
+        分段下载额外占用同域名的并发名额，不等待，返回实际占用的个数
+        """
+        acquired = max(min(count, self._per_host - self._active[host]), 0)
+        self._active[host] += acquired
+        return acquired
+
+    def _release_host(self, host: str, count: int):
+        self._active[host] -= count
+        if count:
+            self._dispatch()
+
+    async def _run(self, pool_job: _PoolJob):
+        host_slots_var.set(HostSlots(
+            functools.partial(self._try_acquire_host, pool_job.host),
+            functools.partial(self._release_host, pool_job.host),
+        ))
+        try:
+            if await pool_job.job():
+                self.done_count += 1
+            else:
+                self.failed_count += 1
+        except Exception as e:
+            self.failed_count += 1
+            utils.logger.error(f"[MediaDownloadPool._run] download from {pool_job.host} failed: {e}")
+        finally:
+            self._active[pool_job.host] -= 1
+
+    def _on_job_done(self, task: asyncio.Task):
+        self._running.discard(task)
+        self._dispatch()
+        if not self._running and not self._pending:
+            self._idle.set()
+
+    async def _report_periodically(self):
+        while True:
+            await asyncio.sleep(self._stats_interval)
+            self.report()
+
+    def report(self):
+        now = time.monotonic()
+        interval_sec = max(now - self._last_report_time, 1e-6)
+        bytes_per_sec = (download_counter.bytes - self._last_report_bytes) / interval_sec
+        self._last_report_time, self._last_report_bytes = now, download_counter.bytes
+        total_mb = (download_counter.bytes - self._start_bytes) / 1024 / 1024
+        utils.logger.info(
+            f"[MediaDownloadPool] queue depth: {self.qsize()}, done: {self.done_count}, failed: {self.failed_count}, "
+            f"speed: {bytes_per_sec / 1024:.1f}KB/s, total: {total_mb:.2f}MB in {now - self._start_time:.0f}s"
+        )
+
+    async def drain(self):
+        """
+        等待队列中的下载全部完成，然后停止下载任务并输出统计
+        """
+        await self._idle.wait()
+        if self._report_task is not None:
+            self._report_task.cancel()
+            await asyncio.gather(self._report_task, return_exceptions=True)
+            self._report_task = None
+        self.report()
+
+
+_media_download_pool: Optional[MediaDownloadPool] = None
+
+
+def get_media_download_pool() -> Optional[MediaDownloadPool]:
+    """
+    获取当前事件循环的媒体下载池，未开启 ENABLE_MEDIA_DOWNLOAD_POOL 时返回 None
+    """
+    global _media_download_pool
+    if not config.ENABLE_MEDIA_DOWNLOAD_POOL:
+        return None
+    if _media_download_pool is None or _media_download_pool.loop is not asyncio.get_running_loop():
+        _media_download_pool = MediaDownloadPool(
+            max_size=config.MEDIA_DOWNLOAD_QUEUE_SIZE,
+            workers=config.MEDIA_DOWNLOAD_CONCURRENCY,
+            per_host=config.MEDIA_DOWNLOAD_PER_HOST,
+            stats_interval=config.MEDIA_DOWNLOAD_STATS_INTERVAL,
+        )
+        _media_download_pool.start()
+    return _media_download_pool
+
+
+async def drain_media_download_pool():
+    """
+    程序退出前调用，保证队列中的媒体全部下载完
+    """
+    global _media_download_pool
+    if _media_download_pool is not None and _media_download_pool.loop is asyncio.get_running_loop():
+        await _media_download_pool.drain()
+    _media_download_pool = None
+
+
+async def submit_media_download(url: str, job: MediaDownloadJob):
+    """
+    提交一个媒体下载：开启下载池时入队后立即返回，否则直接下载
+    Args:
+        url: 媒体地址，按域名限制并发
+        job: 下载任务
+    """
+    pool = get_media_download_pool()
+    if pool is None:
+        await job()
+        return
+    await pool.put(url, job)
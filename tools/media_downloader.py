@@ -0,0 +1,331 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 媒体文件流式下载：响应按块写入临时文件，下载完成后原子重命名，每个下载只占用一个块大小的内存；
+#            中断后按 Range 续传，大文件可分段并发下载
+import asyncio
+import contextvars
+import glob
+import os
+import re
+import shutil
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiofiles
+import httpx
+
+import config
+from tools import utils
+
+# 下载中的文件后缀，下载完成后去掉
+PART_SUFFIX = ".part"
+# 与 .part 文件放在一起，记录其内容对应的 ETag / Last-Modified，续传时作为 If-Range 发送
+VALIDATOR_SUFFIX = ".validator"
+
+
+class DownloadCounter:
+    """
+    进程内累计收到的媒体字节数，下载池据此计算下载速度
+    """
+
+    def __init__(self):
+        self.bytes = 0
+
+
+download_counter = DownloadCounter()
+
+
+class HostSlots:
+    """
+    下载所在域名的并发名额，下载池执行任务时经 host_slots_var 提供，分段下载除第一段外每段额外占用一个名额
+    """
+
+    def __init__(self, try_acquire: Callable[[int], int], release: Callable[[int], None]):
+        """
+        Args:
+            try_acquire: 立即占用最多 n 个名额，返回实际占用的个数
+            release: 释放 n 个名额
+        """
+        self.try_acquire = try_acquire
+        self.release = release
+
+
+host_slots_var: contextvars.ContextVar[Optional[HostSlots]] = contextvars.ContextVar("host_slots", default=None)
+
+
+class IncompleteDownloadError(Exception):
+    """
+    收到的字节数与 Content-Length 不一致，或服务端不再接受断点续传的范围
+    """
+
+
+def _parse_content_range_total(content_range: str) -> Optional[int]:
+    # Content-Range: bytes 0-0/123456
+    total = content_range.rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+def _part_size(part_path: str) -> int:
+    return os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+
+def _response_validator(response: httpx.Response) -> Optional[str]:
+    """
+    If-Range 可用的校验值：强 ETag，没有时用 Last-Modified
+    """
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _read_validator(part_path: str) -> Optional[str]:
+    try:
+        with open(part_path + VALIDATOR_SUFFIX, encoding="utf-8") as f:
+            return f.read() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_validator(part_path: str, validator: Optional[str]):
+    if validator is None:
+        _remove_file(part_path + VALIDATOR_SUFFIX)
+        return
+    with open(part_path + VALIDATOR_SUFFIX, "w", encoding="utf-8") as f:
+        f.write(validator)
+
+
+def _remove_file(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _remove_part(part_path: str):
+    _remove_file(part_path)
+    _remove_file(part_path + VALIDATOR_SUFFIX)
+
+
+async def _fetch_range(
+    client: httpx.AsyncClient,
+    url: str,
+    part_path: str,
+    headers: Optional[Dict[str, str]],
+    timeout: Optional[float],
+    chunk_size: int,
+    follow_redirects: bool = False,
+    start: int = 0,
+    end: Optional[int] = None,
+    validator: Optional[str] = None,
+):
+    """
+    下载 url 的 [start, end] 字节到 part_path，part_path 中已有的字节不再下载（Range 续传），
+    写完后按 Content-Length 校验。续传时带上 If-Range，服务端文件变化（返回 200 或校验值不一致）时从头下载，
+    不会把新旧两个版本拼在一起；validator 为各分段共用的校验值，未指定时使用 part_path 旁保存的值
+    """
+    offset = _part_size(part_path)
+    if end is not None and start + offset > end:
+        return
+    if validator is None and offset:
+        validator = _read_validator(part_path)
+        if validator is None:
+            # 没有 ETag / Last-Modified，无法确认服务端文件没有变化，从头下载
+            offset = 0
+    request_headers = dict(headers or {})
+    if start + offset or end is not None:
+        request_headers["Range"] = f"bytes={start + offset}-{'' if end is None else end}"
+        if validator:
+            request_headers["If-Range"] = validator
+    async with client.stream("GET", url, headers=request_headers, timeout=timeout, follow_redirects=follow_redirects) as response:
+        if response.status_code == 416 and offset:
+            # 服务端上的文件变了，已下载的部分作废
+            _remove_part(part_path)
+            raise IncompleteDownloadError(f"range {request_headers['Range']} not satisfiable, restart download")
+        response.raise_for_status()
+        if response.status_code != 206 and "Range" in request_headers:
+            if end is not None or start:
+                raise IncompleteDownloadError("server ignored the Range header of a segment")
+            # 服务端不支持 Range 或文件已变化，从头下载
+            offset = 0
+        received_validator = _response_validator(response)
+        if response.status_code == 206 and validator and received_validator and received_validator != validator:
+            # 服务端（或另一个 CDN 节点）返回了其他版本的文件，已下载的部分作废
+            _remove_part(part_path)
+            raise IncompleteDownloadError(f"{url} changed on server ({validator} -> {received_validator}), restart download")
+        if not offset:
+            _write_validator(part_path, received_validator)
+        content_length = response.headers.get("Content-Length")
+        # 压缩传输时 Content-Length 是压缩后的长度，无法校验
+        expected_size = offset + int(content_length) if content_length and "Content-Encoding" not in response.headers else None
+        buffer = bytearray()
+        async with aiofiles.open(part_path, "ab" if offset else "wb") as f:
+            try:
+                async for chunk in response.aiter_bytes():
+                    buffer += chunk
+                    download_counter.bytes += len(chunk)
+                    if len(buffer) >= chunk_size:
+                        await f.write(bytes(buffer))
+                        buffer.clear()
+            finally:
+                # 连接中断时已收到的数据也写入，续传时不再重复下载
+                await f.write(bytes(buffer))
+    size = _part_size(part_path)
+    if expected_size is not None and size != expected_size:
+        raise IncompleteDownloadError(f"got {size} bytes, expected {expected_size}")
+
+
+async def _fetch_range_with_retry(client: httpx.AsyncClient, url: str, part_path: str, retries: int, **kwargs):
+    """
+    连接断开、超时或数据不完整时从已下载的位置继续，最多重试 retries 次
+    """
+    for attempt in range(retries + 1):
+        try:
+            await _fetch_range(client, url, part_path, **kwargs)
+            return
+        except (httpx.TransportError, IncompleteDownloadError) as exc:
+            if attempt == retries:
+                raise
+            utils.logger.warning(
+                f"[download_to_file] {exc.__class__.__name__} for {url} - {exc}, resume from byte {_part_size(part_path)} "
+                f"(retry {attempt + 1}/{retries})"
+            )
+
+
+async def _probe_size(
+    client: httpx.AsyncClient, url: str, headers: Optional[Dict[str, str]], timeout: Optional[float], follow_redirects: bool
+) -> Tuple[Optional[int], Optional[str]]:
+    """
+    请求第一个字节，服务端支持 Range 时返回文件总大小和校验值，否则总大小为 None
+    """
+    range_headers = {**(headers or {}), "Range": "bytes=0-0"}
+    async with client.stream("GET", url, headers=range_headers, timeout=timeout, follow_redirects=follow_redirects) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            return None, None
+        return _parse_content_range_total(response.headers.get("Content-Range", "")), _response_validator(response)
+
+
+def _join_segments(segment_paths: List[str], temp_path: str):
+    with open(temp_path, "wb") as out:
+        for segment_path in segment_paths:
+            with open(segment_path, "rb") as f:
+                shutil.copyfileobj(f, out)
+
+
+def _remove_stale_segments(temp_path: str, segment_paths: List[str]):
+    """
+    删除字节范围与本次分段不一致的分段文件（文件大小或段数变化后留下的），不能在其基础上续传
+    """
+    for path in glob.glob(glob.escape(temp_path) + ".*"):
+        segment_path = path.removesuffix(VALIDATOR_SUFFIX)
+        if segment_path not in segment_paths and re.fullmatch(r"\d+(-\d+)?", segment_path[len(temp_path) + 1:]):
+            os.remove(path)
+
+
+async def _download_segments(
+    client: httpx.AsyncClient, url: str, temp_path: str, total: int, validator: Optional[str], segments: int, retries: int, **kwargs
+):
+    """
+    把文件按字节范围分成 segments 段并发下载到 temp_path.<起始字节>-<结束字节>，全部完成后按顺序拼接到 temp_path。
+    在下载池中执行时除第一段外每段额外占用一个同域名的并发名额，拿不到名额的段等前面的段下载完再下载；
+    任何一段失败时删除所有分段文件
+    """
+    segment_size = -(-total // segments)
+    bounds = [(start, min(start + segment_size, total) - 1) for start in range(0, total, segment_size)]
+    segment_paths = [f"{temp_path}.{start}-{end}" for start, end in bounds]
+    _remove_stale_segments(temp_path, segment_paths)
+    host_slots = host_slots_var.get()
+    extra_slots = host_slots.try_acquire(len(bounds) - 1) if host_slots is not None else len(bounds) - 1
+    semaphore = asyncio.Semaphore(1 + extra_slots)
+
+    async def fetch_segment(segment_path: str, start: int, end: int):
+        async with semaphore:
+            await _fetch_range_with_retry(client, url, segment_path, retries, start=start, end=end, validator=validator, **kwargs)
+
+    tasks = [
+        asyncio.create_task(fetch_segment(segment_path, start, end))
+        for segment_path, (start, end) in zip(segment_paths, bounds)
+    ]
+    try:
+        await asyncio.gather(*tasks)
+        await asyncio.to_thread(_join_segments, segment_paths, temp_path)
+    finally:
+        # 某一段失败时取消其他段并等待其退出，避免之后重试同一 url 时两个任务同时写同一个分段文件
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if host_slots is not None:
+            host_slots.release(extra_slots)
+        for segment_path in segment_paths:
+            _remove_part(segment_path)
+    size = _part_size(temp_path)
+    if size != total:
+        os.remove(temp_path)
+        raise IncompleteDownloadError(f"joined {size} bytes, expected {total}")
+    _write_validator(temp_path, validator)
+
+
+async def download_to_file(
+    client: httpx.AsyncClient,
+    url: str,
+    save_path: str,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    chunk_size: Optional[int] = None,
+    retries: Optional[int] = None,
+    segments: Optional[int] = None,
+    follow_redirects: bool = False,
+) -> bool:
+    """
+    流式下载 url 到 save_path，先写 save_path.part，完整下载后再重命名为 save_path，
+    中途失败不会留下不完整的 save_path。连接断开、超时时保留 .part 文件，重试（包括下次运行）时用 Range 续传，
+    收到的字节数按 Content-Length 校验
+    Args:
+        client: httpx 客户端（代理等在客户端上配置）
+        url: 媒体地址
+        save_path: 保存路径，所在目录需已存在
+        headers: 请求头
+        timeout: 单次读写超时（秒），流式下载不限制总时长
+        chunk_size: 每次写入的块大小（字节），默认 MEDIA_DOWNLOAD_CHUNK_SIZE
+        retries: 续传重试次数，默认 MEDIA_DOWNLOAD_RETRY_TIMES
+        segments: 大文件分段并发下载的段数，默认 MEDIA_DOWNLOAD_SEGMENTS，1 表示不分段
+        follow_redirects: 是否跟随重定向
+
+    Returns:
+        是否下载成功
+    """
+    chunk_size = chunk_size or config.MEDIA_DOWNLOAD_CHUNK_SIZE
+    retries = config.MEDIA_DOWNLOAD_RETRY_TIMES if retries is None else retries
+    segments = segments or config.MEDIA_DOWNLOAD_SEGMENTS
+    temp_path = save_path + PART_SUFFIX
+    kwargs = dict(headers=headers, timeout=timeout, chunk_size=chunk_size, follow_redirects=follow_redirects)
+    try:
+        total = validator = None
+        # 已有 .part 文件时直接续传
+        if segments > 1 and not os.path.exists(temp_path):
+            total, validator = await _probe_size(client, url, headers, timeout, follow_redirects)
+        if total is not None and total >= config.MEDIA_DOWNLOAD_SEGMENT_MIN_SIZE:
+            await _download_segments(client, url, temp_path, total, validator, segments, retries, **kwargs)
+        else:
+            await _fetch_range_with_retry(client, url, temp_path, retries, **kwargs)
+        os.replace(temp_path, save_path)
+        _remove_file(temp_path + VALIDATOR_SUFFIX)
+        return True
+    except (httpx.TransportError, IncompleteDownloadError) as exc:
+        # 保留已下载的部分，下次从断点继续
+        utils.logger.error(f"[download_to_file] {exc.__class__.__name__} for {url} - {exc}, keep {temp_path} for resume")
+        return False
+    except httpx.HTTPError as exc:  # 状态码不是 2xx 等
+        utils.logger.error(f"[download_to_file] {exc.__class__.__name__} for {url} - {exc}")
+    except OSError as e:
+        utils.logger.error(f"[download_to_file] write {save_path} failed: {e}")
+    _remove_part(temp_path)
+    return False
@@ -0,0 +1,132 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 媒体下载清单：每个媒体文件的 url、所属内容、保存路径、大小、sha256 和下载状态，
+#            查询缺失文件、已用磁盘空间时不需要遍历 data/<platform>/images、videos 目录
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+# 下载状态
+STATUS_DOWNLOADING = "downloading"  # 已开始下载，程序中断时停留在此状态
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class MediaManifest:
+    """
+    <root>/media_index.db 中的 media_manifest 表，以保存路径为主键
+    """
+
+    def __init__(self, root: str):
+        os.makedirs(root, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "media_index.db"), isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS media_manifest ("
+            "path TEXT PRIMARY KEY, platform TEXT NOT NULL, media_type TEXT NOT NULL, content_id TEXT NOT NULL, "
+            "url TEXT NOT NULL, size INTEGER, sha256 TEXT, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "add_ts INTEGER NOT NULL, last_modify_ts INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_media_manifest_status ON media_manifest (platform, status)")
+
+    def close(self):
+        self._conn.close()
+
+    def is_downloaded(self, save_path: str) -> bool:
+        """
+        save_path 已下载完成且文件仍然存在
+        """
+        row = self._conn.execute("SELECT status FROM media_manifest WHERE path = ?", (save_path,)).fetchone()
+        return row is not None and row[0] == STATUS_DONE and os.path.exists(save_path)
+
+    def start(self, platform: str, media_type: str, content_id: str, url: str, save_path: str):
+        """
+        记录开始下载，下载次数加一
+        """
+        now = int(time.time())
+        self._conn.execute(
+            "INSERT INTO media_manifest (path, platform, media_type, content_id, url, status, attempts, add_ts, last_modify_ts) "
+            "VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?) "
+            "ON CONFLICT (path) DO UPDATE SET url = excluded.url, status = excluded.status, "
+            "attempts = attempts + 1, last_modify_ts = excluded.last_modify_ts",
+            (save_path, platform, media_type, content_id, url, STATUS_DOWNLOADING, now, now),
+        )
+
+    def finish(self, save_path: str, size: Optional[int] = None, sha256: Optional[str] = None):
+        """
+        记录下载成功，size / sha256 为 None 时表示下载失败
+        """
+        status = STATUS_FAILED if size is None else STATUS_DONE
+        self._conn.execute(
+            "UPDATE media_manifest SET status = ?, size = ?, sha256 = ?, last_modify_ts = ? WHERE path = ?",
+            (status, size, sha256, int(time.time()), save_path),
+        )
+
+    def get_missing(self, platform: Optional[str] = None) -> List[Dict]:
+        """
+        没有下载成功的媒体（失败或下载中被中断），可用于只重试失败的下载
+        """
+        sql = "SELECT platform, media_type, content_id, url, path, status, attempts FROM media_manifest WHERE status != ?"
+        params: Tuple = (STATUS_DONE,)
+        if platform:
+            sql += " AND platform = ?"
+            params += (platform,)
+        cursor = self._conn.execute(sql + " ORDER BY platform, path", params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def get_usage(self) -> List[Dict]:
+        """
+        按平台、媒体类型、状态统计文件数和已下载的字节数
+        """
+        cursor = self._conn.execute(
+            "SELECT platform, media_type, status, COUNT(*) AS files, COALESCE(SUM(size), 0) AS bytes "
+            "FROM media_manifest GROUP BY platform, media_type, status ORDER BY platform, media_type, status"
+        )
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+_media_manifest: Optional[MediaManifest] = None
+
+
+def get_media_manifest() -> Optional[MediaManifest]:
+    """
+    获取媒体下载清单，未开启 ENABLE_MEDIA_MANIFEST 时返回 None
+    """
+    global _media_manifest
+    if not config.ENABLE_MEDIA_MANIFEST:
+        return None
+    if _media_manifest is None:
+        _media_manifest = MediaManifest(config.MEDIA_BLOB_DIR)
+    return _media_manifest
+
+
+def print_media_report(platform: Optional[str] = None):
+    """
+    输出各平台媒体文件的数量、占用空间和未下载成功的文件
+    """
+    manifest = MediaManifest(config.MEDIA_BLOB_DIR)
+    try:
+        for row in manifest.get_usage():
+            if platform and row["platform"] != platform:
+                continue
+            print(f"{row['platform']:<8} {row['media_type']:<6} {row['status']:<12} {row['files']:>8} files {row['bytes'] / 1024 / 1024:>12.2f} MB")
+        for row in manifest.get_missing(platform):
+            print(f"missing: [{row['status']}, {row['attempts']} attempts] {row['path']} <- {row['url']}")
+    finally:
+        manifest.close()
@@ -0,0 +1,200 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : csv / jsonl 输出文件：可选 gzip / zstd 压缩，按大小或条数滚动切分成多个分片
+import glob
+import gzip
+import io
+import os
+import re
+from typing import BinaryIO, List, Optional, TextIO
+
+import config
+from tools import utils
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+# 分片写完之前带的后缀，读取方按文件名 glob 时只会拿到已经写完的分片
+PART_SUFFIX = ".part"
+
+
+def _segment_index(file_path: str, base_path: str) -> Optional[int]:
+    stem, ext = os.path.splitext(base_path)
+    match = re.fullmatch(re.escape(stem) + r"\.(\d{4,})" + re.escape(ext) + r"(\.gz|\.zst)?(\.part)?", file_path)
+    return int(match.group(1)) if match else None
+
+
+def _segment_files(base_path: str) -> List[str]:
+    stem, ext = os.path.splitext(base_path)
+    return glob.glob(f"{glob.escape(stem)}.[0-9][0-9][0-9][0-9]*{ext}*")
+
+
+def get_output_files(base_path: str) -> List[str]:
+    """
+    获取一个输出文件写完的所有文件（未切分的文件在前，分片按序号排列），正在写入的 .part 分片不包含在内
+    Args:
+        base_path: 未压缩、未切分时的文件路径，如 data/xhs/jsonl/search_comments_2024-01-01.jsonl，对应
+            search_comments_2024-01-01.jsonl[.gz|.zst] 和 search_comments_2024-01-01.0001.jsonl[.gz|.zst] ...
+
+    Returns:
+        文件路径列表
+    """
+    files = [base_path + suffix for suffix in ("", *COMPRESSION_SUFFIXES.values()) if os.path.exists(base_path + suffix)]
+    segments = [(_segment_index(path, base_path), path) for path in _segment_files(base_path)]
+    files.extend(path for index, path in sorted(segments) if index is not None and not path.endswith(PART_SUFFIX))
+    return files
+
+
+def _compression_of(file_path: str) -> str:
+    return next((name for name, suffix in COMPRESSION_SUFFIXES.items() if file_path.endswith(suffix)), "")
+
+
+def _open_reader(file_path: str, compression: str, encoding: str) -> TextIO:
+    if compression == "gzip":
+        return gzip.open(file_path, "rt", encoding=encoding, newline="")
+    if compression == "zstd":
+        import zstandard
+
+        # 跨运行追加的 .zst 文件由多个 frame 组成
+        reader = zstandard.ZstdDecompressor().stream_reader(open(file_path, "rb"), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding=encoding, newline="")
+    return open(file_path, "r", encoding=encoding, newline="")
+
+
+def _wrap_writer(raw: BinaryIO, compression: str) -> BinaryIO:
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="ab")
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+    return raw
+
+
+def open_output_file(file_path: str, encoding: str = "utf-8") -> TextIO:
+    """
+    按文件后缀以文本方式打开输出文件（.gz / .zst 自动解压）
+    """
+    return _open_reader(file_path, _compression_of(file_path), encoding)
+
+
+def _finalize_stale_part(part_path: str, encoding: str):
+    """
+    上次运行没有正常关闭（进程被杀等）留下的 .part 分片：保留其中完整的行，去掉 .part 后缀，
+    读取方不会丢掉这个分片的数据
+    """
+    path = part_path[:-len(PART_SUFFIX)]
+    compression = _compression_of(path)
+    temp_path = path + ".tmp"
+    line_count = 0
+    with open(temp_path, "wb") as raw:
+        text = io.TextIOWrapper(_wrap_writer(raw, compression), encoding=encoding, newline="")
+        try:
+            with _open_reader(part_path, compression, encoding) as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        # 最后一行没有写完
+                        break
+                    text.write(line)
+                    line_count += 1
+        except Exception as e:
+            # 压缩流在退出时被截断（gzip 为 EOFError），保留截断前的内容
+            utils.logger.warning(f"[_finalize_stale_part] {part_path} is truncated: {e}")
+        text.close()
+    os.replace(temp_path, path)
+    os.remove(part_path)
+    utils.logger.info(f"[_finalize_stale_part] recovered {line_count} lines of {part_path} to {path}")
+
+
+class RotatingOutputFile:
+    """
+    只追加写入的文本输出文件，按 FILE_COMPRESSION 压缩，按 FILE_ROTATE_MAX_MB / FILE_ROTATE_MAX_ITEMS 切分:
+        <crawler_type>_<item_type>_<date>.<ext>[.gz|.zst]          不切分，跨运行追加写入
+        <crawler_type>_<item_type>_<date>.0001.<ext>[.gz|.zst]     切分，每次运行从下一个序号开始，
+                                                                  写入中的分片带 .part 后缀，写完后去掉；
+                                                                  上次运行异常退出留下的 .part 分片在打开时补完
+    不是线程安全的，同一个文件的写入由调用方串行
+    """
+
+    def __init__(self, base_path: str, encoding: str = "utf-8"):
+        if config.FILE_COMPRESSION and config.FILE_COMPRESSION not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"[RotatingOutputFile] Invalid FILE_COMPRESSION {config.FILE_COMPRESSION}, only supported gzip or zstd ...")
+        self.base_path = base_path
+        self.encoding = encoding
+        self.compression = config.FILE_COMPRESSION
+        self.max_bytes = int(config.FILE_ROTATE_MAX_MB * 1024 * 1024)
+        self.max_items = config.FILE_ROTATE_MAX_ITEMS
+        self.path: Optional[str] = None
+        self.item_count = 0
+        self._segment = 0
+        self._raw = None
+        self._text: Optional[io.TextIOWrapper] = None
+
+    @property
+    def rotating(self) -> bool:
+        return bool(self.max_bytes or self.max_items)
+
+    def _open(self) -> bool:
+        """
+        打开当前文件或下一个分片
+        Returns:
+            是否为新的空文件
+        """
+        suffix = COMPRESSION_SUFFIXES.get(self.compression, "")
+        if self.rotating:
+            if not self._segment:
+                for path in _segment_files(self.base_path):
+                    if path.endswith(PART_SUFFIX) and _segment_index(path, self.base_path) is not None:
+                        _finalize_stale_part(path, self.encoding)
+                self._segment = max(filter(None, (_segment_index(path, self.base_path) for path in _segment_files(self.base_path))), default=0)
+            self._segment += 1
+            stem, ext = os.path.splitext(self.base_path)
+            self.path = f"{stem}.{self._segment:04d}{ext}{suffix}"
+            write_path = self.path + PART_SUFFIX
+        else:
+            self.path = write_path = self.base_path + suffix
+        is_new = not os.path.exists(write_path) or os.path.getsize(write_path) == 0
+
+        self._raw = open(write_path, "ab")
+        self._text = io.TextIOWrapper(_wrap_writer(self._raw, self.compression), encoding=self.encoding, newline="")
+        self.item_count = 0
+        return is_new
+
+    def write(self, text: str, item_count: int, header: str = ""):
+        """
+        追加写入 item_count 条数据，写完后达到切分阈值就关闭当前分片，下次写入时打开新分片
+        Args:
+            text: 要写入的文本
+            item_count: text 中包含的数据条数
+            header: 新文件开头写入的内容，如 csv 表头
+        """
+        if self._text is None and self._open() and header:
+            self._text.write(header)
+        self._text.write(text)
+        if not self.compression:
+            # 未压缩时每次写入都落盘，其他读取方能读到完整的行
+            self._text.flush()
+        self.item_count += item_count
+        if self.rotating and ((self.max_items and self.item_count >= self.max_items) or
+                              (self.max_bytes and self._raw.tell() >= self.max_bytes)):
+            self.close()
+
+    def close(self):
+        """
+        关闭当前文件，切分模式下去掉分片的 .part 后缀
+        """
+        if self._text is None:
+            return
+        self._text.close()
+        self._raw.close()
+        self._text = self._raw = None
+        if self.rotating:
+            os.replace(self.path + PART_SUFFIX, self.path)
@@ -0,0 +1,119 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 令牌桶限速：按平台和接口类别控制请求速率，代替持有并发名额时的固定 sleep，
+#            服务端返回 Retry-After 时暂停该类接口的请求
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+import config
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = 1):
+        """
+        Args:
+            rate: 每秒发放的令牌数，0 表示不限速（仍然遵守 backoff）
+            burst: 桶容量，允许的突发请求数
+        """
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self._interval = 1 / rate if rate else 0
+        # 按 GCRA 计算：_tat 为已预约的令牌全部发放完的时间，_tat - 容忍度 之前来的请求需要等待
+        self._tolerance = (self.capacity - 1) * self._interval
+        self._tat = time.monotonic()
+        self._blocked_until = 0.0
+        self.loop = asyncio.get_running_loop()
+
+    def _reserve(self) -> float:
+        """
+        预约一个令牌，返回可以使用的时间；计算过程中没有 await，不需要加锁
+        """
+        available_at = max(time.monotonic(), self._blocked_until, self._tat - self._tolerance)
+        self._tat = max(self._tat, available_at) + self._interval
+        return available_at
+
+    async def acquire(self):
+        """
+        等待并取走一个令牌：先按顺序预约再 sleep，等待的请求各自 sleep 到自己的时间，不用排在其他请求后面
+        """
+        while True:
+            delay = self._reserve() - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # 等待期间服务端要求暂停时，暂停结束后重新预约
+            if time.monotonic() >= self._blocked_until:
+                return
+
+    def backoff(self, seconds: float):
+        """
+        seconds 秒内不再发放令牌，恢复后从空桶开始
+        """
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tat = max(self._tat, self._blocked_until + self._tolerance)
+
+
+def get_default_rate() -> float:
+    """
+    与原来"每个并发请求后等待 CRAWLER_MAX_SLEEP_SEC 秒"相当的请求速率
+    """
+    if not config.CRAWLER_MAX_SLEEP_SEC:
+        return 0
+    return config.MAX_CONCURRENCY_NUM / config.CRAWLER_MAX_SLEEP_SEC
+
+
+_rate_limiters: Dict[Tuple[str, str], TokenBucket] = {}
+# RATE_LIMIT_PER_SEC 中没有单独配置的接口类别共用的令牌桶
+_SHARED_BUCKET = "*"
+
+
+def get_rate_limiter(platform: str, endpoint_class: str) -> Optional[TokenBucket]:
+    """
+    获取平台某类接口的令牌桶，未开启 ENABLE_RATE_LIMIT 时返回 None；
+    RATE_LIMIT_PER_SEC 中没有单独配置的接口类别共用一个令牌桶，平台的总请求速率与原来的 sleep 相当
+    """
+    if not config.ENABLE_RATE_LIMIT:
+        return None
+    bucket = endpoint_class if endpoint_class in config.RATE_LIMIT_PER_SEC else _SHARED_BUCKET
+    limiter = _rate_limiters.get((platform, bucket))
+    if limiter is None or limiter.loop is not asyncio.get_running_loop():
+        rate = config.RATE_LIMIT_PER_SEC.get(bucket, get_default_rate())
+        limiter = _rate_limiters[(platform, bucket)] = TokenBucket(rate, config.RATE_LIMIT_BURST)
+    return limiter
+
+
+def get_crawl_interval() -> float:
+    """
+    持有并发名额时两次请求之间的等待秒数：开启令牌桶限速后为 0，请求速率由限速器控制
+    """
+    return 0 if config.ENABLE_RATE_LIMIT else config.CRAWLER_MAX_SLEEP_SEC
+
+
+def get_retry_after(response: httpx.Response) -> Optional[float]:
+    """
+    服务端要求等待的秒数：Retry-After 头（秒数或 HTTP 日期），429 没有 Retry-After 时为 RATE_LIMIT_BACKOFF_SEC
+    """
+    if response.status_code not in (429, 503):
+        return None
+    value = response.headers.get("Retry-After", "").strip()
+    if value.isdigit():
+        return float(value)
+    if value:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            pass
+    return config.RATE_LIMIT_BACKOFF_SEC if response.status_code == 429 else None
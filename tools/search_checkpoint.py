@@ -0,0 +1,89 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 关键词搜索断点：每爬完一页记录 (关键词, 下一页, 游标, 日期)，--resume 时从中断处继续
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List
+
+import config
+from tools import utils
+
+
+class SearchCheckpoint:
+    """
+    断点文件 data/<platform>/checkpoint/search.json，内容如:
+        {"keywords": [...], "scope": "", "keyword": "当前关键词", "page": 下一页, "search_id": "...", "updated_at": ...}
+    关键词列表或 scope（如 bili 的搜索模式）与断点不一致时不续爬
+    """
+
+    def __init__(self, platform: str, keywords: List[str], scope: str = ""):
+        self.path = os.path.join("data", platform, "checkpoint", "search.json")
+        self.keywords = keywords
+        self.scope = scope
+        self.state: Dict[str, Any] = self._load() if config.RESUME_SEARCH else {}
+
+    def _load(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            utils.logger.info(f"[SearchCheckpoint] no checkpoint at {self.path}, start from the beginning")
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("keywords") != self.keywords or state.get("scope") != self.scope or state.get("keyword") not in self.keywords:
+            utils.logger.warning(f"[SearchCheckpoint] checkpoint {self.path} was made with other keywords or search mode, ignore it")
+            return {}
+        utils.logger.info(f"[SearchCheckpoint] resume from keyword: {state['keyword']}, page: {state.get('page')}")
+        return state
+
+    def iter_keywords(self) -> Iterator[str]:
+        """
+        遍历还没爬完的关键词：续爬时从断点所在的关键词开始，一个关键词的循环体执行完后记为已完成，
+        全部完成后删除断点。循环中途 return / 抛出异常时保留断点
+        """
+        start = 0
+        if self.state:
+            start = self.keywords.index(self.state["keyword"]) + (1 if self.state.get("done") else 0)
+        for keyword in self.keywords[start:]:
+            yield keyword
+            self.save(keyword, done=True)
+        self.finish()
+
+    def get(self, keyword: str, key: str, default: Any = None) -> Any:
+        """
+        获取关键词断点中记录的值，没有该关键词的断点时返回 default
+        """
+        if self.state.get("keyword") != keyword or self.state.get("done"):
+            return default
+        return self.state.get(key, default)
+
+    def save(self, keyword: str, **cursor: Any):
+        """
+        记录当前关键词下一次请求的位置（一页爬完后调用），先写临时文件再替换，中途退出不会留下损坏的断点；
+        开启 ENABLE_SEARCH_CHECKPOINT 或本次为续爬时记录
+        """
+        if not (config.ENABLE_SEARCH_CHECKPOINT or config.RESUME_SEARCH):
+            return
+        self.state = {"keywords": self.keywords, "scope": self.scope, "keyword": keyword, **cursor, "updated_at": int(time.time())}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def finish(self):
+        """
+        删除断点
+        """
+        self.state = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)